@@ -0,0 +1,654 @@
+"""
+Benchmarks des chemins critiques acquisition / rapport
+======================================================
+Sans matériel : les annonces Victron (chiffrées AES-CTR comme le vrai
+SmartSolar), les trames BTHome et les notifications Antarion sont
+synthétiques. Pour chaque cible on mesure :
+
+  - ops/s (meilleure de plusieurs répétitions)
+  - octets alloués transitoirement par opération (pic tracemalloc)
+  - octets conservés par opération (croissance nette)
+
+Usage :
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --save                 # écrit la référence
+    python benchmarks/bench_hot_paths.py --compare              # compare à la référence
+    python benchmarks/bench_hot_paths.py --compare --threshold 0.2 --filter victron
+
+La référence (baseline.json) doit être enregistrée sur la cible (Raspberry Pi) :
+--compare retourne un code 1 si une cible ralentit ou alloue plus que le seuil.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, UTC
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.15
+MIN_REPEAT_TIME = 0.2   # s par répétition
+REPEATS = 5
+ALLOC_SAMPLES = 200
+
+VICTRON_KEY = "8ebf134b9339e9524eb24979c5e87505"
+VICTRON_MAC = "FC:40:BC:FC:A8:D4"
+BTHOME_MAC = "C0:2C:ED:A8:EE:6E"
+BTHOME_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+BTHOME_BINDKEY = "231d39c1d7cc1ab1aee224cd096db932"
+STREAM_SIZE = 1024      # > taille du cache de payloads : le flux "unique" ne touche jamais le cache
+BATCH_SIZE = 64         # payloads par appel de bthome_decoder.decode_frames
+
+
+# ── Flux synthétiques ─────────────────────────────────────────────────────────
+
+def victron_frame(key_hex: str, iv: int, voltage: float, current: float, power: int, yield_wh: int) -> bytes:
+    """Annonce SmartSolar (record 0x01) chiffrée comme par le firmware Victron"""
+    from Crypto.Cipher import AES
+    from Crypto.Util import Counter
+
+    key = bytes.fromhex(key_hex)
+    plain = struct.pack(
+        "<BBhhHH", 3, 0, round(voltage * 100), round(current * 10), yield_wh // 10, power
+    ) + b"\xff\xff\xff\xff"
+    cipher = AES.new(key, AES.MODE_CTR, counter=Counter.new(128, initial_value=iv, little_endian=True))
+    return b"\x10\x02" + struct.pack("<H", 0xA060) + b"\x01" + struct.pack("<H", iv) + key[:1] + cipher.encrypt(plain)
+
+
+def victron_stream(count: int) -> list:
+    return [
+        victron_frame(VICTRON_KEY, i, 12.0 + (i % 200) / 100, (i % 50) / 10, i % 300, (i % 100) * 10)
+        for i in range(count)
+    ]
+
+
+def bthome_payload(i: int) -> bytes:
+    """Trame BTHome v2 non chiffrée façon Shelly BLU H&T / Door-Window"""
+    # Objets dans l'ordre croissant des identifiants, comme l'exige la spécification
+    return bytes((0x40, 0x00, i & 0xFF, 0x01, 80 + i % 20, 0x1E, i % 3, 0x2E, 40 + i % 30)) \
+        + b"\x45" + struct.pack("<h", 150 + i % 100)
+
+
+def bthome_stream(count: int) -> list:
+    return [bthome_payload(i) for i in range(count)]
+
+
+def bthome_encrypted(payload: bytes, counter: int, mac: str = BTHOME_MAC, bindkey: str = BTHOME_BINDKEY) -> bytes:
+    """Même trame chiffrée AES-CCM comme par un capteur BTHome v2 avec bindkey"""
+    from cryptography.hazmat.primitives.ciphers.aead import AESCCM
+
+    info = payload[0] | 0x01
+    counter_bytes = counter.to_bytes(4, "little")
+    nonce = bytes.fromhex(mac.replace(":", "")) + b"\xd2\xfc" + bytes((info,)) + counter_bytes
+    sealed = AESCCM(bytes.fromhex(bindkey), tag_length=4).encrypt(nonce, payload[1:], None)
+    return bytes((info,)) + sealed[:-4] + counter_bytes + sealed[-4:]
+
+
+def advertisement(manufacturer_data=None, service_data=None, rssi=-70):
+    """Objet AdvertisementData réel si bleak est là, sinon équivalent minimal"""
+    try:
+        from bleak.backends.scanner import AdvertisementData
+    except ImportError:
+        return SimpleNamespace(
+            local_name=None, manufacturer_data=manufacturer_data or {}, service_data=service_data or {},
+            service_uuids=list(service_data or ()), tx_power=None, rssi=rssi, platform_data=(),
+        )
+    return AdvertisementData(
+        local_name=None, manufacturer_data=manufacturer_data or {}, service_data=service_data or {},
+        service_uuids=list(service_data or ()), tx_power=None, rssi=rssi, platform_data=(),
+    )
+
+
+def ble_device(address: str):
+    try:
+        from bleak.backends.device import BLEDevice
+    except ImportError:
+        return SimpleNamespace(address=address, name=None, details=None)
+    return BLEDevice(address, None, None)
+
+
+ANTARION_FRAME = b"004127005000000000052160000000000000000"
+
+
+def antarion_frames(count: int) -> list:
+    """Variantes de la trame relevée sur le régulateur (courant, tension, puissance)"""
+    return [b"%03d%03d%03d" % (i % 200, 120 + i % 20, i % 400) + ANTARION_FRAME[9:] for i in range(count)]
+
+
+def antarion_notifications(count: int) -> list:
+    """Trames Antarion découpées comme par le module BLE : tête, fin + CR, LF"""
+    out = []
+    for frame in antarion_frames(count):
+        out += [bytearray(frame[:20]), bytearray(frame[20:] + b"\r"), bytearray(b"\n")]
+    return out
+
+
+# ── Cibles ────────────────────────────────────────────────────────────────────
+
+class Skip(Exception):
+    """Cible indisponible dans cet environnement (dépendance absente)"""
+
+
+def _cycle(items):
+    """Fonction sans argument qui renvoie l'élément suivant, en boucle"""
+    n = len(items)
+    state = [0]
+
+    def nxt():
+        i = state[0]
+        state[0] = i + 1 if i + 1 < n else 0
+        return items[i]
+    return nxt
+
+
+def _state_manager():
+    try:
+        from testmulti import GlobalStateManager
+        from victron_registry import load_victron_ble
+        load_victron_ble()
+    except ImportError as e:
+        raise Skip(f"testmulti: {e}")
+    manager = GlobalStateManager(VICTRON_KEY)
+    manager._est_dans_la_fenetre_d_ecoute = lambda: True
+    return manager
+
+
+def _needs_crypto():
+    try:
+        import Crypto  # noqa: F401
+    except ImportError as e:
+        raise Skip(f"pycryptodome: {e}")
+
+
+def setup_victron_repeat():
+    # Cas nominal : le SmartSolar répète la même payload plusieurs fois par seconde
+    _needs_crypto()
+    manager = _state_manager()
+    advs = [advertisement({0x02E1: frame}) for frame in victron_stream(4) for _ in range(16)]
+    nxt = _cycle(advs)
+    return lambda: manager.update_victron(nxt())
+
+
+def setup_victron_unique():
+    # Pire cas : chaque annonce est nouvelle (déchiffrement + parsing complets)
+    _needs_crypto()
+    manager = _state_manager()
+    nxt = _cycle([advertisement({0x02E1: frame}) for frame in victron_stream(STREAM_SIZE)])
+    return lambda: manager.update_victron(nxt())
+
+
+def setup_victron_rejected():
+    # Annonces d'un autre appareil Victron (autre clé) et d'autres constructeurs : rejet sans déchiffrement
+    _needs_crypto()
+    manager = _state_manager()
+    other = victron_stream(STREAM_SIZE // 2)
+    advs = [advertisement({0x02E1: frame[:7] + b"\x00" + frame[8:]}) for frame in other]
+    advs += [advertisement({0x004C: b"\x02\x15" + bytes(21)}) for _ in range(STREAM_SIZE // 2)]
+    nxt = _cycle(advs)
+    return lambda: manager.update_victron(nxt(), VICTRON_MAC)
+
+
+def setup_bthome_repeat():
+    manager = _state_manager()
+    device = ble_device(BTHOME_MAC)
+    advs = [advertisement(service_data={BTHOME_UUID: p}) for p in bthome_stream(4) for _ in range(16)]
+    nxt = _cycle(advs)
+    return lambda: manager.update_bthome(BTHOME_MAC, device, nxt())
+
+
+def setup_bthome_unique():
+    manager = _state_manager()
+    device = ble_device(BTHOME_MAC)
+    # Compteur de paquets différent à chaque annonce : bthome_ble ne la prend pas pour une répétition
+    nxt = _cycle([advertisement(service_data={BTHOME_UUID: p}) for p in bthome_stream(STREAM_SIZE)])
+    return lambda: manager.update_bthome(BTHOME_MAC, device, nxt())
+
+
+def setup_bthome_encrypted():
+    # Capteur chiffré : déchiffrement AES-CCM + contrôle du compteur à chaque annonce
+    try:
+        import cryptography  # noqa: F401
+    except ImportError as e:
+        raise Skip(f"cryptography: {e}")
+    manager = _state_manager()
+    manager.register_bthome(BTHOME_MAC, BTHOME_BINDKEY)
+    device = ble_device(BTHOME_MAC)
+    advs = [advertisement(service_data={BTHOME_UUID: bthome_encrypted(p, i + 1)})
+            for i, p in enumerate(bthome_stream(STREAM_SIZE))]
+    state = [0]
+
+    def op():
+        i = state[0]
+        if i == len(advs):
+            # Fin du flux : compteur remis à zéro, sinon tout serait rejeté comme rejeu
+            manager.bthome_parsers[BTHOME_MAC].counter = None
+            i = 0
+        state[0] = i + 1
+        manager.update_bthome(BTHOME_MAC, device, advs[i])
+    return op
+
+
+def _tstbthome():
+    try:
+        import tstbthome
+    except ImportError as e:
+        raise Skip(f"tstbthome: {e}")
+    return tstbthome
+
+
+def setup_decode_frame():
+    decode_frame = _tstbthome().decode_frame
+    nxt = _cycle([p[1:] for p in bthome_stream(STREAM_SIZE)])
+    return lambda: decode_frame(nxt())
+
+
+def legacy_decode_frame(data: bytes) -> dict:
+    """Référence : ancien tstbthome.decode_frame (chaîne if/elif, 9 identifiants)"""
+    if not data:
+        return {}
+    result = {}
+    pos = 0
+    while pos < len(data):
+        obj_id = data[pos]
+        pos += 1
+        try:
+            if obj_id == 0x01:
+                result["battery_pct"] = data[pos]
+                pos += 1
+            elif obj_id == 0x15:
+                result["battery_low"] = bool(data[pos])
+                pos += 1
+            elif obj_id == 0x1E:
+                raw = data[pos]
+                pos += 1
+                result["light"] = {0: "dark", 1: "twilight", 2: "bright"}.get(raw, f"?({raw})")
+                result["light_raw"] = raw
+            elif obj_id == 0x2E:
+                result["humidity_pct"] = data[pos]
+                pos += 1
+            elif obj_id == 0x45:
+                raw = struct.unpack_from("<h", data, pos)[0]
+                pos += 2
+                result["temperature_c"] = raw / 10.0
+            elif obj_id == 0xF0:
+                result["device_type_id"] = struct.unpack_from("<H", data, pos)[0]
+                pos += 2
+            elif obj_id == 0xF1:
+                result["firmware_u32"] = struct.unpack_from("<I", data, pos)[0]
+                pos += 4
+            elif obj_id == 0xF2:
+                b = data[pos:pos + 3]
+                pos += 3
+                result["firmware_u24"] = b[0] | (b[1] << 8) | (b[2] << 16)
+            elif obj_id == 0x3A:
+                raw = data[pos]
+                pos += 1
+                result["button_event"] = {1: "short_press"}.get(raw, f"?({raw})")
+            else:
+                result[f"unknown_0x{obj_id:02X}"] = data[pos] if pos < len(data) else None
+                pos += 1
+        except (IndexError, struct.error):
+            break
+    if "device_type_id" in result or "firmware_u32" in result:
+        result["frame_type"] = "device_id_packet"
+    elif "button_event" in result:
+        result["frame_type"] = "event"
+    elif any(k in result for k in ("temperature_c", "humidity_pct", "light")):
+        result["frame_type"] = "advertising_beacon"
+    else:
+        result["frame_type"] = "unknown"
+    return result
+
+
+def setup_bthome_legacy():
+    nxt = _cycle([p[1:] for p in bthome_stream(STREAM_SIZE)])
+    return lambda: legacy_decode_frame(nxt())
+
+
+def setup_bthome_decode_frame():
+    from bthome_decoder import decode_frame
+
+    nxt = _cycle([p[1:] for p in bthome_stream(STREAM_SIZE)])
+    return lambda: decode_frame(nxt())
+
+
+def setup_bthome_decode_frames():
+    # Une opération = un lot de BATCH_SIZE payloads
+    from bthome_decoder import decode_frames
+
+    payloads = [p[1:] for p in bthome_stream(STREAM_SIZE)]
+    nxt = _cycle([payloads[i:i + BATCH_SIZE] for i in range(0, STREAM_SIZE, BATCH_SIZE)])
+    return lambda: decode_frames(nxt())
+
+
+def setup_bthome_ble_update():
+    # Même trames, décodées par bthome_ble (service info construit hors mesure)
+    try:
+        from bthome_ble import BTHomeBluetoothDeviceData
+        from home_assistant_bluetooth import BluetoothServiceInfoBleak
+    except ImportError as e:
+        raise Skip(f"bthome_ble: {e}")
+    parser = BTHomeBluetoothDeviceData()
+    device = ble_device(BTHOME_MAC)
+    nxt = _cycle([
+        BluetoothServiceInfoBleak.from_scan("local", device, advertisement(service_data={BTHOME_UUID: p}), 0.0, False)
+        for p in bthome_stream(STREAM_SIZE)
+    ])
+    return lambda: parser.update(nxt())
+
+
+def setup_extract_payload():
+    extract = _tstbthome().extract_bthome_payload
+    nxt = _cycle([advertisement(service_data={BTHOME_UUID: p}) for p in bthome_stream(64)])
+    return lambda: extract(nxt())
+
+
+def setup_antarion():
+    try:
+        from btantarion import Btantarion
+    except ImportError as e:
+        raise Skip(f"btantarion: {e}")
+
+    bts = Btantarion()
+    nxt = _cycle(antarion_notifications(STREAM_SIZE // 3))
+    return lambda: bts.parse_notification(nxt())
+
+
+def setup_antarion_feed():
+    from antarion_frame import FrameAssembler
+
+    feed = FrameAssembler().feed
+    nxt = _cycle(antarion_notifications(STREAM_SIZE // 3))
+    return lambda: feed(nxt())
+
+
+def setup_antarion_decode():
+    from antarion_frame import decode_frame
+
+    nxt = _cycle(antarion_frames(STREAM_SIZE))
+    return lambda: decode_frame(nxt())
+
+
+def _supervisor():
+    # supervisor.py ouvre kepler.log dans le répertoire courant à l'import
+    if "supervisor" in sys.modules:
+        return sys.modules["supervisor"]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            import supervisor
+        except ImportError as e:
+            raise Skip(f"supervisor: {e}")
+        finally:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                if isinstance(handler, logging.FileHandler):
+                    root.removeHandler(handler)
+                    handler.close()
+            os.chdir(cwd)
+    return supervisor
+
+
+def setup_lead_soc():
+    lead_soc = _supervisor().lead_soc
+    nxt = _cycle([(11.6 + i / 1000, -10 + i % 45) for i in range(STREAM_SIZE)])
+    return lambda: lead_soc(*nxt())
+
+
+def setup_agm_soc():
+    agm_soc = _supervisor().agm_soc
+    nxt = _cycle([(11.6 + i / 1000, -10 + i % 45) for i in range(STREAM_SIZE)])
+    return lambda: agm_soc(*nxt())
+
+
+def setup_ntc_temperature():
+    ntc_temperature = _supervisor().ntc_temperature
+    nxt = _cycle([0.2 + 2.9 * i / STREAM_SIZE for i in range(STREAM_SIZE)])
+    return lambda: ntc_temperature(nxt())
+
+
+def _site_status():
+    from site_status import SiteStatus
+    status = SiteStatus(site_id="site_001")
+    status.update(aux_voltage=12.61, main_voltage=12.9, main_level=88.0, panel_power=123.0,
+                  charging_state="Bulk", charging_current=4.2, temperature_1=21.5,
+                  bt_temperature=18.2, bt_humidity=55.0, bt_light_txt="bright")
+    return status
+
+
+def setup_site_status_update():
+    status = _site_status()
+    nxt = _cycle([
+        {"aux_voltage": 12 + i / 1000, "aux_level": 50 + i % 50, "panel_power": i % 300,
+         "charging_state": "Bulk", "charging_current": i / 100, "lte_signal": -70 - i % 30}
+        for i in range(STREAM_SIZE)
+    ])
+    return lambda: status.update(**nxt())
+
+
+def setup_site_status_to_point():
+    try:
+        import influxdb_client  # noqa: F401
+    except ImportError as e:
+        raise Skip(f"influxdb_client: {e}")
+    status = _site_status()
+
+    def op():
+        point = status.to_point()
+        return point.to_line_protocol()
+    return op
+
+
+def setup_site_status_line_protocol():
+    status = _site_status()
+    return status.to_line_protocol
+
+
+BENCHMARKS = {
+    "update_victron.repeat": setup_victron_repeat,
+    "update_victron.unique": setup_victron_unique,
+    "update_victron.rejected": setup_victron_rejected,
+    "update_bthome.repeat": setup_bthome_repeat,
+    "update_bthome.unique": setup_bthome_unique,
+    "update_bthome.encrypted": setup_bthome_encrypted,
+    "tstbthome.decode_frame": setup_decode_frame,
+    "tstbthome.extract_bthome_payload": setup_extract_payload,
+    "bthome_decoder.legacy": setup_bthome_legacy,
+    "bthome_decoder.decode_frame": setup_bthome_decode_frame,
+    "bthome_decoder.decode_frames": setup_bthome_decode_frames,
+    "bthome_ble.update": setup_bthome_ble_update,
+    "btantarion.parse_notification": setup_antarion,
+    "antarion_frame.feed": setup_antarion_feed,
+    "antarion_frame.decode_frame": setup_antarion_decode,
+    "supervisor.lead_soc": setup_lead_soc,
+    "supervisor.agm_soc": setup_agm_soc,
+    "supervisor.ntc_temperature": setup_ntc_temperature,
+    "site_status.update": setup_site_status_update,
+    "site_status.to_point": setup_site_status_to_point,
+    "site_status.to_line_protocol": setup_site_status_line_protocol,
+}
+
+
+# ── Mesure ────────────────────────────────────────────────────────────────────
+
+def _time_loop(op, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        op()
+    return time.perf_counter() - start
+
+
+def measure_speed(op, min_time: float = MIN_REPEAT_TIME, repeats: int = REPEATS) -> dict:
+    # Calibrage : nombre d'itérations pour qu'une répétition dure au moins min_time
+    number = 1
+    while True:
+        elapsed = _time_loop(op, number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = min([elapsed] + [_time_loop(op, number) for _ in range(repeats - 1)])
+    return {"ops_per_sec": number / best, "ns_per_op": best / number * 1e9}
+
+
+def measure_allocations(op, samples: int = ALLOC_SAMPLES) -> dict:
+    # Échauffement hors traçage : caches, imports paresseux, dictionnaires d'état
+    for _ in range(samples):
+        op()
+    transient = 0
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in range(samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op()
+            transient += tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_bytes_per_op": round(transient / samples, 1),
+        "retained_bytes_per_op": round(retained / samples, 1),
+    }
+
+
+def run_benchmarks(names=None, min_time: float = MIN_REPEAT_TIME, repeats: int = REPEATS,
+                   alloc_samples: int = ALLOC_SAMPLES) -> dict:
+    """{nom: mesures} ; les cibles indisponibles ont {"skipped": raison}"""
+    results = {}
+    # Les chemins mesurés journalisent et affichent les changements : silence pendant la mesure
+    logging.disable(logging.CRITICAL)
+    try:
+        for name, setup in BENCHMARKS.items():
+            if names and not any(n in name for n in names):
+                continue
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    op = setup()
+            except Skip as e:
+                results[name] = {"skipped": str(e)}
+                continue
+            sink = io.StringIO()
+            with contextlib.redirect_stdout(sink):
+                speed = measure_speed(op, min_time, repeats)
+                allocations = measure_allocations(op, alloc_samples)
+                sink.seek(0)
+                sink.truncate()
+            results[name] = {**speed, **allocations}
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def environment() -> dict:
+    return {
+        "date": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(baseline: dict, results: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Liste des régressions (débit en baisse ou allocations en hausse au-delà du seuil)"""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or "skipped" in reference or "skipped" in current:
+            continue
+        if current["ops_per_sec"] < reference["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {current['ops_per_sec']:.0f} ops/s vs {reference['ops_per_sec']:.0f} "
+                f"({current['ops_per_sec'] / reference['ops_per_sec'] - 1:+.0%})"
+            )
+        # Marge absolue de 64 octets : le pic tracemalloc fluctue d'un run à l'autre
+        limit = reference["alloc_bytes_per_op"] * (1 + threshold) + 64
+        if current["alloc_bytes_per_op"] > limit:
+            regressions.append(
+                f"{name}: {current['alloc_bytes_per_op']:.0f} B/op allocated vs "
+                f"{reference['alloc_bytes_per_op']:.0f}"
+            )
+    return regressions
+
+
+def format_report(results: dict, baseline: dict | None = None) -> str:
+    lines = [f"{'benchmark':<36} {'ops/s':>12} {'ns/op':>10} {'alloc B/op':>11} {'kept B/op':>10} {'vs ref':>8}"]
+    reference = (baseline or {}).get("results", {})
+    for name, r in results.items():
+        if "skipped" in r:
+            lines.append(f"{name:<36} skipped ({r['skipped']})")
+            continue
+        ref = reference.get(name)
+        delta = ""
+        if ref and "ops_per_sec" in ref:
+            delta = f"{r['ops_per_sec'] / ref['ops_per_sec'] - 1:+.0%}"
+        lines.append(
+            f"{name:<36} {r['ops_per_sec']:>12,.0f} {r['ns_per_op']:>10,.0f} "
+            f"{r['alloc_bytes_per_op']:>11,.0f} {r['retained_bytes_per_op']:>10,.1f} {delta:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques du superviseur")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier JSON de référence")
+    parser.add_argument("--save", action="store_true", help="Enregistre les résultats comme référence")
+    parser.add_argument("--compare", action="store_true", help="Compare à la référence (code 1 si régression)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Écart toléré avant de signaler une régression (0.15 = 15 %%)")
+    parser.add_argument("--filter", action="append", help="Ne lance que les cibles contenant ce texte")
+    parser.add_argument("--min-time", type=float, default=MIN_REPEAT_TIME, help="Durée minimale d'une répétition (s)")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"Pas de référence {args.baseline} : lancer d'abord avec --save", file=sys.stderr)
+            return 2
+
+    env = environment()
+    print(f"Python {env['python']} ({env['implementation']}) sur {env['machine']}")
+    results = run_benchmarks(args.filter, args.min_time, args.repeats)
+    print(format_report(results, baseline))
+
+    status = 0
+    if baseline is not None:
+        ref_env = baseline.get("environment", {})
+        if ref_env.get("machine") != env["machine"] or ref_env.get("python") != env["python"]:
+            print(f"Attention : référence mesurée sur {ref_env.get('machine')} / Python {ref_env.get('python')}")
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0%} :")
+            for line in regressions:
+                print(f"  - {line}")
+            status = 1
+        else:
+            print("\nAucune régression")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": env, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Référence enregistrée dans {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Échantillonneur ADS1115 persistant
+==================================
+Le bus I2C et le convertisseur sont ouverts une seule fois puis réutilisés
+à chaque cycle. Chaque voie a son gain, son débit de conversion et son
+nombre d'échantillons ; les échantillons sont réduits par médiane (robuste
+aux parasites) ou par moyenne (bruit blanc).
+
+Une capture rapide en mode continu est disponible pour observer une voie
+à haute fréquence (jusqu'à 860 échantillons/s).
+
+La pile Adafruit (Blinka) n'est importée qu'à la première ouverture du
+bus : l'import du module reste instantané au démarrage du superviseur.
+"""
+
+import importlib.util
+import logging
+import statistics
+import time
+from types import SimpleNamespace
+
+ADAFRUIT_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("board", "busio", "adafruit_ads1x15")
+)
+_adafruit = None
+
+DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+REDUCERS = {
+    "median": statistics.median,
+    "mean": statistics.fmean,
+}
+
+
+def adafruit():
+    """Modules Adafruit, importés au premier appel (ImportError si absents)"""
+    global _adafruit
+    if _adafruit is None:
+        import board
+        import busio
+        import adafruit_ads1x15.ads1115 as ADS
+        from adafruit_ads1x15.ads1x15 import Mode
+        from adafruit_ads1x15.analog_in import AnalogIn
+        _adafruit = SimpleNamespace(board=board, busio=busio, ADS=ADS, Mode=Mode, AnalogIn=AnalogIn)
+    return _adafruit
+
+
+class ChannelConfig:
+    def __init__(self, gain=1, data_rate=128, samples=1, reducer="median"):
+        if data_rate not in DATA_RATES:
+            raise ValueError(f"data_rate {data_rate} not in {DATA_RATES}")
+        if reducer not in REDUCERS:
+            raise ValueError(f"reducer {reducer} not in {list(REDUCERS)}")
+        self.gain = gain
+        self.data_rate = data_rate
+        self.samples = max(1, int(samples))
+        self.reducer = reducer
+
+    def __repr__(self):
+        return (f"ChannelConfig(gain={self.gain}, data_rate={self.data_rate}, "
+                f"samples={self.samples}, reducer={self.reducer!r})")
+
+
+class ADS1115Sampler:
+    def __init__(self, channels: dict[int, ChannelConfig] | None = None, address=0x48,
+                 device=None, input_factory=None):
+        self.channels = channels or {ch: ChannelConfig() for ch in range(4)}
+        self.address = address
+        self.device = device
+        self.input_factory = input_factory
+        self._i2c = None
+        self._inputs = {}
+
+    def open(self):
+        """Ouvre le bus et le convertisseur si ce n'est pas déjà fait"""
+        if self.device is None:
+            lib = adafruit()
+            self._i2c = lib.busio.I2C(lib.board.SCL, lib.board.SDA)
+            self.device = lib.ADS.ADS1115(self._i2c, address=self.address)
+            logging.info("[ADS] ADS1115 opened at 0x%02X", self.address)
+        if not self._inputs:
+            factory = self.input_factory or adafruit().AnalogIn
+            self._inputs = {ch: factory(self.device, ch) for ch in self.channels}
+
+    def close(self):
+        """Libère le bus ; la prochaine lecture rouvrira tout (ex : après une erreur I2C)"""
+        if self._i2c is not None:
+            try:
+                self._i2c.deinit()
+            except Exception as e:
+                logging.info("[ADS] Error closing I2C bus: %s", e)
+            self._i2c = None
+            self.device = None
+        self._inputs = {}
+
+    def _configure(self, gain, data_rate):
+        # Chaque écriture coûte une transaction I2C : on ne touche que ce qui change
+        if self.device.gain != gain:
+            self.device.gain = gain
+        if self.device.data_rate != data_rate:
+            self.device.data_rate = data_rate
+
+    def read_channel(self, channel: int) -> float:
+        """Tension d'une voie, réduite sur cfg.samples conversions"""
+        self.open()
+        cfg = self.channels[channel]
+        self._configure(cfg.gain, cfg.data_rate)
+        analog_in = self._inputs[channel]
+        if cfg.samples == 1:
+            return analog_in.voltage
+        voltages = [analog_in.convert_to_voltage(analog_in.value) for _ in range(cfg.samples)]
+        return REDUCERS[cfg.reducer](voltages)
+
+    def read_all(self) -> list[float]:
+        """Tensions de toutes les voies configurées, dans l'ordre des voies"""
+        return [self.read_channel(ch) for ch in sorted(self.channels)]
+
+    def capture(self, channel: int, count: int, data_rate: int = 860) -> list[float]:
+        """
+        Capture rapide en mode continu : le convertisseur enchaîne les
+        conversions et on ne lit que le registre de résultat.
+        Le mode single-shot et le débit de la voie sont restaurés ensuite.
+        """
+        if data_rate not in DATA_RATES:
+            raise ValueError(f"data_rate {data_rate} not in {DATA_RATES}")
+        self.open()
+        cfg = self.channels[channel]
+        analog_in = self._inputs[channel]
+        period = 1.0 / data_rate
+        Mode = adafruit().Mode
+        self._configure(cfg.gain, data_rate)
+        self.device.mode = Mode.CONTINUOUS
+        try:
+            values = []
+            next_read = time.monotonic()
+            for _ in range(count):
+                values.append(analog_in.value)
+                next_read += period
+                delay = next_read - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self.device.mode = Mode.SINGLE
+            self._configure(cfg.gain, cfg.data_rate)
+        return [analog_in.convert_to_voltage(v) for v in values]
@@ -0,0 +1,376 @@
+"""
+Enregistrement et rejeu des annonces BLE
+========================================
+Les callbacks BleakScanner ne voient que le trafic radio réel : les
+problèmes de terrain sont difficiles à reproduire. AdvRecorder écrit chaque
+annonce dans un fichier binaire compact en ajout seul, replay() le relit
+par mmap et rejoue les annonces dans les mêmes callbacks, en temps réel,
+accéléré ou à vitesse maximale, éventuellement dupliquées sur N adresses
+MAC clonées pour des tests de charge.
+
+Format (petit-boutiste) :
+    en-tête fichier : b"KADV" + version u16 + réservé u16
+    enregistrement  : horodatage f64, MAC 6 o, RSSI i8, longueur du nom u8,
+                      nb manufacturer_data u8, nb service_data u8, longueur du corps u16
+    corps           : nom utf-8, puis (id u16, longueur u8, données) par
+                      manufacturer_data, puis (UUID 16 o, longueur u8, données)
+                      par service_data
+
+Un enregistrement tronqué (coupure pendant l'écriture) termine la lecture.
+
+Usage :
+    python adv_capture.py record capture.kadv --duration 600
+    python adv_capture.py info capture.kadv
+    python adv_capture.py replay capture.kadv --speed 100 --clones 50
+    python adv_capture.py replay capture.kadv --max-speed
+"""
+
+import argparse
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from collections import Counter
+from typing import NamedTuple
+
+MAGIC = b"KADV"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+RECORD = struct.Struct("<d6sbBBBH")
+MFR_ENTRY = struct.Struct("<HB")
+FLUSH_INTERVAL = 5.0       # s entre deux écritures sur disque
+YIELD_EVERY = 256          # rejeu max : rend la main à la boucle asyncio tous les N enregistrements
+
+
+class CaptureError(Exception):
+    pass
+
+
+class ReplayAdvertisement(NamedTuple):
+    """Mêmes champs que bleak.backends.scanner.AdvertisementData"""
+    local_name: str | None
+    manufacturer_data: dict
+    service_data: dict
+    service_uuids: list
+    tx_power: int | None
+    rssi: int
+    platform_data: tuple
+
+
+class ReplayDevice:
+    """Équivalent minimal de BLEDevice pour les callbacks"""
+    __slots__ = ("address", "name", "details")
+
+    def __init__(self, address: str, name: str | None = None):
+        self.address = address
+        self.name = name
+        self.details = None
+
+    def __repr__(self):
+        return f"ReplayDevice({self.address}, {self.name})"
+
+
+class CapturedAdvertisement(NamedTuple):
+    timestamp: float
+    address: str
+    rssi: int
+    local_name: str | None
+    manufacturer_data: dict
+    service_data: dict
+
+
+def mac_to_bytes(address: str) -> bytes:
+    return bytes.fromhex(address.replace(":", "").replace("-", ""))
+
+
+def bytes_to_mac(raw: bytes) -> str:
+    return ":".join(f"{b:02X}" for b in raw)
+
+
+def clone_address(address: str, index: int) -> str:
+    """Adresse du clone n°index (0 = l'original) : les deux premiers octets sont XORés avec index"""
+    if not index:
+        return address.upper()
+    raw = bytearray(mac_to_bytes(address))
+    raw[0] ^= (index >> 8) & 0xFF
+    raw[1] ^= index & 0xFF
+    return bytes_to_mac(raw)
+
+
+def encode_record(timestamp: float, address: str, rssi: int, local_name, manufacturer_data, service_data) -> bytes:
+    name = (local_name or "").encode()[:255]
+    body = bytearray(name)
+    mfr = list(manufacturer_data.items())[:255]
+    svc = list(service_data.items())[:255]
+    for company_id, data in mfr:
+        data = bytes(data[:255])
+        body += MFR_ENTRY.pack(company_id, len(data))
+        body += data
+    for service_uuid, data in svc:
+        data = bytes(data[:255])
+        body += uuid.UUID(service_uuid).bytes
+        body.append(len(data))
+        body += data
+    rssi = max(-128, min(127, int(rssi if rssi is not None else -127)))
+    return RECORD.pack(timestamp, mac_to_bytes(address), rssi, len(name), len(mfr), len(svc), len(body)) + body
+
+
+class AdvRecorder:
+    def __init__(self, path: str, max_bytes: int | None = None, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.dropped = 0
+        self._file = open(path, "ab", buffering=64 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self._size = self._file.tell()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, device, advertisement_data, timestamp: float | None = None):
+        """Ajoute une annonce (device/advertisement_data tels que reçus par le callback Bleak)"""
+        if self._file is None:
+            return
+        data = encode_record(
+            time.time() if timestamp is None else timestamp,
+            device.address,
+            advertisement_data.rssi,
+            advertisement_data.local_name,
+            advertisement_data.manufacturer_data,
+            advertisement_data.service_data,
+        )
+        if self.max_bytes and self._size + len(data) > self.max_bytes:
+            if not self.dropped:
+                logging.warning("[CAPTURE] %s reached %d bytes, recording stopped", self.path, self._size)
+            self.dropped += 1
+            return
+        self._file.write(data)
+        self._size += len(data)
+        self.records += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+
+    def wrap(self, callback):
+        """Callback Bleak qui enregistre l'annonce puis appelle callback"""
+        def recording_callback(device, advertisement_data):
+            try:
+                self.record(device, advertisement_data)
+            except Exception as e:
+                logging.error("[CAPTURE] Recording failed: %s", e)
+            return callback(device, advertisement_data)
+        return recording_callback
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def iter_capture(path: str):
+    """Enregistrements d'une capture, lus par mmap du plus ancien au plus récent"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < FILE_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, _ = FILE_HEADER.unpack_from(mm, 0)
+            if magic != MAGIC:
+                raise CaptureError(f"{path} n'est pas une capture d'annonces")
+            if version != VERSION:
+                raise CaptureError(f"Version de capture {version} non supportée")
+            view = memoryview(mm)
+            try:
+                yield from _iter_records(view, FILE_HEADER.size)
+            finally:
+                view.release()
+
+
+def _iter_records(view, pos: int):
+    size = len(view)
+    while pos + RECORD.size <= size:
+        timestamp, mac, rssi, name_len, n_mfr, n_svc, body_len = RECORD.unpack_from(view, pos)
+        pos += RECORD.size
+        end = pos + body_len
+        if end > size:
+            logging.warning("[CAPTURE] Truncated record at offset %d, end of capture", pos - RECORD.size)
+            return
+        local_name = bytes(view[pos:pos + name_len]).decode(errors="replace") if name_len else None
+        p = pos + name_len
+        manufacturer_data = {}
+        for _ in range(n_mfr):
+            company_id, length = MFR_ENTRY.unpack_from(view, p)
+            p += MFR_ENTRY.size
+            manufacturer_data[company_id] = bytes(view[p:p + length])
+            p += length
+        service_data = {}
+        for _ in range(n_svc):
+            service_uuid = str(uuid.UUID(bytes=bytes(view[p:p + 16])))
+            length = view[p + 16]
+            p += 17
+            service_data[service_uuid] = bytes(view[p:p + length])
+            p += length
+        yield CapturedAdvertisement(timestamp, bytes_to_mac(mac), rssi, local_name, manufacturer_data, service_data)
+        pos = end
+
+
+def to_callback_args(record: CapturedAdvertisement, address: str | None = None):
+    """(device, advertisement_data) tels que les passerait BleakScanner"""
+    adv = ReplayAdvertisement(
+        record.local_name, record.manufacturer_data, record.service_data,
+        list(record.service_data), None, record.rssi, (),
+    )
+    return ReplayDevice(address or record.address, record.local_name), adv
+
+
+async def replay(path: str, callback, speed: float | None = 1.0, clones: int = 1, loops: int = 1) -> dict:
+    """
+    Rejoue une capture dans callback(device, advertisement_data).
+
+    speed : 1.0 = temps réel, 100 = cent fois plus vite, None = sans attente.
+    clones : chaque annonce est livrée sous clone_address(mac, 0..clones-1).
+    Les objets device/annonce sont construits une fois par enregistrement et
+    réutilisés à chaque boucle.
+    """
+    records = list(iter_capture(path))
+    clone_args = []
+    for record in records:
+        _, adv = to_callback_args(record)
+        devices = [ReplayDevice(clone_address(record.address, i), record.local_name) for i in range(clones)]
+        clone_args.append((record.timestamp, devices, adv))
+
+    loop = asyncio.get_running_loop()
+    delivered = 0
+    errors = 0
+    start = loop.time()
+    for _ in range(loops):
+        t0 = clone_args[0][0] if clone_args else 0.0
+        loop_start = loop.time()
+        for n, (timestamp, devices, adv) in enumerate(clone_args):
+            if speed:
+                delay = loop_start + (timestamp - t0) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif n % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            for device in devices:
+                try:
+                    callback(device, adv)
+                except Exception as e:
+                    errors += 1
+                    logging.error("[REPLAY] Callback failed for %s: %s", device.address, e)
+                delivered += 1
+    elapsed = loop.time() - start
+    return {
+        "records": len(records),
+        "delivered": delivered,
+        "errors": errors,
+        "elapsed": elapsed,
+        "rate": delivered / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+async def _record(path: str, duration: float, max_bytes: int | None):
+    from bleak import BleakScanner
+
+    with AdvRecorder(path, max_bytes=max_bytes) as recorder:
+        scanner = BleakScanner(detection_callback=recorder.wrap(lambda device, adv: None), scanning_mode="active")
+        await scanner.start()
+        logging.info("[CAPTURE] Recording to %s for %.0f s", path, duration)
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            await scanner.stop()
+        logging.info("[CAPTURE] %d advertisements recorded", recorder.records)
+
+
+def _info(path: str):
+    per_mac = Counter()
+    first = last = None
+    for record in iter_capture(path):
+        per_mac[record.address] += 1
+        first = record.timestamp if first is None else first
+        last = record.timestamp
+    total = sum(per_mac.values())
+    print(f"{path}: {total} annonces, {len(per_mac)} adresses, {os.path.getsize(path)} octets")
+    if total:
+        print(f"durée : {last - first:.1f} s")
+    for mac, count in per_mac.most_common(20):
+        print(f"  {mac}  {count}")
+
+
+async def _replay(args):
+    from testmulti import GlobalStateManager, VICTRON_KEY, VICTRON_MAC, LISTE_MAC_BTHOME
+
+    manager = GlobalStateManager(args.victron_key or VICTRON_KEY)
+    if args.ignore_window:
+        manager._est_dans_la_fenetre_d_ecoute = lambda: True
+    for i in range(args.clones):
+        manager.register_victron(clone_address(args.victron_mac or VICTRON_MAC, i))
+        for mac in args.bthome_mac or LISTE_MAC_BTHOME:
+            manager.register_bthome(clone_address(mac, i))
+
+    stats = await replay(
+        args.path, manager.handle_advertisement, None if args.max_speed else args.speed, args.clones, args.loops
+    )
+    print(
+        f"{stats['delivered']} annonces rejouées ({stats['records']} enregistrements x {args.clones} clones "
+        f"x {args.loops}) en {stats['elapsed']:.2f} s : {stats['rate']:.0f} annonces/s, {stats['errors']} erreurs"
+    )
+    print(f"cache : {manager.payload_cache.stats()}")
+    print(f"capteurs BTHome suivis : {len(manager.bthome_states)}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+    parser = argparse.ArgumentParser(description="Enregistrement / rejeu des annonces BLE")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_rec = sub.add_parser("record", help="Enregistre les annonces reçues")
+    p_rec.add_argument("path")
+    p_rec.add_argument("--duration", type=float, default=300.0, help="Durée en secondes")
+    p_rec.add_argument("--max-bytes", type=int, default=None, help="Taille maximale de la capture")
+
+    p_info = sub.add_parser("info", help="Résumé d'une capture")
+    p_info.add_argument("path")
+
+    p_rep = sub.add_parser("replay", help="Rejoue une capture dans GlobalStateManager")
+    p_rep.add_argument("path")
+    p_rep.add_argument("--speed", type=float, default=1.0, help="Facteur d'accélération (1 = temps réel)")
+    p_rep.add_argument("--max-speed", action="store_true", help="Sans attente entre les annonces")
+    p_rep.add_argument("--clones", type=int, default=1, help="Nombre de copies de chaque appareil")
+    p_rep.add_argument("--loops", type=int, default=1)
+    p_rep.add_argument("--victron-key")
+    p_rep.add_argument("--victron-mac")
+    p_rep.add_argument("--bthome-mac", action="append")
+    p_rep.add_argument("--ignore-window", action="store_true", help="Accepte le Victron hors fenêtre d'écoute")
+
+    args = parser.parse_args()
+    if args.cmd == "record":
+        asyncio.run(_record(args.path, args.duration, args.max_bytes))
+    elif args.cmd == "info":
+        _info(args.path)
+    else:
+        if args.clones < 1 or args.clones > 0xFFFF:
+            parser.error("--clones doit être entre 1 et 65535")
+        asyncio.run(_replay(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Assemblage des trames Antarion
+==============================
+Le régulateur répond à la commande OK par une trame ASCII de 39 chiffres
+découpée en notifications BLE : une tête (sans CR), une fin terminée par
+CR, puis un LF seul qui clôt la trame. Tête et fin peuvent arriver dans
+les deux ordres.
+
+FrameAssembler range chaque fragment dans un bytearray préalloué (tête ou
+fin) via memoryview, sans str intermédiaire, et ne publie au LF que si la
+trame complète a la bonne longueur et ne contient que des chiffres. Le
+protocole ne transporte pas de somme de contrôle : une trame tronquée,
+un fragment perdu ou des octets parasites sont rejetés et comptés.
+
+decode_frame lit les champs à largeur fixe de FIELDS directement sur les
+octets (un translate() puis de l'arithmétique), sans découpage ni int(str).
+"""
+
+FRAME_LENGTH = 39
+CR = 0x0D
+LF = 0x0A
+MAX_FRAGMENT = 64
+
+# Champs de 3 chiffres (position, diviseur) : courant 0.1 A, tension batterie 0.1 V,
+# puissance W, capacité Ah, énergie du jour Wh, tension panneaux 0.1 V
+FIELDS = (
+    ("charging_current", 0, 10),
+    ("battery_voltage", 3, 10),
+    ("charging_power", 6, 1),
+    ("charging_capacity", 11, 1),
+    ("energy_daily", 17, 1),
+    ("panel_voltage", 20, 10),
+)
+# Découpage affiché dans les logs
+LOG_SLICES = ((0, 3), (3, 6), (6, 9), (9, 11), (11, 14), (14, 17), (17, 20), (20, 23), (23, FRAME_LENGTH))
+
+# Chiffres ASCII -> valeur 0..9, tout autre octet -> 0xFF
+_DIGITS = bytes(b - 0x30 if 0x30 <= b <= 0x39 else 0xFF for b in range(256))
+
+
+class FrameError(ValueError):
+    pass
+
+
+def decode_frame(frame) -> dict:
+    """
+    Champs numériques d'une trame complète (sans CR/LF).
+    Lève FrameError si la longueur ou un caractère est invalide.
+    """
+    if len(frame) != FRAME_LENGTH:
+        raise FrameError(f"longueur {len(frame)} au lieu de {FRAME_LENGTH}")
+    values = bytes(frame).translate(_DIGITS)
+    if values.find(0xFF) >= 0:
+        raise FrameError(f"caractère non numérique dans {bytes(frame)!r}")
+    fields = {}
+    for name, position, divisor in FIELDS:
+        value = values[position] * 100 + values[position + 1] * 10 + values[position + 2]
+        # x / 10 donne déjà le flottant le plus proche de la valeur décimale, round() est inutile
+        fields[name] = value / divisor if divisor != 1 else value
+    return fields
+
+
+def format_frame(frame) -> str:
+    text = bytes(frame).decode("ascii", "replace")
+    return "|".join(text[a:b] for a, b in LOG_SLICES)
+
+
+class FrameAssembler:
+    __slots__ = ("_head", "_tail", "_head_len", "_tail_len", "last_frame",
+                 "frames", "rejected", "dropped")
+
+    def __init__(self):
+        self._head = bytearray(MAX_FRAGMENT)
+        self._tail = bytearray(MAX_FRAGMENT)
+        self._head_len = -1     # -1 = fragment absent
+        self._tail_len = -1
+        self.last_frame = b""
+        self.frames = 0         # trames publiées
+        self.rejected = 0       # trames complètes invalides (longueur, caractères)
+        self.dropped = 0        # fragments écrasés ou orphelins (LF ou CR perdu)
+
+    def reset(self):
+        self._head_len = self._tail_len = -1
+
+    def _store(self, slot: bytearray, view: memoryview, current_len: int) -> int:
+        if current_len >= 0:
+            self.dropped += 1
+        n = len(view)
+        if n > MAX_FRAGMENT:
+            self.dropped += 1
+            return -2           # fragment trop long : la trame sera rejetée
+        slot[:n] = view
+        return n
+
+    def feed(self, data) -> dict | None:
+        """
+        Ajoute une notification ; retourne les champs décodés quand elle
+        clôt une trame valide, sinon None.
+        """
+        view = memoryview(data)
+        n = len(view)
+        if not n:
+            return None
+        last = view[n - 1]
+        if last == LF:
+            if n > 1:
+                # Fin (avec ou sans CR) et LF dans la même notification
+                end = n - 2 if view[n - 2] == CR else n - 1
+                self._tail_len = self._store(self._tail, view[:end], self._tail_len)
+            return self._publish()
+        if self._head_len != -1 and self._tail_len != -1:
+            # Tête et fin déjà reçues mais pas de LF : sans lui on ne sait pas les
+            # apparier avec certitude, la paire est abandonnée plutôt que mélangée
+            self.dropped += 1
+            self.reset()
+        if last == CR:
+            self._tail_len = self._store(self._tail, view[:n - 1], self._tail_len)
+        else:
+            self._head_len = self._store(self._head, view, self._head_len)
+        return None
+
+    def _publish(self) -> dict | None:
+        head_len, tail_len = self._head_len, self._tail_len
+        self.reset()
+        if head_len < 0 and tail_len < 0:
+            self.dropped += 1
+            return None
+        if head_len == -2 or tail_len == -2:
+            self.rejected += 1
+            return None
+        frame = bytes(self._head[:max(head_len, 0)]) + bytes(self._tail[:max(tail_len, 0)])
+        try:
+            values = decode_frame(frame)
+        except FrameError:
+            self.rejected += 1
+            return None
+        self.frames += 1
+        self.last_frame = frame
+        return values
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "rejected": self.rejected, "dropped": self.dropped}
@@ -0,0 +1,182 @@
+"""
+Moteur de commandes AT sur une session série persistante
+========================================================
+  - un seul port série ouvert pour toute la durée du service
+  - lecture jusqu'au code résultat final (OK / ERROR / +CME ERROR / ...)
+    avec un timeout propre à chaque commande, au lieu d'une attente fixe
+  - séparation des URC (notifications non sollicitées du modem)
+  - diagnostic CREG/CGREG/CGATT/CSQ/CGDCONT en une passe
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+import serial
+
+DEFAULT_TIMEOUT = 2.0
+# Durées maximales documentées par les fabricants de modems
+COMMAND_TIMEOUTS = {
+    "AT+CFUN": 15.0,
+    "AT+CGACT": 150.0,
+    "AT+CGATT": 75.0,
+    "AT+COPS": 180.0,
+}
+FINAL_OK = "OK"
+FINAL_ERRORS = ("ERROR", "+CME ERROR", "+CMS ERROR", "NO CARRIER", "NO ANSWER", "BUSY")
+DIAGNOSTIC_COMMANDS = ("AT+CREG?", "AT+CGREG?", "AT+CGATT?", "AT+CSQ", "AT+CGDCONT?")
+
+_COMMAND_PREFIX = re.compile(r"^AT([+^&]\w+)")
+_REG_STAT = re.compile(r"\+C(?:E|G)?REG:\s*(\d+)\s*,\s*(\d+)")
+
+
+class ATResponse:
+    def __init__(self, command: str, lines: list[str], final: str | None, elapsed: float):
+        self.command = command
+        self.lines = lines
+        self.final = final          # None si timeout
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.final == FINAL_OK
+
+    @property
+    def text(self) -> str:
+        """Réponse complète (lignes + code final), pour les tests de sous-chaîne"""
+        return "\n".join(self.lines + ([self.final] if self.final else []))
+
+    def __repr__(self):
+        return f"ATResponse({self.command!r}, lines={self.lines}, final={self.final!r}, {self.elapsed * 1000:.0f} ms)"
+
+
+def is_final(line: str) -> bool:
+    return line == FINAL_OK or line.startswith(FINAL_ERRORS)
+
+
+def registration_status(text: str) -> int | None:
+    """Statut d'enregistrement (0..5) extrait d'une réponse +CREG/+CGREG/+CEREG"""
+    match = _REG_STAT.search(text)
+    return int(match.group(2)) if match else None
+
+
+def csq_to_dbm(text: str) -> int | None:
+    """Convertit la réponse +CSQ: <rssi>,<ber> en dBm (None si inconnu)"""
+    match = re.search(r"\+CSQ:\s*(\d+)", text)
+    if not match:
+        return None
+    rssi = int(match.group(1))
+    if rssi == 99:
+        return None
+    return -113 + 2 * rssi
+
+
+class ATSession:
+    def __init__(self, port: str, baudrate: int, urc_maxlen: int = 50):
+        self.port = port
+        self.baudrate = baudrate
+        self.ser = None
+        self.urcs = deque(maxlen=urc_maxlen)
+        self.urc_handlers = []
+        self._pending = b""
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Ouvre le port si nécessaire (réutilisé ensuite pour toutes les commandes)"""
+        if self.ser is not None and self.ser.is_open:
+            return
+        # Timeout court : readline() rend la main souvent pour vérifier l'échéance
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=0.05)
+        self.ser.reset_input_buffer()
+        self._pending = b""
+        logging.info("[AT] Serial session opened on %s", self.port)
+
+    def close(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception as e:
+                logging.info("[AT] Error closing serial port: %s", e)
+        self.ser = None
+        self._pending = b""
+
+    def _readline(self) -> str | None:
+        """Retourne une ligne complète ou None si rien de complet n'est arrivé"""
+        chunk = self.ser.readline()
+        if chunk:
+            self._pending += chunk
+        if not self._pending.endswith(b"\n"):
+            return None
+        line, self._pending = self._pending, b""
+        return line.decode(errors="ignore").strip()
+
+    def _handle_urc(self, line: str):
+        self.urcs.append((time.time(), line))
+        logging.debug("[AT] URC: %s", line)
+        for handler in self.urc_handlers:
+            try:
+                handler(line)
+            except Exception as e:
+                logging.error("[AT] URC handler error: %s", e)
+
+    def poll_urcs(self):
+        """Consomme les URC déjà reçues sans envoyer de commande"""
+        with self._lock:
+            self.open()
+            while self.ser.in_waiting or self._pending:
+                line = self._readline()
+                if line is None:
+                    break
+                if line:
+                    self._handle_urc(line)
+
+    def command(self, command: str, timeout: float | None = None) -> ATResponse:
+        """
+        Envoie une commande et lit jusqu'au code résultat final.
+        Les lignes commençant par + qui ne correspondent pas à la commande
+        sont traitées comme des URC.
+        """
+        if timeout is None:
+            timeout = DEFAULT_TIMEOUT
+            for prefix, value in COMMAND_TIMEOUTS.items():
+                if command.startswith(prefix):
+                    timeout = value
+                    break
+        match = _COMMAND_PREFIX.match(command)
+        expected = match.group(1) if match else None
+
+        with self._lock:
+            self.open()
+            # URC arrivées entre deux commandes
+            while self.ser.in_waiting:
+                line = self._readline()
+                if line is None:
+                    break
+                if line:
+                    self._handle_urc(line)
+
+            start = time.monotonic()
+            self.ser.write((command + "\r").encode())
+            lines = []
+            while time.monotonic() - start < timeout:
+                line = self._readline()
+                if not line or line == command:  # rien de complet, ligne vide ou écho
+                    continue
+                if is_final(line):
+                    return ATResponse(command, lines, line, time.monotonic() - start)
+                if line[0] in "+^" and (expected is None or not line.startswith(expected)):
+                    self._handle_urc(line)
+                    continue
+                lines.append(line)
+
+        logging.info("[AT] Timeout after %.1fs waiting for %s", timeout, command)
+        return ATResponse(command, lines, None, time.monotonic() - start)
+
+    def batch(self, commands) -> dict[str, ATResponse]:
+        return {cmd: self.command(cmd) for cmd in commands}
+
+    def diagnostics(self) -> dict[str, ATResponse]:
+        """Diagnostic réseau complet en une passe sur la session ouverte"""
+        return self.batch(DIAGNOSTIC_COMMANDS)
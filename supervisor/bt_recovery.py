@@ -0,0 +1,236 @@
+"""
+Récupération Bluetooth graduée et non bloquante
+===============================================
+Tâche asyncio qui surveille deux symptômes mesurés :
+
+  - silence : aucune annonce BLE reçue pendant silence_timeout secondes
+    d'écoute (listening : temps où le scanner devait tourner, les pauses
+    du duty cycle exclues ; temps écoulé à défaut)
+  - erreurs : error_threshold BleakError (ou équivalent) en error_window s
+
+et applique, tant que le symptôme persiste, des remèdes de plus en plus
+lourds, un niveau à la fois, en laissant settle_time secondes au système
+pour se rétablir entre deux niveaux :
+
+    1. redémarrage du scanner BLE
+    2. power off / on de l'adaptateur (bluetoothctl)
+    3. redémarrage du service bluetooth (BlueZ)
+    4. rechargement du module noyau hci_uart
+
+Les commandes passent par des sous-processus asyncio avec délai maximal
+et les attentes par asyncio.sleep : le scanner, la lecture ADS1115 et
+l'envoi continuent pendant la récupération. Après reset_after secondes
+sans symptôme, on repart du niveau 1.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+LEVEL_NONE = 0
+LEVEL_SCANNER = 1
+LEVEL_POWER_CYCLE = 2
+LEVEL_BLUEZ = 3
+LEVEL_HCI_UART = 4
+LEVEL_NAMES = {
+    LEVEL_SCANNER: "restart_scanner",
+    LEVEL_POWER_CYCLE: "power_cycle_adapter",
+    LEVEL_BLUEZ: "restart_bluez",
+    LEVEL_HCI_UART: "reload_hci_uart",
+}
+
+SILENCE_TIMEOUT = 180       # secondes sans annonce avant d'agir
+ERROR_THRESHOLD = 5         # erreurs BLE ...
+ERROR_WINDOW = 300          # ... dans cette fenêtre (s)
+SETTLE_TIME = 60            # délai de rétablissement avant le niveau suivant
+RESET_AFTER = 900           # secondes sans symptôme pour revenir au niveau 1
+CHECK_INTERVAL = 10
+COMMAND_TIMEOUT = 20
+
+# Étapes de chaque niveau : commande, ou durée d'attente en secondes
+STEPS = {
+    LEVEL_POWER_CYCLE: (
+        ["bluetoothctl", "power", "off"],
+        1,
+        ["bluetoothctl", "power", "on"],
+    ),
+    LEVEL_BLUEZ: (
+        ["sudo", "systemctl", "restart", "bluetooth"],
+        2,
+        ["bluetoothctl", "power", "on"],
+    ),
+    LEVEL_HCI_UART: (
+        ["bluetoothctl", "power", "off"],
+        ["sudo", "systemctl", "stop", "bluetooth"],
+        ["sudo", "rmmod", "hci_uart"],
+        2,
+        ["sudo", "modprobe", "hci_uart"],
+        1,
+        ["sudo", "systemctl", "start", "bluetooth"],
+        1,
+        ["bluetoothctl", "power", "on"],
+        2,
+    ),
+}
+
+
+async def run_command(cmd: list[str], timeout: float = COMMAND_TIMEOUT) -> bool:
+    """Commande non bloquante, True si elle se termine avec le code 0 dans le délai"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        logging.info("[BTR] [✗] %s: %s", " ".join(cmd), e)
+        return False
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        logging.info("[BTR] [✗] %s: timeout after %d s", " ".join(cmd), timeout)
+        return False
+    if proc.returncode != 0:
+        logging.info("[BTR] [✗] %s: %s", " ".join(cmd), stderr.decode(errors="ignore").strip())
+        return False
+    logging.info("[BTR] [✓] %s", " ".join(cmd))
+    return True
+
+
+class BluetoothRecovery:
+    def __init__(self, restart_scanner=None, activity=None, silence_timeout=SILENCE_TIMEOUT,
+                 error_threshold=ERROR_THRESHOLD, error_window=ERROR_WINDOW, settle_time=SETTLE_TIME,
+                 reset_after=RESET_AFTER, check_interval=CHECK_INTERVAL, run=run_command, sleep=asyncio.sleep,
+                 listening=None):
+        # restart_scanner : coroutine sans argument qui arrête et relance le scanner (niveau 1
+        # et fin des niveaux suivants) ; activity : nombre d'annonces reçues depuis le démarrage
+        # (compteur lu à chaque vérification), None = surveillance du silence désactivée
+        # listening : secondes cumulées où le scanner devait écouter (ScanScheduler.listening_time),
+        # None = le silence se mesure en temps écoulé
+        self.restart_scanner = restart_scanner
+        self.activity = activity
+        self.listening = listening
+        self.silence_timeout = silence_timeout
+        self.error_threshold = error_threshold
+        self.error_window = error_window
+        self.settle_time = settle_time
+        self.reset_after = reset_after
+        self.check_interval = check_interval
+        self.run = run
+        self.sleep = sleep
+
+        self.level = LEVEL_NONE
+        self.started_at = time.monotonic()
+        self.last_seen = self.started_at    # dernière évolution du compteur d'annonces
+        self._last_count = None
+        self._quiet_from = self._listened(self.started_at)  # début du silence en cours (échelle _listened)
+        self.last_action = None         # instant du dernier remède
+        self.last_symptom = None
+        self.actions = {name: 0 for name in LEVEL_NAMES.values()}
+        self._errors = deque()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="bt-recovery")
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def report_error(self, error=None, now: float | None = None):
+        """Signale une erreur BLE (connexion, scanner...) : compte pour le symptôme "erreurs" """
+        now = time.monotonic() if now is None else now
+        self._errors.append(now)
+        logging.debug("[BTR] BLE error reported: %s", error)
+
+    def _listened(self, now: float) -> float:
+        return self.listening() if self.listening is not None else now
+
+    def symptom(self, now: float | None = None) -> str | None:
+        """"silence", "errors" ou None"""
+        now = time.monotonic() if now is None else now
+        errors = self._errors
+        while errors and now - errors[0] > self.error_window:
+            errors.popleft()
+        if len(errors) >= self.error_threshold:
+            return "errors"
+        if self.activity is not None:
+            listened = self._listened(now)
+            count = self.activity()
+            if count != self._last_count:
+                if self._last_count is not None:
+                    self.last_seen = now
+                    self._quiet_from = listened
+                self._last_count = count
+            if listened - self._quiet_from > self.silence_timeout:
+                return "silence"
+        return None
+
+    async def check_once(self, now: float | None = None):
+        """Une évaluation : remède du niveau suivant si un symptôme persiste après le délai de rétablissement"""
+        now = time.monotonic() if now is None else now
+        symptom = self.symptom(now)
+        if symptom is None:
+            if self.level and self.last_action is not None and now - self.last_action >= self.reset_after:
+                logging.info("[BTR] Bluetooth healthy for %d s, recovery level reset", now - self.last_action)
+                self.level = LEVEL_NONE
+            return
+        if self.last_action is not None and now - self.last_action < self.settle_time:
+            return
+        await self.escalate(symptom, now)
+
+    async def escalate(self, reason: str = "manual", now: float | None = None):
+        """Applique le niveau suivant (le dernier se répète)"""
+        async with self._lock:
+            level = min(self.level + 1, LEVEL_HCI_UART)
+            logging.warning("[BTR] Bluetooth %s, recovery level %d: %s", reason, level, LEVEL_NAMES[level])
+            self.last_symptom = reason
+            self._errors.clear()
+            await self.recover(level)
+            self.level = level
+            self.last_action = time.monotonic() if now is None else now
+            # Le silence se compte à nouveau à partir du remède
+            self._quiet_from = self._listened(self.last_action)
+
+    async def recover(self, level: int) -> bool:
+        """Exécute les étapes d'un niveau puis relance le scanner ; False si une étape a échoué"""
+        self.actions[LEVEL_NAMES[level]] += 1
+        ok = True
+        for step in STEPS.get(level, ()):
+            if isinstance(step, (int, float)):
+                await self.sleep(step)
+            elif not await self.run(step):
+                ok = False
+        if self.restart_scanner is not None:
+            try:
+                await self.restart_scanner()
+            except Exception as e:
+                logging.error("[BTR] Scanner restart failed: %s", e)
+                self.report_error(e)
+                ok = False
+        return ok
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("[BTR] Recovery check error: %s", e)
+
+    def stats(self) -> dict:
+        return {"level": self.level, "last_symptom": self.last_symptom, **self.actions}
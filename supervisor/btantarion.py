@@ -1,14 +1,21 @@
 import asyncio
-import subprocess
 import logging
-import time
 from datetime import datetime
-from bleak import BleakClient
+from bleak import BleakClient, BleakScanner
+from bleak.exc import BleakError
 from tstbthome import scan
+from antarion_frame import FrameAssembler, format_frame
+from bt_recovery import BluetoothRecovery, LEVEL_HCI_UART
+
+NOTIFY_HANDLE = 0x000e
+RECONNECT_MIN = 5           # secondes avant la première reconnexion après échec
+RECONNECT_MAX = 300
 
 
 class Btantarion:
-    def __init__(self, scan_addresses=None):
+    client_class = BleakClient
+
+    def __init__(self, scan_addresses=None, recovery=None):
         self.state = {
             "charging_current": 0,
             "charging_capacity": 0,
@@ -23,177 +30,146 @@ class Btantarion:
             "bt_light": ""
         }
         self.scan_addresses = [address.upper() for address in scan_addresses] if scan_addresses else None
-        self.notif_14_buffer = ""
-        self.restart_bluetooth()
+        self.assembler = FrameAssembler()
+        # Échecs de connexion signalés au gestionnaire de récupération (partagé avec le scanner s'il existe)
+        self.recovery = recovery or BluetoothRecovery()
         self.address = "00:0D:18:05:53:24"
         self.write_command = bytearray([0x4F, 0x4B])
         self.write_uuid = "00002af1-0000-1000-8000-00805f9b34fb"
         self.scan_duration = 45
-
-    def restart_bluetooth(self):
-        """Restart Bluetooth and HCI UART module"""
-        logging.info("[BTS] Restarting Bluetooth...")
-        commands = [
-            ("Turning Bluetooth power off", ["bluetoothctl", "power", "off"]),
-            ("Stopping bluetooth service", ["sudo", "systemctl", "stop", "bluetooth"]),
-            ("Unloading hci_uart module", ["sudo", "rmmod", "hci_uart"]),
-            ("Waiting 2 seconds", None),
-            ("Loading hci_uart module", ["sudo", "modprobe", "hci_uart"]),
-            ("Waiting 1 seconds", None),
-            ("Starting bluetooth service", ["sudo", "systemctl", "start", "bluetooth"]),
-            ("Waiting 1 seconds", None),
-            ("Turning Bluetooth power on", ["bluetoothctl", "power", "on"]),
-            ("Waiting 2 seconds", None),
-        ]
-
-        for step_name, cmd in commands:
-            try:
-                logging.info("[BTS] [*] %s...", step_name)
-
-                if cmd is None:  # Sleep step
-                    time.sleep(2)
-                else:
-                    result = subprocess.run(cmd, check=True, capture_output=False, text=True, timeout=20)
-                    if result.stdout:
-                        logging.info("    %s", result.stdout.strip())
-
-                logging.info("[BTS] [✓] %s done", step_name)
-
-            except subprocess.CalledProcessError as e:
-                logging.info("[BTS] [✗] Error during %s: %s", step_name, e.stderr)
-                continue
-            except Exception as e:
-                logging.info("[BTS] [✗] Unexpected error: %s", e)
-                continue
-        logging.info("[BTS] [✓] Bluetooth restart completed successfully")
-        return True
+        self.reconnect_min = RECONNECT_MIN
+        self.reconnect_max = RECONNECT_MAX
+        self.connections = 0
+        self.polls = 0
+        self._device = None         # BLEDevice de la dernière connexion
+        self._write_char = None     # caractéristique OK résolue à la première connexion
+        self._scan_task = None
+
+    async def restart_bluetooth(self):
+        """Redémarrage complet du Bluetooth (rechargement hci_uart), sans bloquer la boucle"""
+        await self.recovery.recover(LEVEL_HCI_UART)
 
     async def run(self, loop=90):
-        errors = 0
+        """
+        Session GATT persistante : connexion, découverte des services et
+        souscription aux notifications une seule fois, puis commande OK
+        toutes les loop secondes tant que la liaison tient. Reconnexion
+        avec backoff exponentiel uniquement après un échec.
+        """
+        if self.scan_addresses and self._scan_task is None:
+            # Le scan BTHome tourne en parallèle de la session, plus avant chaque requête
+            self._scan_task = asyncio.create_task(self._scan_loop(), name="bthome-scan")
+        if not self.recovery.running:
+            self.recovery.start()
+        delay = self.reconnect_min
         while True:
+            polls = self.polls
+            error = None
             try:
-                if self.scan_addresses:
-                    logging.info("[BTS] BTHome scan for %d seconds before MPPT poll", self.scan_duration)
-                    await scan(
-                        target_address=self.scan_addresses,
-                        duration=self.scan_duration,
-                        state_obj=self
-                    )
-
-                logging.info("[BTS] -------> Tentative de connexion au MPPT... device: %s", self.address)
-
-                async with BleakClient(self.address, timeout=10.0) as client:
-                    # Affichage des services
-                    for service in client.services:
-                        logging.info("[BTS] Service: %s", service.uuid)
-                        for char in service.characteristics:
-                            logging.info(
-                                "  Char: %s, Handle: %s, Properties: %s",
-                                char.uuid,
-                                char.handle,
-                                char.properties
-                            )
-                async with BleakClient(self.address, timeout=10.0) as client:
-                    # Souscrire à toutes les notifications sur le handle 0x000f
-
-                    try:
-                        logging.info("[BTS] Nettoyage des notifications existantes...")
-                        await client.stop_notify(0x000e)
-                    except Exception as e:
-                        logging.error("[BTS] Erreur lors de l'arrêt des notifications existantes: %s", e)
-                        continue
-
-                    try:
-                        logging.info("[BTS] Souscription aux notifications...")
-                        await client.start_notify(
-                            0x000e,
-                            self.notification_handler
-                        )
-                    except Exception as e:
-                        logging.error("[BTS] lors de la souscription aux notifications: %s", e)
-                        continue
-                    while True:
-                        try:
-                            logging.info("[BTS] Envoi requete et attente notification...")
-                            await client.write_gatt_char(
-                                self.write_uuid,
-                                self.write_command,
-                                response=True
-                            )
-                        except Exception as e:
-                            logging.error("[BTS] Erreur lors de l'envoi de la requête: %s", e)
-                            break
-                        logging.info("[BTS] En écoute des notifications sur handle 0x000e...")
-                        await asyncio.sleep(loop)
-                        break
+                await self.session(loop)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logging.error("Erreur Bleak : %s", e)
-                errors += 1
-                if errors >= 10:
-                    logging.info("[BTS] Trop d'erreurs, redémarrage du Bluetooth")
-                    self.restart_bluetooth()
-                    errors = 0
-                else:
-                    await asyncio.sleep(5)
+                error = e
+            if self.polls > polls:
+                # La session a fonctionné : reconnexion rapide
+                delay = self.reconnect_min
                 continue
+            # Les échecs répétés déclenchent la récupération graduée (tâche de fond)
+            self.recovery.report_error(error or "MPPT session without any poll")
+            self._device = None     # nouvelle recherche de l'adresse à la prochaine tentative
+            logging.info("[BTS] Nouvelle tentative de connexion dans %.0f s", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max)
+
+    async def session(self, poll_interval):
+        """Une connexion au MPPT, jusqu'à sa perte (retour) ou une erreur (exception)"""
+        disconnected = asyncio.Event()
+        logging.info("[BTS] -------> Tentative de connexion au MPPT... device: %s", self.address)
+        if self._device is None:
+            # Recherche de l'adresse une seule fois : les reconnexions réutilisent le BLEDevice
+            self._device = await self.find_device()
+        client = self.client_class(
+            self._device, timeout=10.0,
+            disconnected_callback=lambda _client: disconnected.set(),
+        )
+        # Services GATT mis en cache par bleak (BlueZ) après la première découverte
+        await client.connect(dangerous_use_bleak_cache=True)
+        self.connections += 1
+        try:
+            if self._write_char is None:
+                # Affichage des services, une seule fois
+                for service in client.services:
+                    logging.info("[BTS] Service: %s", service.uuid)
+                    for char in service.characteristics:
+                        logging.info(
+                            "  Char: %s, Handle: %s, Properties: %s",
+                            char.uuid,
+                            char.handle,
+                            char.properties
+                        )
+            self._write_char = client.services.get_characteristic(self.write_uuid) or self.write_uuid
+
+            logging.info("[BTS] Souscription aux notifications...")
+            await client.start_notify(NOTIFY_HANDLE, self.notification_handler)
+            logging.info("[BTS] En écoute des notifications sur handle 0x%04x...", NOTIFY_HANDLE)
+            while client.is_connected:
+                logging.debug("[BTS] Envoi requete OK...")
+                await client.write_gatt_char(self._write_char, self.write_command, response=True)
+                self.polls += 1
+                try:
+                    await asyncio.wait_for(disconnected.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    continue
+            logging.warning("[BTS] Connexion au MPPT perdue")
+        finally:
+            if client.is_connected:
+                try:
+                    await client.disconnect()
+                except Exception as e:
+                    logging.debug("[BTS] Erreur à la déconnexion: %s", e)
+
+    async def find_device(self):
+        device = await BleakScanner.find_device_by_address(self.address, timeout=10.0)
+        if device is None:
+            raise BleakError(f"MPPT {self.address} introuvable")
+        return device
+
+    async def _scan_loop(self):
+        while True:
+            try:
+                await scan(target_address=self.scan_addresses, duration=self.scan_duration, state_obj=self)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("[BTS] Erreur scan BTHome: %s", e)
+                await asyncio.sleep(self.reconnect_min)
 
     def parse_notification(self, data: bytearray):
-        # convertir bytes ASCII en string
-        s = data.decode('ascii')
-        logging.debug("[BTS] Trame reçue: de %d caractères: %s", len(s), s)
-        if data[-1] == 0x0d:  # CR à la fin
-            s = data[:-1].decode('ascii')
-            self.notif_14_buffer += s
-        elif len(data) == 1 and data[-1] == 0x0a:
-            self.state["charging_current"] = int(
-                self.notif_14_buffer[0:3]
-            ) / 10  # 001 → 0.1 A
-            self.state["battery_voltage"] = round(
-                int(self.notif_14_buffer[3:6]) / 10, 2
-            )  # 1280 → 12.8 V
-            self.state["charging_power"] = int(
-                self.notif_14_buffer[6:9]
-            )    # 050 → 50 W
-            self.state["panel_voltage"] = round(
-                int(self.notif_14_buffer[20:23]) / 10, 1
-            )  # 1280→ 12.8 V
-            self.state["charging_capacity"] = int(
-                self.notif_14_buffer[11:14])  # 128→ 128 Ah
-            self.state["energy_daily"] = int(
-                self.notif_14_buffer[17:20])  # 1280 → 1280 Wh
-            self.state["last_update"] = datetime.now().isoformat()
-            out = (
-                f"{self.notif_14_buffer[0:3]}|"
-                f"{self.notif_14_buffer[3:6]}|"
-                f"{self.notif_14_buffer[6:9]}|"
-                f"{self.notif_14_buffer[9:11]}|"
-                f"{self.notif_14_buffer[11:14]}|"
-                f"{self.notif_14_buffer[14:17]}|"
-                f"{self.notif_14_buffer[17:20]}|"
-                f"{self.notif_14_buffer[20:23]}|"
-                f"{self.notif_14_buffer[23:]}"
-            )
-            logging.info("[BTS] Trame complète: %s", out)
-            self.notif_14_buffer = ""
-            logging.info(
-                "[BTS] ---> U batterie: %sV, U panneau: %sV, Courant: %sA, "
-                "Puissance: %sW , Capacité: %sAh, Energie quotidienne: %sWh",
-                self.state["battery_voltage"],
-                self.state["panel_voltage"],
-                self.state["charging_current"],
-                self.state["charging_power"],
-                self.state["charging_capacity"],
-                self.state["energy_daily"]
-            )
-        else:
-            s = data.decode('ascii')
-            self.notif_14_buffer = s + self.notif_14_buffer
-            logging.debug("[BTS] ... trame #1: %s", s)
-            # 004127005000000000052160000000000000000
+        """Ajoute une notification à la trame en cours ; met à jour l'état quand elle est complète et valide"""
+        rejected = self.assembler.rejected
+        values = self.assembler.feed(data)
+        if values is None:
+            if self.assembler.rejected != rejected:
+                logging.warning("[BTS] Trame invalide ignorée %s", self.assembler.stats())
+            return
+        self.state.update(values)
+        self.state["last_update"] = datetime.now().isoformat()
+        logging.info("[BTS] Trame complète: %s", format_frame(self.assembler.last_frame))
+        logging.info(
+            "[BTS] ---> U batterie: %sV, U panneau: %sV, Courant: %sA, "
+            "Puissance: %sW , Capacité: %sAh, Energie quotidienne: %sWh",
+            self.state["battery_voltage"],
+            self.state["panel_voltage"],
+            self.state["charging_current"],
+            self.state["charging_power"],
+            self.state["charging_capacity"],
+            self.state["energy_daily"]
+        )
 
     def notification_handler(self, handle, data):
-        hex_str = data.hex()
-        logging.info("[BTS] Notification reçue (handle: %s): %s ", handle, hex_str)
+        logging.debug("[BTS] Notification reçue (handle: %s): %s ", handle, data.hex())
         self.parse_notification(data)
 
     def get_state(self):
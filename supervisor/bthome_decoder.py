@@ -0,0 +1,426 @@
+"""
+Décodeur BTHome v2 piloté par table
+===================================
+Une payload BTHome (après l'octet Device Information) est une suite
+d'objets : identifiant sur un octet puis valeur de longueur fixe, sauf
+texte et données brutes (0x53, 0x54) précédés de leur longueur.
+
+OBJECTS décrit tous les identifiants de la spécification v2 (capteurs,
+capteurs binaires, événements, informations appareil) : clé du résultat,
+longueur, lecture (struct.Struct précompilé ou octet direct), diviseur
+d'échelle et conversion éventuelle. decode_frame parcourt la payload en
+une passe, avec une table indexée par identifiant (256 entrées).
+
+  - clés historiques conservées (temperature_c, humidity_pct, battery_pct,
+    light / light_raw, button_event, device_type_id, firmware_u32/u24)
+  - un objet répété reçoit un suffixe : temperature_c, temperature_c_2...
+  - identifiant inconnu : sa longueur l'est aussi, le décodage s'arrête
+    (unknown_object) au lieu de mal interpréter la suite
+  - decode_frames décode une liste de payloads d'un coup
+
+BTHomeDevice traite la donnée de service 0xFCD2 complète d'un appareil :
+octet Device Information, puis objets en clair ou chiffrés (AES-CCM,
+tag de 4 octets). Le contexte de chiffrement est créé une fois par
+appareil à partir de sa bindkey ; le compteur de chiffrement doit
+augmenter d'une trame à l'autre (rejeu refusé). Un compteur repassé
+près de zéro (pile changée) n'est adopté qu'après RESTART_CONFIRMATIONS
+trames authentiques consécutives à compteurs croissants : une seule
+ancienne trame rejouée ne fait pas reculer le compteur. entity_values() donne
+les valeurs numériques sous les noms utilisés par bthome_ble
+(temperature, humidity, battery...).
+"""
+
+import logging
+import struct
+
+# Valeurs du capteur de lumière 0x1E (trois niveaux sur ce firmware)
+LIGHT_LEVELS = {0: "dark", 1: "twilight", 2: "bright"}
+BUTTON_EVENTS = {
+    0x00: "none", 0x01: "short_press", 0x02: "double_press", 0x03: "triple_press",
+    0x04: "long_press", 0x05: "long_double_press", 0x06: "long_triple_press", 0x80: "hold_press",
+}
+DIMMER_EVENTS = {0x00: "none", 0x01: "rotate_left", 0x02: "rotate_right"}
+
+_U16 = struct.Struct("<H").unpack_from
+_S16 = struct.Struct("<h").unpack_from
+_U32 = struct.Struct("<I").unpack_from
+_S32 = struct.Struct("<i").unpack_from
+_S8 = struct.Struct("<b").unpack_from
+
+
+def _u24(data, pos):
+    return (data[pos] | data[pos + 1] << 8 | data[pos + 2] << 16,)
+
+
+# Lecture : None = un octet non signé lu directement
+_READERS = {"u8": (1, None), "s8": (1, _S8), "u16": (2, _U16), "s16": (2, _S16),
+            "u24": (3, _u24), "u32": (4, _U32), "s32": (4, _S32)}
+
+
+def _light(raw):
+    return LIGHT_LEVELS.get(raw, f"?({raw})")
+
+
+def _button(raw):
+    return BUTTON_EVENTS.get(raw, f"?({raw})")
+
+
+# identifiant : (clé, format, diviseur, conversion)
+OBJECTS = {
+    # Capteurs
+    0x00: ("packet_id", "u8", 1, None),
+    0x01: ("battery_pct", "u8", 1, None),
+    0x02: ("temperature_c", "s16", 100, None),
+    0x03: ("humidity_pct", "u16", 100, None),
+    0x04: ("pressure_hpa", "u24", 100, None),
+    0x05: ("illuminance_lux", "u24", 100, None),
+    0x06: ("mass_kg", "u16", 100, None),
+    0x07: ("mass_lb", "u16", 100, None),
+    0x08: ("dewpoint_c", "s16", 100, None),
+    0x09: ("count", "u8", 1, None),
+    0x0A: ("energy_kwh", "u24", 1000, None),
+    0x0B: ("power_w", "u24", 100, None),
+    0x0C: ("voltage_v", "u16", 1000, None),
+    0x0D: ("pm25_ugm3", "u16", 1, None),
+    0x0E: ("pm10_ugm3", "u16", 1, None),
+    # Capteurs binaires
+    0x0F: ("generic_boolean", "u8", 1, bool),
+    0x10: ("power_on", "u8", 1, bool),
+    0x11: ("opening", "u8", 1, bool),
+    0x12: ("co2_ppm", "u16", 1, None),
+    0x13: ("tvoc_ugm3", "u16", 1, None),
+    0x14: ("moisture_pct", "u16", 100, None),
+    0x15: ("battery_low", "u8", 1, bool),
+    0x16: ("battery_charging", "u8", 1, bool),
+    0x17: ("carbon_monoxide", "u8", 1, bool),
+    0x18: ("cold", "u8", 1, bool),
+    0x19: ("connectivity", "u8", 1, bool),
+    0x1A: ("door", "u8", 1, bool),
+    0x1B: ("garage_door", "u8", 1, bool),
+    0x1C: ("gas", "u8", 1, bool),
+    0x1D: ("heat", "u8", 1, bool),
+    0x1E: ("light", "u8", 1, _light),
+    0x1F: ("lock", "u8", 1, bool),
+    0x20: ("moisture", "u8", 1, bool),
+    0x21: ("motion", "u8", 1, bool),
+    0x22: ("moving", "u8", 1, bool),
+    0x23: ("occupancy", "u8", 1, bool),
+    0x24: ("plug", "u8", 1, bool),
+    0x25: ("presence", "u8", 1, bool),
+    0x26: ("problem", "u8", 1, bool),
+    0x27: ("running", "u8", 1, bool),
+    0x28: ("safety", "u8", 1, bool),
+    0x29: ("smoke", "u8", 1, bool),
+    0x2A: ("sound", "u8", 1, bool),
+    0x2B: ("tamper", "u8", 1, bool),
+    0x2C: ("vibration", "u8", 1, bool),
+    0x2D: ("window", "u8", 1, bool),
+    0x2E: ("humidity_pct", "u8", 1, None),
+    0x2F: ("moisture_pct", "u8", 1, None),
+    # Événements
+    0x3A: ("button_event", "u8", 1, _button),
+    0x3C: ("dimmer_event", "u16", 1, None),     # traité à part : événement + nombre de pas
+    # Capteurs (suite)
+    0x3D: ("count", "u16", 1, None),
+    0x3E: ("count", "u32", 1, None),
+    0x3F: ("rotation_deg", "s16", 10, None),
+    0x40: ("distance_mm", "u16", 1, None),
+    0x41: ("distance_m", "u16", 10, None),
+    0x42: ("duration_s", "u24", 1000, None),
+    0x43: ("current_a", "u16", 1000, None),
+    0x44: ("speed_ms", "u16", 100, None),
+    0x45: ("temperature_c", "s16", 10, None),
+    0x46: ("uv_index", "u8", 10, None),
+    0x47: ("volume_l", "u16", 10, None),
+    0x48: ("volume_ml", "u16", 1, None),
+    0x49: ("volume_flow_rate_m3h", "u16", 1000, None),
+    0x4A: ("voltage_v", "u16", 10, None),
+    0x4B: ("gas_m3", "u24", 1000, None),
+    0x4C: ("gas_m3", "u32", 1000, None),
+    0x4D: ("energy_kwh", "u32", 1000, None),
+    0x4E: ("volume_l", "u32", 1000, None),
+    0x4F: ("water_l", "u32", 1000, None),
+    0x50: ("timestamp", "u32", 1, None),
+    0x51: ("acceleration_ms2", "u16", 1000, None),
+    0x52: ("gyroscope_dps", "u16", 1000, None),
+    0x53: ("text", "var", 1, None),
+    0x54: ("raw", "var", 1, None),
+    0x55: ("volume_storage_l", "u32", 1000, None),
+    0x56: ("conductivity_uscm", "u16", 1, None),
+    0x57: ("temperature_c", "s8", 1, None),
+    0x58: ("temperature_c", "s8", 1, lambda raw: round(raw * 0.35, 2)),
+    0x59: ("count", "s8", 1, None),
+    0x5A: ("count", "s16", 1, None),
+    0x5B: ("count", "s32", 1, None),
+    0x5C: ("power_w", "s32", 100, None),
+    0x5D: ("current_a", "s16", 1000, None),
+    0x5E: ("direction_deg", "u16", 100, None),
+    0x5F: ("precipitation_mm", "u16", 10, None),
+    0x60: ("channel", "u8", 1, None),
+    0x61: ("rotational_speed_rpm", "u16", 1, None),
+    # Informations appareil
+    0xF0: ("device_type_id", "u16", 1, None),
+    0xF1: ("firmware_u32", "u32", 1, None),
+    0xF2: ("firmware_u24", "u24", 1, None),
+}
+
+DIMMER = 0x3C
+LIGHT = 0x1E
+TEXT = 0x53
+VARIABLE = -1
+
+# Table indexée par identifiant : (clé, longueur, lecture, diviseur, conversion) ou None
+_TABLE = [None] * 256
+for _obj_id, (_key, _fmt, _divisor, _convert) in OBJECTS.items():
+    _size, _reader = (VARIABLE, None) if _fmt == "var" else _READERS[_fmt]
+    _TABLE[_obj_id] = (_key, _size, _reader, _divisor, _convert)
+del _obj_id, _key, _fmt, _divisor, _convert, _size, _reader
+
+
+def decode_objects(data) -> dict:
+    """Objets d'une payload BTHome (sans l'octet Device Information), clés de OBJECTS"""
+    result = {}
+    pos = 0
+    end = len(data)
+    table = _TABLE
+    while pos < end:
+        obj_id = data[pos]
+        pos += 1
+        spec = table[obj_id]
+        if spec is None:
+            result["unknown_object"] = obj_id
+            break
+        key, size, reader, divisor, convert = spec
+        if size == VARIABLE:
+            size = data[pos] if pos < end else end
+            pos += 1
+        if pos + size > end:
+            logging.warning("[BTHOME] Truncated frame at offset %d (obj_id=0x%02X)", pos, obj_id)
+            break
+
+        if reader is not None:
+            value = reader(data, pos)[0]
+            if obj_id == DIMMER:
+                value = (DIMMER_EVENTS.get(value & 0xFF, f"?({value & 0xFF})"), value >> 8)
+            elif convert is not None:
+                value = convert(value)
+            elif divisor != 1:
+                value = value / divisor
+        elif spec[1] == VARIABLE:
+            value = bytes(data[pos:pos + size])
+            if obj_id == TEXT:
+                value = value.decode("utf-8", "replace")
+        else:
+            value = data[pos]
+            if obj_id == LIGHT:
+                result[_free_key(result, "light_raw")] = value
+            if convert is not None:
+                value = convert(value)
+            elif divisor != 1:
+                value = value / divisor
+        pos += size
+        if key in result:
+            key = _free_key(result, key)
+        result[key] = value
+    return result
+
+
+def _free_key(result: dict, key: str) -> str:
+    """key, ou key_2, key_3... si l'objet est répété"""
+    if key not in result:
+        return key
+    n = 2
+    while f"{key}_{n}" in result:
+        n += 1
+    return f"{key}_{n}"
+
+
+def frame_type(result: dict) -> str:
+    if "device_type_id" in result or "firmware_u32" in result:
+        return "device_id_packet"
+    if "button_event" in result:
+        return "event"
+    if "temperature_c" in result or "humidity_pct" in result or "light" in result:
+        return "advertising_beacon"
+    return "unknown"
+
+
+def decode_frame(data) -> dict:
+    """Décode une payload BTHome brute (objets + frame_type), {} si elle est vide"""
+    if not data:
+        return {}
+    result = decode_objects(data)
+    result["frame_type"] = frame_type(result)
+    return result
+
+
+def decode_frames(payloads) -> list[dict]:
+    """Décode une liste de payloads (ex. un lot d'annonces capturées)"""
+    decode = decode_frame
+    return [decode(payload) for payload in payloads]
+
+
+# --- Appareils, trames chiffrées ---
+
+BTHOME_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+UUID16_LE = b"\xd2\xfc"
+VERSION_2 = 2
+FLAG_ENCRYPTED = 0x01
+FLAG_TRIGGER = 0x04
+COUNTER_RESTART = 100   # compteur repassé sous ce seuil : redémarrage possible (pile changée)
+RESTART_CONFIRMATIONS = 3   # trames croissantes sous COUNTER_RESTART avant d'adopter le nouveau compteur
+TAG_LENGTH = 4
+
+# Clés decode_objects -> clés des valeurs numériques bthome_ble (binaires, événements et texte exclus)
+ENTITY_KEYS = {
+    "packet_id": "packet_id", "battery_pct": "battery", "temperature_c": "temperature",
+    "humidity_pct": "humidity", "pressure_hpa": "pressure", "illuminance_lux": "illuminance",
+    "mass_kg": "mass", "mass_lb": "mass", "dewpoint_c": "dew_point", "count": "count",
+    "energy_kwh": "energy", "power_w": "power", "voltage_v": "voltage", "pm25_ugm3": "pm25",
+    "pm10_ugm3": "pm10", "co2_ppm": "carbon_dioxide", "tvoc_ugm3": "volatile_organic_compounds",
+    "moisture_pct": "moisture", "rotation_deg": "rotation", "distance_mm": "distance_mm",
+    "distance_m": "distance_m", "duration_s": "duration", "current_a": "current", "speed_ms": "speed",
+    "uv_index": "uv_index", "volume_l": "volume", "volume_ml": "volume_ml",
+    "volume_flow_rate_m3h": "volume_flow_rate", "gas_m3": "gas", "water_l": "water",
+    "timestamp": "timestamp", "acceleration_ms2": "acceleration", "gyroscope_dps": "gyroscope",
+    "volume_storage_l": "volume_storage", "conductivity_uscm": "conductivity",
+    "direction_deg": "direction", "precipitation_mm": "precipitation", "channel": "channel",
+    "rotational_speed_rpm": "rotational_speed",
+}
+
+
+def entity_values(objects: dict) -> dict:
+    """Valeurs numériques de decode_objects sous les noms bthome_ble (temperature, temperature_2...)"""
+    values = {}
+    for key, value in objects.items():
+        name = ENTITY_KEYS.get(key)
+        if name is None:
+            base, _, n = key.rpartition("_")
+            name = ENTITY_KEYS.get(base) if n.isdigit() else None
+            if name is None:
+                continue
+            name = f"{name}_{n}"
+        values[name] = value
+    return values
+
+
+class BTHomeError(ValueError):
+    pass
+
+
+def new_cipher(bindkey: bytes):
+    """Contexte AES-CCM réutilisable (cryptography), sinon équivalent pycryptodome recréé par trame"""
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESCCM
+    except ImportError:
+        return _PyCryptodomeCCM(bindkey)
+    return AESCCM(bindkey, tag_length=TAG_LENGTH)
+
+
+class _PyCryptodomeCCM:
+    def __init__(self, bindkey: bytes):
+        self.bindkey = bindkey
+
+    def decrypt(self, nonce, data, associated_data=None):
+        from Crypto.Cipher import AES
+
+        cipher = AES.new(self.bindkey, AES.MODE_CCM, nonce=nonce, mac_len=TAG_LENGTH)
+        return cipher.decrypt_and_verify(data[:-TAG_LENGTH], data[-TAG_LENGTH:])
+
+
+class BTHomeDevice:
+    """Un capteur BTHome v2 : bindkey, contexte de chiffrement et compteur anti-rejeu"""
+
+    def __init__(self, mac: str, bindkey: str | bytes | None = None):
+        self.mac = mac
+        self._nonce_prefix = bytes.fromhex(mac.replace(":", "")) + UUID16_LE
+        if isinstance(bindkey, str):
+            bindkey = bytes.fromhex(bindkey)
+        if bindkey is not None and len(bindkey) != 16:
+            raise BTHomeError(f"bindkey BTHome de {len(bindkey)} octets au lieu de 16 ({mac})")
+        self.cipher = new_cipher(bindkey) if bindkey else None
+        self.counter = None         # dernier compteur de chiffrement accepté
+        self._restart_counter = None    # redémarrage présumé : dernier compteur bas authentifié
+        self._restart_frames = 0
+        self.packets = 0
+        self.duplicates = 0         # même compteur (annonce répétée par l'appareil)
+        self.replays = 0            # compteur en recul (dont redémarrage pas encore confirmé)
+        self.failures = 0           # tag invalide, mauvaise clé, trame tronquée
+        self.rejected = 0           # trame en clair alors qu'une bindkey est configurée, version inconnue
+
+    @property
+    def encrypted(self) -> bool:
+        return self.cipher is not None
+
+    def parse(self, service_data) -> dict | None:
+        """
+        Objets décodés d'une donnée de service 0xFCD2 (octet Device
+        Information compris), None si la trame est rejetée.
+        """
+        if not service_data:
+            return None
+        info = service_data[0]
+        if info >> 5 != VERSION_2:
+            self.rejected += 1
+            return None
+        if info & FLAG_ENCRYPTED:
+            payload = self.decrypt(service_data)
+            if payload is None:
+                return None
+        elif self.cipher is not None:
+            # Clé configurée : une trame en clair ne peut venir que d'un autre émetteur
+            self.rejected += 1
+            return None
+        else:
+            payload = service_data[1:]
+        self.packets += 1
+        return decode_objects(payload)
+
+    def decrypt(self, service_data) -> bytes | None:
+        """Payload déchiffrée (objets), None si rejetée : pas de clé, rejeu, tag invalide"""
+        if self.cipher is None or len(service_data) < 1 + 8 + 1:
+            self.failures += 1
+            return None
+        counter_bytes = bytes(service_data[-8:-4])
+        counter = int.from_bytes(counter_bytes, "little")
+        last = self.counter
+        if last is not None and counter <= last:
+            if counter == last:
+                self.duplicates += 1
+                return None
+            if counter >= COUNTER_RESTART:
+                self.replays += 1
+                logging.warning("[BTHOME] %s: encryption counter went back (%d < %d), frame dropped",
+                                self.mac, counter, last)
+                return None
+            if counter == self._restart_counter:
+                self.duplicates += 1
+                return None
+        nonce = self._nonce_prefix + bytes((service_data[0],)) + counter_bytes
+        try:
+            payload = self.cipher.decrypt(nonce, bytes(service_data[1:-8]) + bytes(service_data[-4:]), None)
+        except Exception as e:
+            # InvalidTag (cryptography) ou ValueError (pycryptodome)
+            self.failures += 1
+            logging.debug("[BTHOME] %s: decryption failed: %r", self.mac, e)
+            return None
+        if last is not None and counter < last:
+            if self._restart_counter is not None and counter > self._restart_counter:
+                self._restart_frames += 1
+            else:
+                self._restart_frames = 1
+            self._restart_counter = counter
+            if self._restart_frames < RESTART_CONFIRMATIONS:
+                self.replays += 1
+                logging.info("[BTHOME] %s: encryption counter restart? (%d < %d), %d/%d frames",
+                             self.mac, counter, last, self._restart_frames, RESTART_CONFIRMATIONS)
+                return None
+            logging.warning("[BTHOME] %s: encryption counter restarted at %d (was %d)", self.mac, counter, last)
+        self._restart_counter = None
+        self._restart_frames = 0
+        self.counter = counter
+        return payload
+
+    def stats(self) -> dict:
+        return {"packets": self.packets, "duplicates": self.duplicates, "replays": self.replays,
+                "failures": self.failures, "rejected": self.rejected}
@@ -0,0 +1,179 @@
+"""
+Gestionnaire de connectivité asynchrone
+=======================================
+Tâche de fond qui surveille l'accès internet et relance le modem LTE si
+besoin, sans jamais bloquer la boucle d'événements (scanner BLE, lecture
+ADS1115). read_loop se contente de lire l'état courant via snapshot().
+
+Machine d'état :
+    unknown -> online | connecting
+    online -> online | connecting        (ping KO)
+    connecting -> online | offline       (init modem OK / KO)
+    offline -> connecting                (après backoff)
+
+Les sondes réseau (ping, ip route) passent par des sous-processus asyncio ;
+l'initialisation série du modem (lte_init.ready_or_connect) tourne dans un
+thread de travail.
+"""
+
+import asyncio
+import logging
+import time
+
+from lte_init import PING_TARGET, ready_or_connect, modem_status
+
+STATE_UNKNOWN = "unknown"
+STATE_ONLINE = "online"
+STATE_CONNECTING = "connecting"
+STATE_OFFLINE = "offline"
+
+CHECK_INTERVAL = 60         # secondes entre deux vérifications quand tout va bien
+RETRY_MIN = 30              # backoff après un échec d'init LTE
+RETRY_MAX = 600
+
+
+async def async_ping(num: int = 1, target: str = PING_TARGET, timeout: int = 2) -> bool:
+    """Ping non bloquant, True si la cible répond"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ping", "-W", str(timeout), "-c", str(num), target,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await proc.communicate()
+    except Exception as e:
+        logging.info("[NET] Error during ping test: %s", e)
+        return False
+    if proc.returncode != 0:
+        logging.info("[NET] Internet KO: %s", stderr.decode(errors="ignore").strip())
+        return False
+    return True
+
+
+async def async_is_lte_used(dest: str = PING_TARGET) -> bool:
+    """True si la route vers dest passe par l'interface LTE (eth0)"""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ip", "route", "get", dest,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        stdout, _ = await proc.communicate()
+    except Exception as e:
+        logging.info("[NET] Error reading route: %s", e)
+        return False
+    return "dev eth0" in stdout.decode(errors="ignore")
+
+
+class ConnectivityManager:
+    def __init__(self, check_interval=CHECK_INTERVAL, ping=async_ping,
+                 lte_probe=async_is_lte_used, bring_up=ready_or_connect, modem_probe=modem_status, perf=None):
+        self.check_interval = check_interval
+        self.perf = perf            # perf.PerfRecorder optionnel : durée des sondes net.*
+        self.ping = ping
+        self.lte_probe = lte_probe
+        self.bring_up = bring_up
+        self.modem_probe = modem_probe
+
+        self.state = STATE_UNKNOWN
+        self.connected = False
+        self.lte_signal = False
+        self.is_registered = False
+        self.signal_dbm = None
+        self.lte_failures = 0       # échecs d'init LTE consécutifs
+        self.last_change = time.monotonic()
+        self._retry_delay = RETRY_MIN
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        """Lance la tâche de fond dans la boucle courante"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="connectivity")
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_check(self):
+        """Demande une vérification immédiate (ex : après un échec d'envoi)"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    def snapshot(self) -> tuple[bool, bool, bool]:
+        """(connecté, via LTE, modem enregistré) — lecture seule, sans attente"""
+        return self.connected, self.lte_signal, self.is_registered
+
+    def _set_state(self, state):
+        if state != self.state:
+            logging.info("[NET] Connectivity %s -> %s", self.state, state)
+            self.state = state
+            self.last_change = time.monotonic()
+
+    async def _timed(self, stage, awaitable):
+        if self.perf is None:
+            return await awaitable
+        begin = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.perf.observe(stage, time.perf_counter() - begin)
+
+    async def check_once(self):
+        """Une itération de la machine d'état"""
+        if await self._timed("net.ping", self.ping(1)):
+            self.connected = True
+            self.lte_signal = await self._timed("net.lte_probe", self.lte_probe())
+            if self.lte_signal:
+                # Bilan AT sur la session persistante : quelques dizaines de ms
+                status = await self._timed("net.modem_status", asyncio.to_thread(self.modem_probe))
+                self.is_registered = status["registered"]
+                self.signal_dbm = status["signal_dbm"]
+            else:
+                self.is_registered = False
+            self._set_state(STATE_ONLINE)
+            return
+
+        self._set_state(STATE_CONNECTING)
+        connected, lte_signal, is_registered, lte_has_failed = await self._timed(
+            "net.ready_or_connect", asyncio.to_thread(self.bring_up, False)
+        )
+        self.connected = connected
+        self.lte_signal = lte_signal
+        self.is_registered = is_registered
+        if lte_has_failed:
+            self.lte_failures += 1
+            logging.warning("[NET] LTE connection failed, attempt #%d", self.lte_failures)
+        elif connected:
+            self.lte_failures = 0
+        self._set_state(STATE_ONLINE if connected else STATE_OFFLINE)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("[NET] Connectivity check error: %s", e)
+                self.connected = False
+                self._set_state(STATE_OFFLINE)
+
+            if self.connected:
+                self._retry_delay = RETRY_MIN
+                delay = self.check_interval
+            else:
+                delay = self._retry_delay
+                self._retry_delay = min(self._retry_delay * 2, RETRY_MAX)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
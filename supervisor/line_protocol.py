@@ -0,0 +1,104 @@
+"""
+Encodage InfluxDB line protocol sans dépendance
+===============================================
+Mêmes règles d'échappement et de formatage que influxdb_client.Point,
+mais sans construire d'objet intermédiaire : les lignes sont écrites
+directement dans un bytearray réutilisable.
+
+    measurement,tag=val,tag2=val2 field=1.5,text="abc" 1700000000000000000
+"""
+
+import math
+
+_ESCAPE_MEASUREMENT = str.maketrans({
+    ",": r"\,",
+    " ": r"\ ",
+    "\n": r"\n",
+    "\t": r"\t",
+    "\r": r"\r",
+})
+
+_ESCAPE_KEY = str.maketrans({
+    ",": r"\,",
+    "=": r"\=",
+    " ": r"\ ",
+    "\n": r"\n",
+    "\t": r"\t",
+    "\r": r"\r",
+})
+
+_ESCAPE_STRING = str.maketrans({
+    '"': r"\"",
+    "\\": r"\\",
+})
+
+
+def escape_measurement(name: str) -> str:
+    return name.translate(_ESCAPE_MEASUREMENT)
+
+
+def escape_key(key: str) -> str:
+    """Échappement des clés de tag et de champ"""
+    return key.translate(_ESCAPE_KEY)
+
+
+def escape_tag_value(value: str) -> str:
+    escaped = value.translate(_ESCAPE_KEY)
+    # Un antislash final échapperait le séparateur suivant
+    if escaped.endswith("\\"):
+        escaped += " "
+    return escaped
+
+
+def escape_string(value: str) -> str:
+    return value.translate(_ESCAPE_STRING)
+
+
+def format_float(value: float) -> str | None:
+    """Représentation d'un float (None si NaN/inf, non représentable)"""
+    if not math.isfinite(value):
+        return None
+    s = repr(value)
+    # Comme influxdb_client : 12.0 -> 12
+    if s.endswith(".0"):
+        s = s[:-2]
+    return s
+
+
+def encode_prefix(measurement: str, tags: dict[str, str]) -> bytes:
+    """'measurement,tag=val ' pré-encodé, tags triés comme le client officiel"""
+    parts = [escape_measurement(measurement)]
+    for key in sorted(tags):
+        value = tags[key]
+        if value is None or value == "":
+            continue
+        parts.append(f"{escape_key(key)}={escape_tag_value(str(value))}")
+    return (",".join(parts) + " ").encode()
+
+
+def encode_fields(fields: dict) -> str:
+    """Champs triés par nom ; None, NaN et inf sont ignorés"""
+    out = []
+    for key in sorted(fields):
+        value = fields[key]
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            out.append(f"{escape_key(key)}={str(value).lower()}")
+        elif isinstance(value, int):
+            out.append(f"{escape_key(key)}={value}i")
+        elif isinstance(value, float):
+            s = format_float(value)
+            if s is not None:
+                out.append(f"{escape_key(key)}={s}")
+        else:
+            out.append(f'{escape_key(key)}="{escape_string(str(value))}"')
+    return ",".join(out)
+
+
+def encode_line(measurement: str, tags: dict[str, str], fields: dict, timestamp_ns: int) -> str | None:
+    """Une ligne complète, ou None si aucun champ n'est représentable"""
+    field_part = encode_fields(fields)
+    if not field_part:
+        return None
+    return f"{encode_prefix(measurement, tags).decode()}{field_part} {timestamp_ns}"
@@ -3,6 +3,7 @@ import subprocess
 import socket
 import logging
 import serial
+from at_modem import ATSession, registration_status, csq_to_dbm
 
 
 MODEM_PORT = "/dev/ttyACM0"
@@ -11,23 +12,24 @@ APN = "sl2fr"
 PING_TARGET = "8.8.8.8"
 MAX_WAIT_NETWORK = 120
 
+# Session série unique, réutilisée par toutes les fonctions du module
+MODEM = ATSession(MODEM_PORT, BAUDRATE)
 
-def send_at(ser, command, delay=0.5, log=False):
-    """Envoyer une commande AT et retourner la réponse"""
-    ser.write((command + "\r").encode())
-    time.sleep(delay)
-    resp = ser.read_all().decode(errors="ignore")
+
+def send_at(command, timeout=None, log=False):
+    """Envoyer une commande AT sur la session persistante et retourner la réponse"""
+    resp = MODEM.command(command, timeout)
     if log or logging.getLogger().isEnabledFor(logging.DEBUG):
-        logging.info("%s>%s", command, resp)
-    return resp
+        logging.info("%s>%s (%.0f ms)", command, resp.text, resp.elapsed * 1000)
+    return resp.text
 
 
-def wait_network_registration(ser, timeout=MAX_WAIT_NETWORK):
+def wait_network_registration(timeout=MAX_WAIT_NETWORK):
     """Attendre que le modem soit enregistré sur le réseau LTE"""
     logging.info("[LTE] ...try registering...")
-    for _ in range(timeout):
-        resp = send_at(ser, "AT+CREG?")
-        if "+CREG: 0,1" in resp or "+CREG: 0,5" in resp:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if registration_status(send_at("AT+CREG?")) in (1, 5):
             logging.info("[LTE] Modem registered on network")
             return True
         time.sleep(1)
@@ -38,30 +40,48 @@ def wait_network_registration(ser, timeout=MAX_WAIT_NETWORK):
 def reset_modem():
     logging.info("[LTE] Resetting modem...")
     try:
-        ser = serial.Serial(MODEM_PORT, BAUDRATE, timeout=1)
-        send_at(ser, "AT+CFUN=0", 1)
-        send_at(ser, "AT+CFUN=1", 1)
-        ser.close()
+        send_at("AT+CFUN=0")
+        send_at("AT+CFUN=1")
         logging.info("[LTE] Modem reset command sent")
     except Exception as e:
         logging.info("[LTE] Error resetting modem: %s", e)
+        MODEM.close()
+
 
-def is_reg(ser):
-    resp = send_at(ser, "AT+CFUN?")
+def is_reg():
+    resp = send_at("AT+CFUN?")
     if "+CFUN: 1" not in resp:
         logging.info("[LTE] ❌ Modem not initialized")
         return False
-    resp = send_at(ser, "AT+CREG?")
-    if "+CREG: 0,1" in resp or "+CREG: 0,5" in resp:
+    stat = registration_status(send_at("AT+CREG?"))
+    if stat in (1, 5):
         logging.info("[LTE] Modem registered")
         return True
-    if "+CREG: 0,2" in resp:
+    if stat == 2:
         logging.info("[LTE] Modem still waiting for registration")
         time.sleep(3)
         return True
     return False
 
 
+def modem_status() -> dict:
+    """
+    Bilan rapide du modem (quelques dizaines de ms sur la session ouverte) :
+    enregistrement, attachement paquet et niveau de signal.
+    """
+    try:
+        diag = MODEM.diagnostics()
+    except Exception as e:
+        logging.info("[LTE] Error reading modem status: %s", e)
+        MODEM.close()
+        return {"registered": False, "attached": False, "signal_dbm": None}
+    return {
+        "registered": registration_status(diag["AT+CREG?"].text) in (1, 5),
+        "attached": "+CGATT: 1" in diag["AT+CGATT?"].text,
+        "signal_dbm": csq_to_dbm(diag["AT+CSQ"].text),
+    }
+
+
 def test_ping(num: int = 2, target: str = "8.8.8.8", timeout: int = 2) -> bool:
     try:
         cmd = [
@@ -109,9 +129,10 @@ def ready_or_connect(force=False) -> tuple[bool, bool, bool, int]:
     if wlan0_has_internet():
         logging.info("[LTE] WLAN0 already connected to internet.")
         try:
-            is_registered = is_reg(serial.Serial(MODEM_PORT, BAUDRATE, timeout=1))
+            is_registered = is_reg()
         except Exception as e:
             logging.info("[LTE] Error opening serial port: %s", e)
+            MODEM.close()
         return True, False, is_registered, lte_failed
 
     if not force and test_ping(target=PING_TARGET):
@@ -120,37 +141,35 @@ def ready_or_connect(force=False) -> tuple[bool, bool, bool, int]:
 
     logging.info("[LTE] LTE not connected, initializing...")
     try:
-        ser = serial.Serial(MODEM_PORT, BAUDRATE, timeout=1)
-        time.sleep(1)
+        MODEM.open()
     except Exception as e:
         logging.info("[LTE] Error opening serial port: %s", e)
         return False, False, False, lte_failed
 
-    send_at(ser, "AT")
-    if not is_reg(ser) or force:
-        logging.info("[LTE] Init modem...")
-        send_at(ser, "AT+CFUN=1", 1)
-        send_at(ser, f'AT+CGDCONT=1,"IP","{APN}"', 1)
-        is_registered = True
-
-    if not wait_network_registration(ser):
-        ser.close()
-        return False, False, False, lte_failed
-
-    resp = send_at(ser, "AT+CGACT=1,1", 1, log=True)
-    if "OK" not in resp:
-        logging.error("[LTE] ❌ Activation PDP context failed: %s", resp.strip())
-        logging.info("[LTE] Diagnostic: AT+CREG? -> %s", send_at(ser, "AT+CREG?"))
-        logging.info("[LTE] Diagnostic: AT+CGREG? -> %s", send_at(ser, "AT+CGREG?"))
-        logging.info("[LTE] Diagnostic: AT+CGATT? -> %s", send_at(ser, "AT+CGATT?"))
-        logging.info("[LTE] Diagnostic: AT+CSQ -> %s", send_at(ser, "AT+CSQ"))
-        logging.info("[LTE] Diagnostic: AT+CGDCONT? -> %s", send_at(ser, "AT+CGDCONT?"))
-        reset_modem()
-        ser.close()
-        lte_failed = True
+    try:
+        send_at("AT")
+        if not is_reg() or force:
+            logging.info("[LTE] Init modem...")
+            send_at("AT+CFUN=1")
+            send_at(f'AT+CGDCONT=1,"IP","{APN}"')
+            is_registered = True
+
+        if not wait_network_registration():
+            return False, False, False, lte_failed
+
+        resp = send_at("AT+CGACT=1,1", log=True)
+        if "OK" not in resp:
+            logging.error("[LTE] ❌ Activation PDP context failed: %s", resp.strip())
+            for command, diag in MODEM.diagnostics().items():
+                logging.info("[LTE] Diagnostic: %s -> %s", command, diag.text)
+            reset_modem()
+            lte_failed = True
+            return False, False, False, lte_failed
+    except serial.SerialException as e:
+        logging.info("[LTE] Serial error during init: %s", e)
+        MODEM.close()
         return False, False, False, lte_failed
     logging.info("[LTE] Activating PDP context: %s", resp)
-    ser.close()
     success = test_ping(target=PING_TARGET)
     if not success:
         logging.info("[LTE] ❌ LTE init. seems to have failed after PDP activation")
@@ -0,0 +1,48 @@
+"""
+Cache LRU des payloads BLE déjà décodées
+========================================
+Les Victron et BTHome réémettent la même payload de nombreuses fois par
+seconde. La clé (MAC, octets bruts) permet de retrouver le résultat du
+décodage sans refaire le déchiffrement AES ni le parsing complet : le coût
+CPU suit le rythme des changements de données, pas celui des annonces.
+"""
+
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 256
+
+
+class PayloadCache:
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key):
+        """Résultat décodé pour cette clé, ou None (compté comme miss)"""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
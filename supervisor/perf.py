@@ -0,0 +1,106 @@
+"""
+Chronométrage des étapes du chemin chaud
+========================================
+Durées time.perf_counter() (horloge monotone) mesurées par les appelants
+autour de chaque étape de read_loop et de chaque type de callback BLE
+(recorder optionnel, nom d'étape parfois choisi d'après l'issue, comme
+upload.post / upload.error), passées à observe() et agrégées par intervalle
+dans des histogrammes à bornes fixes (50 µs .. 10 s) : coût constant par
+mesure, mémoire constante. take_lines() produit une ligne supervisor_perf
+par étape (nombre, moyenne, max, quantiles estimés, compte par classe),
+taggée par site et version, envoyée à côté de site_metrics.
+"""
+
+from bisect import bisect_left
+
+from line_protocol import encode_line
+
+MEASUREMENT = "supervisor_perf"
+DEFAULT_INTERVAL = 600      # secondes entre deux envois des histogrammes
+
+# Bornes supérieures des classes (secondes) ; la dernière classe est ouverte
+BOUNDS = (50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3,
+          100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = ((50, "p50_ms"), (90, "p90_ms"), (99, "p99_ms"))
+
+
+def _bound_label(bound: float) -> str:
+    if bound < 1e-3:
+        return f"le_{bound * 1e6:g}us"
+    if bound < 1:
+        return f"le_{bound * 1e3:g}ms"
+    return f"le_{bound:g}s"
+
+
+BUCKET_FIELDS = tuple(_bound_label(b) for b in BOUNDS) + ("le_inf",)
+
+
+class StageHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Borne supérieure de la classe contenant le quantile q (%), max observé pour la dernière"""
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BOUNDS[i], self.max) if i < len(BOUNDS) else self.max
+        return self.max
+
+    def fields(self) -> dict:
+        fields = {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 4),
+            "max_ms": round(self.max * 1000, 4),
+            "total_ms": round(self.total * 1000, 3),
+        }
+        for q, name in QUANTILES:
+            fields[name] = round(self.quantile(q) * 1000, 4)
+        for name, n in zip(BUCKET_FIELDS, self.counts):
+            if n:
+                fields[name] = n
+        return fields
+
+
+class PerfRecorder:
+    def __init__(self):
+        self._stages: dict[str, StageHistogram] = {}
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            histogram = self._stages[stage] = StageHistogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Champs de chaque étape de l'intervalle en cours, sans remise à zéro"""
+        return {stage: h.fields() for stage, h in self._stages.items() if h.count}
+
+    def take_interval(self) -> dict[str, dict]:
+        """Champs de chaque étape observée depuis le dernier appel, puis remise à zéro"""
+        stats = self.snapshot()
+        self._stages = {}
+        return stats
+
+    def take_lines(self, timestamp_ns: int, tags: dict | None = None) -> list[str]:
+        """Une ligne supervisor_perf par étape (tag stage), puis remise à zéro"""
+        lines = []
+        for stage, fields in sorted(self.take_interval().items()):
+            line = encode_line(MEASUREMENT, {**(tags or {}), "stage": stage}, fields, timestamp_ns)
+            if line:
+                lines.append(line)
+        return lines
@@ -0,0 +1,116 @@
+"""
+Envoi sur changement (report by exception)
+==========================================
+La boucle échantillonne souvent, mais un point n'est envoyé que si un champ
+suivi s'est écarté de la dernière valeur envoyée de plus que sa bande morte
+(0.05 V sur main_voltage, 10 W sur panel_power...), ou si max_interval s'est
+écoulé sans envoi (battement de cœur). min_interval borne la cadence d'envoi :
+un changement survenu trop tôt part au premier échantillon suivant la fin
+de ce délai, puisque la comparaison se fait toujours avec le dernier envoi.
+"""
+
+import math
+import time
+
+DEFAULT_SAMPLE_INTERVAL = 15    # secondes entre deux échantillonnages
+DEFAULT_MIN_INTERVAL = 30       # secondes minimum entre deux envois d'un même flux
+DEFAULT_MAX_INTERVAL = 600      # battement de cœur : envoi au moins toutes les 10 min
+
+# Bande morte par champ : un écart strictement supérieur déclenche l'envoi.
+# 0 = tout changement compte (seule valeur utile pour un champ texte).
+# Les champs absents de la table (lte_signal, agrégats, packet_id...) ne
+# partent qu'avec les envois déclenchés par un autre champ ou le battement.
+DEFAULT_DEADBANDS = {
+    # site_metrics
+    "main_voltage": 0.05,
+    "aux_voltage": 0.05,
+    "main_level": 2.0,
+    "aux_level": 2.0,
+    "panel_voltage": 1.0,
+    "panel_power": 10.0,
+    "charging_current": 0.5,
+    "charging_state": 0,
+    "energy_daily": 50.0,
+    "water_level": 2.0,
+    "temperature_1": 0.5,
+    "bt_temperature": 0.5,
+    "bt_humidity": 2.0,
+    "lte_registered": 0,
+    # bthome_metrics
+    "temperature": 0.5,
+    "humidity": 2.0,
+    "battery": 5.0,
+}
+
+FIRST = "first"
+CHANGE = "change"
+HEARTBEAT = "heartbeat"
+
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def exceeds(old, new, deadband: float) -> bool:
+    """True si new s'écarte de old de plus que la bande morte (apparition/disparition comprises)"""
+    if _missing(old) or _missing(new):
+        return _missing(old) != _missing(new)
+    if isinstance(old, str) or isinstance(new, str):
+        return old != new
+    return abs(new - old) > deadband
+
+
+class ReportScheduler:
+    def __init__(self, deadbands: dict | None = None, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL):
+        if min_interval > max_interval:
+            raise ValueError(f"min_interval ({min_interval}) > max_interval ({max_interval})")
+        self.deadbands = dict(DEFAULT_DEADBANDS if deadbands is None else deadbands)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # flux (site_id, MAC...) -> (instant du dernier envoi, valeurs suivies envoyées)
+        self._sent: dict[str, tuple[float, dict]] = {}
+        self.counts = {FIRST: 0, CHANGE: 0, HEARTBEAT: 0, "suppressed": 0}
+
+    @classmethod
+    def from_config(cls, config) -> "ReportScheduler":
+        """Section [report] (min_interval, max_interval) et [deadbands] (champ = bande morte)"""
+        deadbands = dict(DEFAULT_DEADBANDS)
+        if config.has_section("deadbands"):
+            for field, value in config.items("deadbands"):
+                deadbands[field] = float(value)
+        return cls(
+            deadbands,
+            min_interval=config.getfloat("report", "min_interval", fallback=DEFAULT_MIN_INTERVAL),
+            max_interval=config.getfloat("report", "max_interval", fallback=DEFAULT_MAX_INTERVAL),
+        )
+
+    def due(self, key: str, values: dict, now: float | None = None) -> str | None:
+        """
+        Raison d'envoyer maintenant le flux key ("first", "change:<champ>",
+        "heartbeat"), ou None si le point peut être omis.
+        """
+        now = time.monotonic() if now is None else now
+        sent = self._sent.get(key)
+        if sent is None:
+            return FIRST
+        last_time, last_values = sent
+        elapsed = now - last_time
+        if elapsed >= self.max_interval:
+            return HEARTBEAT
+        if elapsed >= self.min_interval:
+            for field, deadband in self.deadbands.items():
+                if field in values and exceeds(last_values.get(field), values[field], deadband):
+                    return f"{CHANGE}:{field}"
+        self.counts["suppressed"] += 1
+        return None
+
+    def sent(self, key: str, values: dict, reason: str, now: float | None = None):
+        """Enregistre l'envoi : les valeurs suivies deviennent la référence des bandes mortes"""
+        now = time.monotonic() if now is None else now
+        deadbands = self.deadbands
+        self._sent[key] = (now, {field: value for field, value in values.items() if field in deadbands})
+        self.counts[reason.split(":", 1)[0]] += 1
+
+    def stats(self) -> dict:
+        return dict(self.counts, streams=len(self._sent))
@@ -0,0 +1,124 @@
+"""
+Historique borné par métrique
+=============================
+Chaque lecture décodée est conservée dans un tampon circulaire array('d')
+de taille fixe, et des agrégats (min/max/somme/nombre/dernier) sont tenus
+à jour au fil de l'eau pour l'intervalle de rapport en cours. La mémoire
+reste constante quelle que soit la durée de fonctionnement, et les pics
+entre deux rapports ne sont plus perdus.
+"""
+
+import math
+import time
+from array import array
+
+DEFAULT_CAPACITY = 512
+
+
+class RingBuffer:
+    __slots__ = ("capacity", "_values", "_times", "_index", "_size",
+                 "_min", "_max", "_sum", "_count", "_last")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._values = array("d", bytes(8 * capacity))
+        self._times = array("d", bytes(8 * capacity))
+        self._index = 0
+        self._size = 0
+        self.reset_interval()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float, timestamp: float | None = None):
+        idx = self._index
+        self._values[idx] = value
+        self._times[idx] = time.time() if timestamp is None else timestamp
+        self._index = (idx + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+        self._sum += value
+        self._count += 1
+        self._last = value
+
+    def items(self) -> list[tuple[float, float]]:
+        """(horodatage, valeur) du plus ancien au plus récent"""
+        start = (self._index - self._size) % self.capacity
+        out = []
+        for i in range(self._size):
+            j = (start + i) % self.capacity
+            out.append((self._times[j], self._values[j]))
+        return out
+
+    def values(self) -> list[float]:
+        return [v for _, v in self.items()]
+
+    def interval_stats(self) -> dict | None:
+        """Agrégats depuis le dernier reset_interval(), None si aucune lecture"""
+        if not self._count:
+            return None
+        return {
+            "min": self._min,
+            "max": self._max,
+            "mean": self._sum / self._count,
+            "last": self._last,
+            "count": self._count,
+        }
+
+    def reset_interval(self):
+        self._min = math.inf
+        self._max = -math.inf
+        self._sum = 0.0
+        self._count = 0
+        self._last = math.nan
+
+
+class MetricHistory:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers: dict[str, RingBuffer] = {}
+
+    def __contains__(self, metric) -> bool:
+        return metric in self._buffers
+
+    def __getitem__(self, metric) -> RingBuffer:
+        return self._buffers[metric]
+
+    def metrics(self) -> list[str]:
+        return list(self._buffers)
+
+    def record(self, metric: str, value, timestamp: float | None = None):
+        """Ajoute une lecture numérique (None, booléens et textes sont ignorés)"""
+        if value is None or isinstance(value, (bool, str)):
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        if value != value:
+            return
+        buffer = self._buffers.get(metric)
+        if buffer is None:
+            buffer = self._buffers[metric] = RingBuffer(self.capacity)
+        buffer.append(value, timestamp)
+
+    def take_interval(self, metrics=None) -> dict[str, dict]:
+        """
+        Agrégats de l'intervalle écoulé pour chaque métrique (ou seulement
+        celles de metrics), puis remise à zéro de ces métriques
+        """
+        stats = {}
+        if metrics is None:
+            buffers = self._buffers.items()
+        else:
+            buffers = [(m, self._buffers[m]) for m in metrics if m in self._buffers]
+        for metric, buffer in buffers:
+            interval = buffer.interval_stats()
+            if interval is not None:
+                stats[metric] = interval
+            buffer.reset_interval()
+        return stats
@@ -0,0 +1,286 @@
+"""
+Scan BLE par fenêtres (duty cycle)
+==================================
+GlobalStateManager n'accepte les trames Victron que pendant duree_fenetre
+secondes de chaque intervalle_ecoute (30 s toutes les 120 s) : en dehors,
+le scanner produit des annonces aussitôt jetées. ScanScheduler démarre le
+scanner un peu avant chaque fenêtre (lead) et l'arrête à sa fin.
+
+  - par défaut les capteurs BTHome partagent la fenêtre : le scanner est
+    arrêté (window / period) du temps, mais les annonces BTHome émises
+    hors fenêtre sont perdues. Une mesure périodique (H&T, toutes les
+    quelques dizaines de secondes) est reprise à la fenêtre suivante ;
+    un événement ponctuel (porte, bouton) émis pendant la pause est
+    manqué. always_on() (option [scan] bthome = continuous) garde le
+    scanner actif en continu tant qu'il est vrai : aucun événement
+    perdu, mais plus de pause, donc ni économie de CPU ni de radio
+  - mode passif par défaut (aucune requête de scan response : Victron et
+    BTHome mettent tout dans l'annonce), filtré dans BlueZ par des motifs
+    d'advertisement monitor (données de service 0xFCD2 BTHome, données
+    constructeur 0x02E1 Victron) : les annonces des autres appareils
+    n'arrivent plus jusqu'à Python. Si le backend le refuse (BlueZ sans
+    advertisement monitor, autre OS), le scanner repasse en actif et le
+    filtrage par adresse du callback reste le seul filtre
+  - stats() : temps et annonces scanner actif / en pause, et estimation
+    des annonces et du temps CPU économisés pendant les pauses
+  - on_error(e) : appelé pour chaque échec BLE (BleakError, OSError) au
+    démarrage ou à l'arrêt du scanner, typiquement
+    BluetoothRecovery.report_error : des échecs répétés déclenchent la
+    récupération graduée
+  - listening_time() : secondes cumulées où le scanner devait écouter
+    (actif, ou démarrage en échec) ; BluetoothRecovery y mesure le
+    silence, les pauses volontaires n'en font pas partie
+
+Le scanner est fabriqué par factory(mode) et recréé à chaque démarrage,
+comme après une récupération Bluetooth (restart()). La boucle (apply) et
+la récupération (restart) tournent dans des tâches distinctes : un verrou
+unique sérialise démarrages et arrêts, sans quoi un scanner démarré par
+l'une pendant que l'autre attend stop() resterait actif sans référence.
+"""
+
+import asyncio
+import logging
+import time
+
+MODE_ACTIVE = "active"
+MODE_PASSIVE = "passive"
+DEFAULT_LEAD = 2.0          # secondes de scan avant l'ouverture de la fenêtre
+MAX_SLEEP = 10.0            # always_on() est réévalué au moins à cette cadence
+
+# Motifs de filtrage BlueZ : (type de champ AD, début du contenu du champ)
+AD_SERVICE_DATA_UUID16 = 0x16
+AD_MANUFACTURER_DATA = 0xFF
+BTHOME_UUID16 = 0xFCD2
+VICTRON_COMPANY_ID = 0x02E1
+PATTERNS = {
+    "bthome": (AD_SERVICE_DATA_UUID16, BTHOME_UUID16.to_bytes(2, "little")),
+    "victron": (AD_MANUFACTURER_DATA, VICTRON_COMPANY_ID.to_bytes(2, "little")),
+}
+DEFAULT_FILTERS = ("victron", "bthome")
+
+
+def ble_errors() -> tuple:
+    """Exceptions d'un adaptateur ou d'une pile Bluetooth en panne (bleak importé au premier échec)"""
+    try:
+        from bleak.exc import BleakError
+    except ImportError:
+        return (OSError,)
+    return (BleakError, OSError)
+
+
+def or_patterns(filters=DEFAULT_FILTERS) -> list:
+    """Motifs BlueZ (or_patterns) des familles d'appareils demandées"""
+    try:
+        from bleak.args.bluez import OrPattern
+    except ImportError:     # bleak < 1.0
+        from bleak.backends.bluezdbus.advertisement_monitor import OrPattern
+    return [OrPattern(0, ad_type, content) for ad_type, content in (PATTERNS[name] for name in filters)]
+
+
+def scanner_kwargs(mode: str, filters=DEFAULT_FILTERS) -> dict:
+    """Arguments BleakScanner supplémentaires : motifs BlueZ en mode passif, rien en actif"""
+    if mode != MODE_PASSIVE or not filters:
+        return {}
+    try:
+        return {"bluez": {"or_patterns": or_patterns(filters)}}
+    except ImportError:
+        return {}
+
+
+def bleak_factory(callback, filters=DEFAULT_FILTERS):
+    """factory(mode) pour ScanScheduler : un BleakScanner neuf, filtré par BlueZ en mode passif"""
+    from bleak import BleakScanner
+
+    def factory(mode):
+        return BleakScanner(detection_callback=callback, scanning_mode=mode, **scanner_kwargs(mode, filters))
+    return factory
+
+
+class ScanScheduler:
+    def __init__(self, factory, period: float = 120, window: float = 30, lead: float = DEFAULT_LEAD,
+                 always_on=None, advertisements=None, scanning_mode: str = MODE_PASSIVE,
+                 clock=time.time, cpu_clock=time.process_time, sleep=asyncio.sleep, monotonic=time.monotonic,
+                 on_error=None):
+        if not 0 < window <= period:
+            raise ValueError(f"fenêtre {window} s invalide pour une période de {period} s")
+        self.factory = factory
+        self.period = period
+        self.window = window
+        self.lead = lead
+        self.always_on = always_on
+        self.advertisements = advertisements    # compteur d'annonces reçues (callable)
+        self.scanning_mode = scanning_mode
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+        self.sleep = sleep
+        self.monotonic = monotonic
+        self.on_error = on_error
+
+        self.scanner = None
+        self.scanning = False
+        self.start_failed = False   # fenêtre voulue mais scanner impossible à démarrer : pas une pause
+        self.starts = 0
+        # Comptabilité par état (True = scanner actif) : secondes, CPU, annonces
+        self._seconds = {True: 0.0, False: 0.0}
+        self._cpu = {True: 0.0, False: 0.0}
+        self._ads = {True: 0, False: 0}
+        self._failed_seconds = 0.0
+        self._mark = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    # --- Fenêtres ---
+
+    def in_window(self, now: float) -> bool:
+        """Fenêtre d'écoute (avec l'avance lead), même découpage que GlobalStateManager"""
+        return (now + self.lead) % self.period < self.window + self.lead
+
+    def wanted(self, now: float) -> bool:
+        return bool(self.always_on and self.always_on()) or self.in_window(now)
+
+    def until_change(self, now: float) -> float:
+        """Secondes jusqu'à la prochaine ouverture ou fermeture de fenêtre"""
+        phase = (now + self.lead) % self.period
+        end = self.window + self.lead
+        remaining = end - phase if phase < end else self.period - phase
+        return min(max(remaining, 0.05), MAX_SLEEP)
+
+    # --- Scanner ---
+
+    def _account(self):
+        """Attribue le temps, le CPU et les annonces écoulés depuis la dernière marque à l'état courant"""
+        now, cpu = self.monotonic(), self.cpu_clock()
+        ads = self.advertisements() if self.advertisements else 0
+        if self._mark is not None:
+            then, then_cpu, then_ads = self._mark
+            self._seconds[self.scanning] += now - then
+            if self.start_failed:
+                self._failed_seconds += now - then
+            self._cpu[self.scanning] += cpu - then_cpu
+            self._ads[self.scanning] += ads - then_ads
+        self._mark = (now, cpu, ads)
+
+    async def start_scanner(self):
+        async with self._lock:
+            await self._start()
+
+    async def stop_scanner(self):
+        async with self._lock:
+            await self._stop()
+
+    async def _start(self):
+        if self.scanner is not None:
+            await self._stop()
+        self._account()
+        self.start_failed = True    # jusqu'à ce qu'un scanner tourne
+        try:
+            self.scanner = self.factory(self.scanning_mode)
+            await self.scanner.start()
+        except Exception as e:
+            if self.scanning_mode != MODE_PASSIVE:
+                raise
+            logging.warning("[SCAN] Passive scanning unavailable (%s), falling back to active scanning", e)
+            self.scanning_mode = MODE_ACTIVE
+            self.scanner = self.factory(self.scanning_mode)
+            await self.scanner.start()
+        self.scanning = True
+        self.start_failed = False
+        self.starts += 1
+        logging.debug("[SCAN] Scanner started (%s)", self.scanning_mode)
+
+    async def _stop(self):
+        self._account()
+        scanner = self.scanner
+        if scanner is not None:
+            try:
+                await scanner.stop()
+            except Exception as e:
+                logging.info("[SCAN] Error stopping BLE scanner: %s", e)
+                self._report(e)
+        self.scanner = None
+        self.scanning = False
+        self.start_failed = False
+        logging.debug("[SCAN] Scanner paused until next window")
+
+    async def restart(self):
+        """Nouveau scanner (après récupération Bluetooth), seulement s'il doit tourner maintenant"""
+        async with self._lock:
+            # État relu sous le verrou : apply() a pu démarrer ou arrêter le scanner entre-temps
+            if self.scanner is not None:
+                await self._stop()
+            if self.wanted(self.clock()):
+                await self._start()
+
+    def _report(self, error):
+        if self.on_error is not None and isinstance(error, ble_errors()):
+            self.on_error(error)
+
+    @property
+    def paused(self) -> bool:
+        """Scanner volontairement arrêté (hors fenêtre) ; un démarrage en échec n'est pas une pause"""
+        return not self.scanning and not self.start_failed
+
+    def listening_time(self) -> float:
+        """Secondes cumulées scanner actif ou voulu actif mais en échec de démarrage"""
+        self._account()
+        return self._seconds[True] + self._failed_seconds
+
+    # --- Boucle ---
+
+    async def apply(self, now: float | None = None) -> float:
+        """Met le scanner dans l'état voulu à l'instant now ; retourne le délai avant la prochaine vérification"""
+        now = self.clock() if now is None else now
+        async with self._lock:
+            want = self.wanted(now)
+            if want and not self.scanning:
+                try:
+                    await self._start()
+                except Exception as e:
+                    self._report(e)
+                    raise
+            elif not want and not self.paused:
+                await self._stop()
+        return self.until_change(now)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="scan-scheduler")
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.stop_scanner()
+
+    async def _run(self):
+        while True:
+            try:
+                delay = await self.apply()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("[SCAN] Scanner scheduling error: %s", e)
+                delay = MAX_SLEEP
+            await self.sleep(delay)
+
+    def stats(self) -> dict:
+        self._account()
+        on, off = self._seconds[True], self._seconds[False] - self._failed_seconds
+        ads_rate = self._ads[True] / on if on else 0.0
+        cpu_rate = self._cpu[True] / on if on else 0.0
+        return {
+            "mode": self.scanning_mode,
+            "starts": self.starts,
+            "duty_cycle": round(on / (on + off), 3) if on + off else 1.0,
+            "scanning_s": round(on, 1),
+            "paused_s": round(off, 1),
+            "start_failed_s": round(self._failed_seconds, 1),
+            "advertisements": self._ads[True] + self._ads[False],
+            # Estimations : débit et CPU mesurés scanner actif, extrapolés aux pauses
+            "advertisements_saved": max(0, round(ads_rate * off) - self._ads[False]),
+            "cpu_saved_s": round(max(0.0, cpu_rate * off - self._cpu[False]), 2),
+        }
@@ -0,0 +1,195 @@
+"""
+Enregistrement compact de l'état d'un site
+==========================================
+Schéma typé fixe : les champs numériques vivent dans un array('d')
+(NaN = valeur absente), les champs texte dans une petite liste.
+reset() recopie les valeurs par défaut sans rien réallouer, et
+l'encodeur line protocol écrit directement dans un bytearray réutilisé.
+"""
+
+import math
+import time
+from array import array
+
+from line_protocol import encode_prefix, escape_key, escape_string, format_float
+
+MEASUREMENT = "site_metrics"
+FLOAT = "f"
+STRING = "s"
+NAN = math.nan
+
+# (champ, type, valeur par défaut)
+SCHEMA = (
+    ("aux_voltage", FLOAT, None),
+    ("aux_level", FLOAT, 0.0),
+    ("main_voltage", FLOAT, None),
+    ("main_level", FLOAT, 0.0),
+    ("panel_voltage", FLOAT, None),     # pas de tension panneaux en BLE passif Victron
+    ("panel_power", FLOAT, 0.0),
+    ("charging_state", STRING, "Unknown"),
+    ("charging_current", FLOAT, 0.0),
+    ("charging_capacity", FLOAT, 0.0),
+    ("water_level", FLOAT, 0.0),
+    ("temperature_1", FLOAT, 0.0),
+    ("temperature_2", FLOAT, 0.0),
+    ("lte_signal", FLOAT, 0.0),
+    ("lte_registered", FLOAT, 0.0),
+    ("energy_daily", FLOAT, 0.0),
+    ("bt_temperature", FLOAT, None),
+    ("bt_humidity", FLOAT, None),
+    ("bt_last_update", FLOAT, None),
+    ("bt_light_txt", STRING, ""),
+)
+# Agrégats de l'intervalle (la dernière valeur est le champ lui-même)
+AGGREGATED_FIELDS = ("aux_voltage", "panel_power", "charging_current", "bt_temperature", "bt_humidity")
+AGGREGATES = ("min", "max", "mean", "count")
+SCHEMA += tuple((f"{name}_{agg}", FLOAT, None) for name in AGGREGATED_FIELDS for agg in AGGREGATES)
+# Un zéro sur ces champs signifie "pas de mesure" : il n'est pas envoyé
+DROP_ZERO = frozenset(("main_voltage", "aux_voltage", "bt_temperature", "bt_humidity"))
+
+_FLOAT_DEFAULTS = array("d", [NAN if d is None else d for _, kind, d in SCHEMA if kind == FLOAT])
+_STRING_DEFAULTS = [d for _, kind, d in SCHEMA if kind == STRING]
+# champ -> (est_texte, indice dans le stockage correspondant)
+_SLOTS = {}
+for _name, _kind, _ in SCHEMA:
+    _is_str = _kind == STRING
+    _SLOTS[_name] = (_is_str, sum(1 for n in _SLOTS.values() if n[0] == _is_str))
+# Ordre d'encodage = ordre alphabétique, comme influxdb_client
+_ENCODE_ORDER = tuple(
+    (f"{escape_key(name)}=".encode(), _SLOTS[name][0], _SLOTS[name][1], name in DROP_ZERO)
+    for name in sorted(_SLOTS)
+)
+
+
+class SiteStatus:
+    __slots__ = ("site_id", "tags", "_floats", "_strings", "_prefix", "_buf")
+
+    def __init__(self, site_id: str, tags: dict[str, str] | None = None):
+        self.site_id = site_id
+        # Tags supplémentaires (ex : {"bank": "b1"}) ajoutés à site_id sur chaque point
+        self.tags = {key: str(value) for key, value in (tags or {}).items() if value not in (None, "")}
+        self._floats = array("d", _FLOAT_DEFAULTS)
+        self._strings = list(_STRING_DEFAULTS)
+        self._prefix = encode_prefix(MEASUREMENT, {**self.tags, "site_id": site_id})
+        self._buf = bytearray()
+
+    def reset(self):
+        self._floats[:] = _FLOAT_DEFAULTS
+        self._strings[:] = _STRING_DEFAULTS
+
+    def get(self, key):
+        """Valeur d'un champ (None si absente)"""
+        is_str, idx = _SLOTS[key]
+        if is_str:
+            return self._strings[idx]
+        value = self._floats[idx]
+        return None if value != value else value
+
+    @property
+    def status(self) -> dict:
+        """Vue dict de l'état (copie, pour lecture et logs)"""
+        return {name: self.get(name) for name, _, _ in SCHEMA}
+
+    def update(self, **kwargs):
+        """
+        Update existing fields with new values.
+
+        Parameters:
+            **kwargs: Arbitrary keyword arguments
+            where each key corresponds to a field of the schema.
+            Numeric fields are converted to float; values that
+            cannot be converted (e.g. None) mark the field as missing.
+            Text fields are converted to str.
+
+        Raises:
+            KeyError: If any provided key is not a field of the schema.
+        """
+        for key, value in kwargs.items():
+            slot = _SLOTS.get(key)
+            if slot is None:
+                raise KeyError(f"{key} n'est pas un champ valide")
+            is_str, idx = slot
+            if is_str:
+                self._strings[idx] = str(value)
+            else:
+                try:
+                    self._floats[idx] = float(value)
+                except (ValueError, TypeError):
+                    self._floats[idx] = NAN
+
+    def update_aggregates(self, field: str, stats: dict):
+        """Renseigne <field>_min/_max/_mean/_count à partir de RingBuffer.interval_stats()"""
+        self.update(**{f"{field}_{agg}": stats[agg] for agg in AGGREGATES})
+
+    def encode_into(self, buf: bytearray, timestamp_ns: int) -> bool:
+        """
+        Ajoute la ligne (terminée par \\n) au buffer.
+        Retourne False et laisse le buffer intact si aucun champ n'est à envoyer.
+        """
+        start = len(buf)
+        buf += self._prefix
+        floats = self._floats
+        strings = self._strings
+        sep = False
+        for key, is_str, idx, drop_zero in _ENCODE_ORDER:
+            if is_str:
+                value = strings[idx]
+                if value is None:
+                    continue
+                if sep:
+                    buf += b","
+                buf += key
+                buf += b'"'
+                buf += escape_string(value).encode()
+                buf += b'"'
+            else:
+                value = floats[idx]
+                if drop_zero and value == 0.0:
+                    continue
+                text = format_float(value)
+                if text is None:
+                    continue
+                if sep:
+                    buf += b","
+                buf += key
+                buf += text.encode()
+            sep = True
+        if not sep:
+            del buf[start:]
+            return False
+        buf += b" %d\n" % timestamp_ns
+        return True
+
+    def to_line_protocol(self, timestamp_ns: int | None = None) -> str:
+        """Ligne line protocol horodatée (maintenant par défaut), "" si rien à envoyer"""
+        buf = self._buf
+        buf.clear()
+        if not self.encode_into(buf, time.time_ns() if timestamp_ns is None else timestamp_ns):
+            return ""
+        return buf[:-1].decode()
+
+    def to_point(self):
+        """
+        Converts the current status into an influxdb_client Point
+        (kept for callers of the official client; the upload path
+        uses to_line_protocol()).
+        """
+        from influxdb_client import Point
+
+        point = Point(MEASUREMENT).tag("site_id", self.site_id)
+        for key, value in self.tags.items():
+            point = point.tag(key, value)
+        for field, value in self.status.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                point = point.field(field, value)
+            else:
+                if value == 0.0 and field in DROP_ZERO:
+                    continue
+                point = point.field(field, value)
+        return point.time(time.time_ns())
+
+    def __repr__(self):
+        tags = f", tags={self.tags}" if self.tags else ""
+        return f"SiteStatus(site_id={self.site_id}{tags}, status={self.status})"
@@ -0,0 +1,183 @@
+"""
+Plusieurs parcs de batteries dans un seul superviseur
+=====================================================
+Une passerelle par lieu physique supervise plusieurs parcs (batteries,
+chargeur Victron, carte ADS1115, capteur BTHome). Chaque parc a son
+propre SiteStatus, taggé site_id / bank ; scanner BLE, spool et envoi
+InfluxDB restent uniques. Ajouter un parc = ajouter une section :
+
+    [site:site_001]
+    bank = principal
+    victron_mac = FC:40:BC:FC:A8:D4
+    victron_key = 8ebf134b9339e9524eb24979c5e87505
+    victron_devices = F1:2A:7C:33:10:4B=0df4d0395b7d1a876c0c33ecb9e70dcd, D8:3B:11:90:6E:02
+    bthome_sensor = C0:2C:ED:A8:EE:6E
+    bthome_key = 231d39c1d7cc1ab1aee224cd096db932
+    ads_address = 0x48
+    main_chemistry = flooded
+    aux_chemistry = agm
+    main_divider = 3.98
+    aux_divider = 3.965
+    water_factor = 4.59
+
+victron_devices liste les autres appareils Victron du parc (chargeurs
+supplémentaires, SmartShunt...) sous la forme MAC=clé, ou MAC seule pour
+la clé victron_key. Toutes les clés sont optionnelles (bthome_key : capteur
+BTHome chiffré) ; sans ads_address le parc n'a pas de
+carte ADS1115. Sans aucune section [site:*], le superviseur construit un
+site unique à partir de ses valeurs par défaut.
+"""
+
+from ads_sampler import ADS1115Sampler
+from site_status import SiteStatus
+from soc import RestDetector, get_profile
+
+SECTION_PREFIX = "site:"
+
+
+def normalize_mac(address: str) -> str:
+    """Adresse MAC canonique : majuscules, séparateur ':'"""
+    return address.strip().upper().replace("-", ":")
+
+
+class SiteConfig:
+    def __init__(self, site_id, bank=None, victron_mac=None, victron_key=None, bthome_sensor=None,
+                 bthome_key=None, ads_address=None, victron_devices=None, main_chemistry="flooded", aux_chemistry="agm",
+                 main_divider=3.98, aux_divider=3.965, water_factor=4.59):
+        # KeyError explicite si la chimie n'est pas enregistrée
+        get_profile(main_chemistry)
+        get_profile(aux_chemistry)
+        self.site_id = site_id
+        self.bank = bank or None
+        self.victron_mac = normalize_mac(victron_mac) if victron_mac else None
+        self.victron_key = victron_key or None
+        # Autres appareils Victron du parc : MAC -> clé (None = victron_key)
+        self.victron_devices = {normalize_mac(mac): key or None for mac, key in (victron_devices or {}).items()}
+        self.bthome_sensor = normalize_mac(bthome_sensor) if bthome_sensor else None
+        self.bthome_key = bthome_key or None
+        self.ads_address = ads_address
+        self.main_chemistry = main_chemistry
+        self.aux_chemistry = aux_chemistry
+        self.main_divider = main_divider
+        self.aux_divider = aux_divider
+        self.water_factor = water_factor
+
+    @classmethod
+    def from_section(cls, site_id: str, section) -> "SiteConfig":
+        """Construit la configuration depuis une section configparser"""
+        ads_address = section.get("ads_address", "").strip()
+        kwargs = {
+            "bank": section.get("bank"),
+            "victron_mac": section.get("victron_mac"),
+            "victron_key": section.get("victron_key"),
+            "bthome_sensor": section.get("bthome_sensor"),
+            "bthome_key": section.get("bthome_key"),
+            "victron_devices": parse_devices(section.get("victron_devices", "")),
+            "ads_address": int(ads_address, 0) if ads_address else None,
+        }
+        for key in ("main_chemistry", "aux_chemistry"):
+            if key in section:
+                kwargs[key] = section.get(key).strip()
+        for key in ("main_divider", "aux_divider", "water_factor"):
+            if key in section:
+                kwargs[key] = section.getfloat(key)
+        return cls(site_id, **kwargs)
+
+    @property
+    def victron_macs(self) -> list[str]:
+        """Tous les appareils Victron du parc, le principal en premier"""
+        macs = [self.victron_mac] if self.victron_mac else []
+        return macs + [mac for mac in self.victron_devices if mac != self.victron_mac]
+
+    def victron_key_of(self, mac: str) -> str | None:
+        return self.victron_devices.get(mac) or self.victron_key
+
+    def __repr__(self):
+        return (f"SiteConfig({self.site_id}, bank={self.bank}, victron={self.victron_mac}, "
+                f"bthome={self.bthome_sensor}, ads={self.ads_address})")
+
+
+def parse_devices(text: str) -> dict[str, str | None]:
+    """ "MAC=clé, MAC, ..." -> {MAC: clé ou None}"""
+    devices = {}
+    for entry in text.split(","):
+        mac, _, key = entry.partition("=")
+        if mac.strip():
+            devices[normalize_mac(mac)] = key.strip() or None
+    return devices
+
+
+def load_site_configs(config) -> list[SiteConfig]:
+    """
+    Une SiteConfig par section [site:<id>] (ordre du fichier).
+
+    Raises:
+        ValueError: identifiant vide, ou Victron / adresse ADS1115 partagés par deux parcs.
+    """
+    sites = []
+    for name in config.sections():
+        if not name.startswith(SECTION_PREFIX):
+            continue
+        site_id = name[len(SECTION_PREFIX):].strip()
+        if not site_id:
+            raise ValueError(f"[{name}] : identifiant de site vide")
+        sites.append(SiteConfig.from_section(site_id, config[name]))
+    _check_unique(sites, "victron_mac")
+    seen = {}
+    for site in sites:
+        for mac in site.victron_macs:
+            if seen.get(mac, site.site_id) != site.site_id:
+                raise ValueError(f"victron {mac} utilisé par {seen[mac]} et {site.site_id}")
+            seen[mac] = site.site_id
+    _check_unique(sites, "ads_address")
+    return sites
+
+
+def _check_unique(sites, attribute):
+    seen = {}
+    for site in sites:
+        value = getattr(site, attribute)
+        if value is None:
+            continue
+        if value in seen:
+            raise ValueError(f"{attribute} {value} utilisé par {seen[value]} et {site.site_id}")
+        seen[value] = site.site_id
+
+
+class Site:
+    """État d'exécution d'un parc : SiteStatus, carte ADS1115, détection du repos"""
+
+    def __init__(self, config: SiteConfig, ads_channels=None):
+        self.config = config
+        self.site_id = config.site_id
+        self.status = SiteStatus(config.site_id, tags={"bank": config.bank})
+        self.sampler = (
+            ADS1115Sampler(ads_channels, address=config.ads_address) if config.ads_address is not None else None
+        )
+        # SOC aux (Victron) : la tension n'est fiable qu'au repos, sinon on garde la dernière valeur
+        self.aux_rest = RestDetector()
+        self.aux_level_at_rest = None
+        # Dernier échantillonnage de status par read_loop (time.time())
+        self.last_sample = None
+        # Plusieurs chargeurs : panel_power est leur somme, historisée par read_loop à chaque
+        # échantillonnage (les historiques par MAC n'ont pas d'horodatages communs à additionner)
+        self.panel_power_series = f"{self.site_id}.panel_power" if len(config.victron_macs) > 1 else None
+
+    def history_fields(self) -> dict[str, str]:
+        """Clé d'historique du GlobalStateManager -> champ SiteStatus recevant min/max/mean/count"""
+        fields = {}
+        if self.config.victron_mac:
+            mac = self.config.victron_mac
+            fields[f"{mac}.battery_voltage"] = "aux_voltage"
+            fields[f"{mac}.battery_charging_current"] = "charging_current"
+        if self.panel_power_series:
+            fields[self.panel_power_series] = "panel_power"
+        elif self.config.victron_mac:
+            fields[f"{self.config.victron_mac}.solar_power"] = "panel_power"
+        if self.config.bthome_sensor:
+            fields[f"{self.config.bthome_sensor}.temperature"] = "bt_temperature"
+            fields[f"{self.config.bthome_sensor}.humidity"] = "bt_humidity"
+        return fields
+
+    def __repr__(self):
+        return f"Site({self.config!r})"
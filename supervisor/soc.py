@@ -0,0 +1,176 @@
+"""
+Estimation de l'état de charge (SOC) par la tension au repos
+============================================================
+  - profils de chimie enregistrés (plomb ouvert, AGM, gel, LiFePO4) :
+    table SOC/tension à 25 °C et coefficient de température
+  - recherche scalaire par bisection
+  - API vectorisée NumPy pour évaluer des historiques complets d'un coup
+  - détection des périodes de repos : la tension ne donne un SOC fiable
+    que lorsque le courant de charge est quasi nul depuis un moment
+
+NumPy n'est importé qu'au premier calcul vectorisé : le chemin scalaire
+utilisé à chaque cycle n'en a pas besoin.
+"""
+
+import bisect
+import importlib.util
+import time
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+np = None
+
+REF_TEMPERATURE = 25.0
+REST_CURRENT_THRESHOLD = 0.3    # A
+REST_MIN_DURATION = 900         # s
+
+
+def _numpy():
+    global np
+    if np is None:
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for batch SOC estimation")
+        import numpy
+        np = numpy
+    return np
+
+
+class ChemistryProfile:
+    def __init__(self, name: str, table: list[tuple[float, float]], temp_coeff: float):
+        """
+        :param table: couples (SOC %, tension V) à 25 °C, dans n'importe quel ordre
+        :param temp_coeff: correction en V/°C, ajoutée pour chaque degré sous 25 °C
+        """
+        points = sorted(table, key=lambda p: p[1])
+        self.name = name
+        self.voltages = [v for _, v in points]
+        self.socs = [float(s) for s, _ in points]
+        self.temp_coeff = temp_coeff
+        if any(v2 <= v1 for v1, v2 in zip(self.voltages, self.voltages[1:])):
+            raise ValueError(f"{name}: voltages must be strictly monotonic")
+        self._np_voltages = None
+        self._np_socs = None
+
+    def corrected_voltage(self, voltage, temperature_c):
+        return voltage + (REF_TEMPERATURE - temperature_c) * self.temp_coeff
+
+    def soc(self, voltage: float, temperature_c: float) -> float:
+        """SOC (%) pour une mesure, interpolation linéaire dans la table"""
+        v = self.corrected_voltage(voltage, temperature_c)
+        voltages = self.voltages
+        if v >= voltages[-1]:
+            return self.socs[-1]
+        if v <= voltages[0]:
+            return self.socs[0]
+        i = bisect.bisect_right(voltages, v)
+        v1, v2 = voltages[i - 1], voltages[i]
+        s1, s2 = self.socs[i - 1], self.socs[i]
+        return round(s1 + (s2 - s1) * (v - v1) / (v2 - v1), 1)
+
+    def soc_batch(self, voltages, temperatures_c):
+        """SOC (%) pour des tableaux de tensions et températures (ou une température scalaire)"""
+        np = _numpy()
+        if self._np_voltages is None:
+            self._np_voltages = np.asarray(self.voltages)
+            self._np_socs = np.asarray(self.socs)
+        v = self.corrected_voltage(np.asarray(voltages, dtype=float), np.asarray(temperatures_c, dtype=float))
+        # np.interp borne déjà aux extrémités de la table
+        return np.round(np.interp(v, self._np_voltages, self._np_socs), 1)
+
+    def __repr__(self):
+        return f"ChemistryProfile({self.name!r}, {len(self.voltages)} points, {self.temp_coeff} V/°C)"
+
+
+PROFILES: dict[str, ChemistryProfile] = {}
+
+
+def register_profile(profile: ChemistryProfile) -> ChemistryProfile:
+    PROFILES[profile.name] = profile
+    return profile
+
+
+def get_profile(chemistry: str) -> ChemistryProfile:
+    try:
+        return PROFILES[chemistry]
+    except KeyError:
+        raise KeyError(f"Unknown chemistry {chemistry!r}, known: {sorted(PROFILES)}") from None
+
+
+def estimate_soc(voltage: float, temperature_c: float, chemistry: str = "flooded") -> float:
+    return get_profile(chemistry).soc(voltage, temperature_c)
+
+
+def estimate_soc_batch(voltages, temperatures_c, chemistry: str = "flooded", resting=None):
+    """
+    Version vectorisée de estimate_soc. Si resting (masque booléen) est
+    fourni, les échantillons hors repos valent NaN.
+    """
+    np = _numpy()
+    socs = get_profile(chemistry).soc_batch(voltages, temperatures_c)
+    if resting is not None:
+        socs = np.where(resting, socs, np.nan)
+    return socs
+
+
+def rest_mask(currents, timestamps, threshold=REST_CURRENT_THRESHOLD, min_duration=REST_MIN_DURATION):
+    """
+    Masque des échantillons pris au repos : |courant| < threshold sans
+    interruption depuis au moins min_duration secondes.
+    """
+    np = _numpy()
+    currents = np.asarray(currents, dtype=float)
+    timestamps = np.asarray(timestamps, dtype=float)
+    if currents.size == 0:
+        return np.zeros(0, dtype=bool)
+    quiet = np.abs(currents) < threshold
+    idx = np.arange(currents.size)
+    # Indice du dernier échantillon hors repos (-1 si aucun) ; le repos commence juste après
+    last_busy = np.maximum.accumulate(np.where(quiet, -1, idx))
+    rest_start = np.minimum(last_busy + 1, currents.size - 1)
+    return quiet & (timestamps - timestamps[rest_start] >= min_duration)
+
+
+class RestDetector:
+    """Suivi en ligne du repos batterie à partir du courant de charge"""
+
+    def __init__(self, threshold=REST_CURRENT_THRESHOLD, min_duration=REST_MIN_DURATION):
+        self.threshold = threshold
+        self.min_duration = min_duration
+        self.quiet_since = None
+
+    def update(self, current, now=None) -> bool:
+        now = time.monotonic() if now is None else now
+        if current is None or abs(current) >= self.threshold:
+            self.quiet_since = None
+            return False
+        if self.quiet_since is None:
+            self.quiet_since = now
+        return now - self.quiet_since >= self.min_duration
+
+    @property
+    def resting(self) -> bool:
+        return self.quiet_since is not None and time.monotonic() - self.quiet_since >= self.min_duration
+
+
+# Batterie plomb ouverte 12 V, ≈ 18 mV/°C
+register_profile(ChemistryProfile("flooded", [
+    (100, 12.70), (90, 12.60), (80, 12.50), (70, 12.40), (60, 12.30), (50, 12.20),
+    (40, 12.10), (30, 12.00), (20, 11.90), (10, 11.80), (0, 11.70),
+], temp_coeff=0.018))
+
+# AGM 12 V, ≈ 15 mV/°C
+register_profile(ChemistryProfile("agm", [
+    (100, 12.85), (90, 12.75), (80, 12.65), (70, 12.55), (60, 12.45), (50, 12.35),
+    (40, 12.25), (30, 12.15), (20, 12.05), (10, 11.95), (0, 11.80),
+], temp_coeff=0.015))
+
+# Gel 12 V, ≈ 15 mV/°C
+register_profile(ChemistryProfile("gel", [
+    (100, 12.90), (90, 12.80), (80, 12.70), (70, 12.60), (60, 12.50), (50, 12.40),
+    (40, 12.30), (30, 12.20), (20, 12.10), (10, 12.00), (0, 11.80),
+], temp_coeff=0.015))
+
+# LiFePO4 4S 12,8 V : plateau très plat, dérive thermique négligeable
+register_profile(ChemistryProfile("lifepo4", [
+    (100, 13.60), (99, 13.40), (90, 13.30), (70, 13.20), (40, 13.10), (30, 13.00),
+    (20, 12.90), (17, 12.80), (14, 12.60), (9, 12.50), (0, 10.00),
+], temp_coeff=0.0))
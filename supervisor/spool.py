@@ -0,0 +1,131 @@
+"""
+Spool disque des points en attente d'envoi
+==========================================
+Les points (line protocol InfluxDB) sont stockés dans une base SQLite en mode
+WAL au lieu d'une liste en mémoire : une coupure LTE de plusieurs jours ou un
+reboot ne fait plus perdre l'historique.
+
+  - écriture append-only, une transaction par lot
+  - relecture par lots bornés (nombre de points et octets), plus ancien d'abord
+  - plafonds en lignes et en octets, éviction des points les plus anciens
+"""
+
+import logging
+import sqlite3
+
+DEFAULT_MAX_ROWS = 200_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 500
+EVICT_CHUNK = 1000
+
+
+class PointSpool:
+    def __init__(self, path: str, max_rows: int = DEFAULT_MAX_ROWS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        # isolation_level=None : on pilote les transactions explicitement
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "line TEXT NOT NULL, "
+            "size INTEGER NOT NULL)"
+        )
+        self._rows, self._bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM points"
+        ).fetchone()
+        if self._rows:
+            logging.info("[SPOOL] %d points (%d bytes) pending in %s", self._rows, self._bytes, path)
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def append(self, lines: list[str]) -> None:
+        """Ajoute des lignes en fin de spool puis applique les plafonds"""
+        if not lines:
+            return
+        rows = [(line, len(line.encode())) for line in lines]
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany("INSERT INTO points (line, size) VALUES (?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._rows += len(rows)
+        self._bytes += sum(size for _, size in rows)
+        self._evict()
+
+    def read_batch(self, max_rows: int = DEFAULT_BATCH_SIZE, max_bytes: int | None = None) -> tuple[int | None, list[str]]:
+        """
+        Retourne (dernier id, lignes) pour les points les plus anciens.
+        Le lot contient au plus max_rows points et max_bytes octets
+        (au moins un point même s'il dépasse max_bytes).
+        Rien n'est supprimé tant que ack() n'est pas appelé.
+        """
+        last_id = None
+        lines = []
+        total = 0
+        cursor = self.conn.execute(
+            "SELECT id, line, size FROM points ORDER BY id LIMIT ?", (max_rows,)
+        )
+        for row_id, line, size in cursor:
+            if max_bytes is not None and lines and total + size > max_bytes:
+                break
+            last_id = row_id
+            lines.append(line)
+            total += size
+        return last_id, lines
+
+    def ack(self, last_id: int) -> None:
+        """Supprime les points envoyés (id <= last_id)"""
+        self._delete_up_to(last_id)
+
+    def _delete_up_to(self, last_id: int) -> tuple[int, int]:
+        self.conn.execute("BEGIN")
+        try:
+            count, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM points WHERE id <= ?", (last_id,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM points WHERE id <= ?", (last_id,))
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._rows -= count
+        self._bytes -= size
+        return count, size
+
+    def _evict(self) -> None:
+        """Supprime les points les plus anciens tant qu'un plafond est dépassé"""
+        while self._rows > self.max_rows or self._bytes > self.max_bytes:
+            rows_over = self._rows - self.max_rows
+            bytes_over = self._bytes - self.max_bytes
+            cutoff = None
+            dropped_rows = 0
+            dropped_bytes = 0
+            cursor = self.conn.execute(
+                "SELECT id, size FROM points ORDER BY id LIMIT ?", (EVICT_CHUNK,)
+            )
+            for row_id, size in cursor:
+                cutoff = row_id
+                dropped_rows += 1
+                dropped_bytes += size
+                if dropped_rows >= rows_over and dropped_bytes >= bytes_over:
+                    break
+            if cutoff is None:
+                return
+            count, size = self._delete_up_to(cutoff)
+            self.evicted += count
+            logging.warning("[SPOOL] Spool full, evicted %d oldest points (%d bytes)", count, size)
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,67 @@
+"""
+Chronométrage du démarrage
+==========================
+Durée de chaque phase (imports, config, scanner BLE, décodeurs, spool,
+connectivité...) et instants clés (première annonce décodée), comptés
+depuis le lancement du processus quand /proc le permet, sinon depuis
+l'import de ce module. Affiché par supervisor.py --startup-report.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+def process_start() -> float:
+    """Instant time.monotonic() du lancement du processus (Linux), sinon maintenant"""
+    now = time.monotonic()
+    try:
+        with open("/proc/self/stat") as f:
+            # Le nom du programme peut contenir des espaces : on découpe après la parenthèse fermante
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        elapsed = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return now
+    return now - max(0.0, elapsed)
+
+
+class StartupTimer:
+    def __init__(self, start: float | None = None):
+        self.start = process_start() if start is None else start
+        self.phases = []    # (nom, début, durée) en secondes depuis start
+        self.events = {}    # nom -> secondes depuis start
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    @contextmanager
+    def phase(self, name: str):
+        begin = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, begin)
+
+    def record(self, name: str, begin: float):
+        """Phase commencée à begin (time.monotonic()) et terminée maintenant"""
+        self.phases.append((name, begin - self.start, time.monotonic() - begin))
+
+    def event(self, name: str, at: float | None = None):
+        """Note un instant (time.monotonic()) ; seul le premier appel par nom compte"""
+        if name not in self.events:
+            self.events[name] = (time.monotonic() if at is None else at) - self.start
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": [{"name": n, "start_s": round(b, 3), "duration_s": round(d, 3)} for n, b, d in self.phases],
+            "events": {n: round(t, 3) for n, t in self.events.items()},
+        }
+
+    def report(self) -> str:
+        lines = [f"{'phase':<28} {'début (s)':>10} {'durée (s)':>10}"]
+        for name, begin, duration in self.phases:
+            lines.append(f"{name:<28} {begin:>10.3f} {duration:>10.3f}")
+        for name, at in sorted(self.events.items(), key=lambda e: e[1]):
+            lines.append(f"{'@ ' + name:<28} {at:>10.3f}")
+        return "\n".join(lines)
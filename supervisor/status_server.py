@@ -0,0 +1,218 @@
+"""
+Point d'accès HTTP local à l'état en mémoire
+============================================
+Petit serveur asyncio (asyncio.start_server, sans dépendance) qui expose
+sur le LAN du site l'état courant, sans passer par InfluxDB :
+
+  GET /status   JSON : SiteStatus de chaque parc, états Victron / BTHome
+                avec l'âge de la dernière trame, connectivité, spool, envoi
+  GET /metrics  même contenu au format texte Prometheus
+
+Les réponses sont construites à la demande en lisant les objets partagés,
+sans verrou ni attente : la boucle d'acquisition n'est jamais bloquée.
+Requêtes bornées (taille, délai, connexions simultanées), une requête
+par connexion.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from datetime import datetime, UTC
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8080
+MAX_CONNECTIONS = 8
+REQUEST_TIMEOUT = 5         # secondes pour recevoir la requête complète, puis pour envoyer la réponse
+MAX_HEADER_LINES = 32
+MAX_LINE_BYTES = 2048
+PROMETHEUS_PREFIX = "kepler"
+
+JSON_TYPE = "application/json; charset=utf-8"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+def _age(timestamp, now):
+    return None if timestamp is None else round(now - timestamp, 1)
+
+
+def _number(value):
+    """Valeur numérique exportable en Prometheus, sinon None"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value)):
+        return float(value)
+    return None
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _sample(name: str, labels: dict, value: float) -> str:
+    inner = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items() if val is not None)
+    return f"{PROMETHEUS_PREFIX}_{name}{{{inner}}} {value!r}" if inner else f"{PROMETHEUS_PREFIX}_{name} {value!r}"
+
+
+class StatusServer:
+    def __init__(self, sites, manager, connectivity=None, spool=None, uploader=None,
+                 host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.sites = sites
+        self.manager = manager
+        self.connectivity = connectivity
+        self.spool = spool
+        self.uploader = uploader
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.rejected = 0
+        self._active = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]    # port réel si 0
+        logging.info("[HTTP] Status endpoint listening on %s:%d", self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # --- Contenu ---
+
+    def status(self, now: float | None = None) -> dict:
+        """Instantané JSON de l'état courant (âges en secondes)"""
+        now = time.time() if now is None else now
+        manager = self.manager
+        sites = {}
+        for site in self.sites:
+            sites[site.site_id] = {
+                "tags": site.status.tags,
+                "sample_age_s": _age(getattr(site, "last_sample", None), now),
+                "status": site.status.status,
+            }
+        victron = {
+            mac: {"state": state, "age_s": _age(manager.victron_last_seen.get(mac), now)}
+            for mac, state in manager.victron_states.items()
+        }
+        bthome = {
+            mac: {"state": state, "age_s": _age(manager.bthome_last_seen.get(mac), now)}
+            for mac, state in manager.bthome_states.items()
+        }
+        data = {"time": datetime.fromtimestamp(now, UTC).isoformat(), "sites": sites,
+                "devices": {"victron": victron, "bthome": bthome}}
+        if self.connectivity is not None:
+            c = self.connectivity
+            data["connectivity"] = {
+                "state": c.state, "connected": c.connected, "lte": c.lte_signal,
+                "lte_registered": c.is_registered, "signal_dbm": c.signal_dbm,
+                "lte_failures": c.lte_failures, "state_age_s": round(time.monotonic() - c.last_change, 1),
+            }
+        if self.spool is not None:
+            data["spool"] = {"points": len(self.spool), "bytes": self.spool.size_bytes, "evicted": self.spool.evicted}
+        if self.uploader is not None:
+            u = self.uploader
+            last = u.last_success.timestamp() if u.last_success else None
+            data["uploader"] = {"points_sent": u.points_sent, "points_dropped": u.points_dropped,
+                                "batches_sent": u.batches_sent, "last_success_age_s": _age(last, now)}
+        return data
+
+    def metrics(self, now: float | None = None) -> str:
+        """Même instantané au format d'exposition texte Prometheus"""
+        data = self.status(now)
+        lines = []
+        for site_id, site in data["sites"].items():
+            labels = {"site_id": site_id, **site["tags"]}
+            texts = {}
+            for field, value in site["status"].items():
+                number = _number(value)
+                if number is not None:
+                    lines.append(_sample(f"site_{field}", labels, number))
+                elif isinstance(value, str):
+                    texts[field] = value
+            lines.append(_sample("site_info", {**labels, **texts}, 1.0))
+            if site["sample_age_s"] is not None:
+                lines.append(_sample("site_sample_age_seconds", labels, site["sample_age_s"]))
+        for kind, devices in data["devices"].items():
+            for mac, device in devices.items():
+                labels = {"mac": mac, "name": device["state"].get("name")}
+                for key, value in device["state"].items():
+                    number = _number(value)
+                    if number is not None:
+                        lines.append(_sample(f"{kind}_{key}", labels, number))
+                if device["age_s"] is not None:
+                    lines.append(_sample("device_last_seen_age_seconds", {"kind": kind, **labels}, device["age_s"]))
+        for section in ("connectivity", "spool", "uploader"):
+            values = data.get(section)
+            if not values:
+                continue
+            labels = {"state": values["state"]} if section == "connectivity" else {}
+            for key, value in values.items():
+                number = _number(value)
+                if number is not None:
+                    lines.append(_sample(f"{section}_{key}", labels, number))
+        return "\n".join(lines) + "\n"
+
+    # --- HTTP ---
+
+    def respond(self, method: str, target: str) -> tuple[int, str, bytes]:
+        """(code, type MIME, corps) pour une requête"""
+        if method not in ("GET", "HEAD"):
+            return 405, "text/plain", b"method not allowed\n"
+        path = target.split("?", 1)[0].rstrip("/") or "/"
+        if path == "/status":
+            return 200, JSON_TYPE, json.dumps(self.status(), default=str).encode()
+        if path == "/metrics":
+            return 200, PROMETHEUS_TYPE, self.metrics().encode()
+        if path == "/":
+            return 200, "text/plain", b"/status (JSON)\n/metrics (Prometheus)\n"
+        return 404, "text/plain", b"not found\n"
+
+    async def _read_request(self, reader) -> tuple[str, str] | None:
+        request_line = await reader.readline()
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3 or len(request_line) > MAX_LINE_BYTES:
+            return None
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return parts[0], parts[1]
+        return None
+
+    async def _handle(self, reader, writer):
+        self.requests += 1
+        method = "GET"
+        counted = False
+        try:
+            if self._active >= MAX_CONNECTIONS:
+                self.rejected += 1
+                code, content_type, body = 503, "text/plain", b"busy\n"
+            else:
+                # Connexion comptée jusqu'à sa fermeture : un client lent à lire la réponse occupe aussi une place
+                self._active += 1
+                counted = True
+                request = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+                if request is None:
+                    code, content_type, body = 400, "text/plain", b"bad request\n"
+                else:
+                    method = request[0]
+                    code, content_type, body = self.respond(*request)
+            header = (
+                f"HTTP/1.1 {code} {_REASONS[code]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nCache-Control: no-store\r\nConnection: close\r\n\r\n"
+            )
+            writer.write(header.encode("latin-1") + (b"" if method == "HEAD" else body))
+            await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, ValueError, ConnectionError) as e:
+            logging.debug("[HTTP] Request aborted: %s", e)
+        except Exception as e:
+            logging.error("[HTTP] Error while serving request: %s", e)
+        finally:
+            writer.close()
+            if counted:
+                self._active -= 1
@@ -1,27 +1,34 @@
 import asyncio
-from asyncio import subprocess
+import argparse
+import subprocess
 from datetime import datetime, UTC
 import configparser
 import os
 import sys
 import math
+import time
 import logging
-try:
-    import board
-    import busio
-    import adafruit_ads1x15.ads1115 as ADS
-    from adafruit_ads1x15.analog_in import AnalogIn
-    ADAFRUIT_AVAILABLE = True
-except ImportError:
+from startup import StartupTimer
+STARTUP = StartupTimer()
+from ads_sampler import ChannelConfig, ADAFRUIT_AVAILABLE
+if not ADAFRUIT_AVAILABLE:
     print("Failed to import Adafruit ")
-    ADAFRUIT_AVAILABLE = False
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
-from influxdb_client.client.exceptions import InfluxDBError
-from lte_init import is_lte_used, test_ping, ready_or_connect
-
-# 💡 Importation de la nouvelle classe de stockage et du lanceur
-from testmulti import GlobalStateManager, BleakScanner
+from connectivity import ConnectivityManager
+from sites import Site, SiteConfig, load_site_configs, normalize_mac
+from soc import estimate_soc
+from spool import PointSpool, DEFAULT_BATCH_SIZE, DEFAULT_MAX_ROWS, DEFAULT_MAX_BYTES
+from uploader import InfluxUploader, BATCH_MAX_BYTES, GZIP_LEVEL
+from adv_capture import AdvRecorder
+from line_protocol import encode_line
+from report_scheduler import ReportScheduler, DEFAULT_SAMPLE_INTERVAL
+from status_server import StatusServer, DEFAULT_HOST, DEFAULT_PORT
+from perf import PerfRecorder, DEFAULT_INTERVAL as PERF_DEFAULT_INTERVAL
+from bt_recovery import BluetoothRecovery, SILENCE_TIMEOUT, ERROR_THRESHOLD
+from scan_scheduler import ScanScheduler, MODE_PASSIVE, DEFAULT_FILTERS, bleak_factory
+
+# 💡 Importation de la nouvelle classe de stockage (bleak et les décodeurs sont importés au lancement du scan)
+from testmulti import GlobalStateManager
+STARTUP.event("modules_imported")
 
 stdout_handler = logging.StreamHandler(sys.stdout)
 stderr_handler = logging.StreamHandler(sys.stderr)
@@ -43,27 +50,69 @@ logging.getLogger("bleak.backends.bluez").setLevel(logging.WARNING)
 logging.getLogger("org.bluez").setLevel(logging.WARNING)
 logging.info("Service démarré")
 
+VERSION = "224"
+
 # --- CONFIGURATION MATÉRIEL ---
 VICTRON_MAC = "FC:40:BC:FC:A8:D4"
 VICTRON_KEY = "8ebf134b9339e9524eb24979c5e87505"
 SHELLY_MAC = "C0:2C:ED:A8:EE:6E"
 SHELLY_MAC_2 = "7C:C6:B6:57:53:BA"
 LISTE_MAC_BTHOME = [SHELLY_MAC, SHELLY_MAC_2]
-
-POINTS = []
+# Bindkeys des capteurs BTHome chiffrés : MAC normalisée -> clé hexadécimale
+BTHOME_BINDKEYS = {}
+BTHOME_MEASUREMENT = "bthome_metrics"
+
+SPOOL = None
+SPOOL_PATH = "supervisor_spool.db"
+SPOOL_MAX_ROWS = DEFAULT_MAX_ROWS
+SPOOL_MAX_BYTES = DEFAULT_MAX_BYTES
+SPOOL_BATCH_SIZE = DEFAULT_BATCH_SIZE
+UPLOAD_MAX_BYTES = BATCH_MAX_BYTES
+UPLOAD_GZIP_LEVEL = GZIP_LEVEL
+# Rapport --startup-report : attente maximale de la première annonce décodée (s)
+STARTUP_REPORT_TIMEOUT = 120
+# Échantillonnage toutes les REPORT_SAMPLE_INTERVAL s, envoi sur changement ou battement de cœur
+REPORT_SAMPLE_INTERVAL = DEFAULT_SAMPLE_INTERVAL
+REPORT_SCHEDULER = None
+# Point d'accès HTTP local /status et /metrics (désactivé si HTTP_PORT est None)
+HTTP_HOST = DEFAULT_HOST
+HTTP_PORT = DEFAULT_PORT
+# Récupération Bluetooth graduée : silence du scanner (s) / erreurs BLE avant d'agir (None = désactivée)
+BT_SILENCE_TIMEOUT = SILENCE_TIMEOUT
+BT_ERROR_THRESHOLD = ERROR_THRESHOLD
+# Scanner BLE arrêté hors des fenêtres d'écoute Victron. SCAN_BTHOME_CONTINUOUS (opt-in) le garde actif
+# en continu dès qu'un capteur BTHome est enregistré : événements jamais manqués, mais plus aucune pause
+SCAN_DUTY_CYCLE = True
+SCAN_MODE = MODE_PASSIVE
+SCAN_BTHOME_CONTINUOUS = False
+# Familles d'appareils laissées passer par BlueZ en scan passif (scan_scheduler.PATTERNS)
+SCAN_FILTERS = DEFAULT_FILTERS
+# Histogrammes de durée des étapes (supervisor_perf), envoyés toutes les PERF_INTERVAL s (None = désactivé)
+PERF_INTERVAL = PERF_DEFAULT_INTERVAL
+# Capture des annonces BLE pour rejeu (désactivée si None)
+CAPTURE_PATH = None
+CAPTURE_MAX_BYTES = None
 BUCKET = None
 ORG = None
 TOKEN = None
 SERVER = None
 INTERVAL = 30  # seconds
-CLIENT = None
-WRITE_API = None
 VCC = 3.3               # Alimentation
 R_FIXED = 10000.0       # Résistance fixe (ohms)
 R0 = 10000.0            # NTC à 25°C
 BETA = 3950.0           # Coefficient Beta
 T0 = 298.15             # 25°C en Kelvi
-LAST_UPDATE = None
+
+# Voies ADS1115 : 0 = batterie aux, 1 = batterie principale, 2 = NTC, 3 = niveau d'eau
+# gain 1 = +/-4.096V ; médiane sur 5 conversions pour écarter les parasites
+ADS_CHANNELS = {
+    0: ChannelConfig(gain=1, data_rate=250, samples=5, reducer="median"),
+    1: ChannelConfig(gain=1, data_rate=250, samples=5, reducer="median"),
+    2: ChannelConfig(gain=1, data_rate=250, samples=5, reducer="median"),
+    3: ChannelConfig(gain=1, data_rate=128, samples=8, reducer="mean"),
+}
+# Parcs supervisés (sections [site:<id>], sinon site unique par défaut)
+SITES = []
 
 
 def lead_soc(voltage, temperature_c):
@@ -73,43 +122,7 @@ def lead_soc(voltage, temperature_c):
     :param temperature_c: température en °C
     :return: SOC en %
     """
-
-    # Table SOC vs tension à 25°C (batterie plomb ouverte)
-    soc_table = [
-        (100, 12.70),
-        (90, 12.60),
-        (80, 12.50),
-        (70, 12.40),
-        (60, 12.30),
-        (50, 12.20),
-        (40, 12.10),
-        (30, 12.00),
-        (20, 11.90),
-        (10, 11.80),
-        (0, 11.70),
-    ]
-
-    # Correction température vers 25 °C
-    # Coefficient plomb ≈ 18 mV / °C pour une batterie 12 V
-    corrected_voltage = voltage + (25 - temperature_c) * 0.018
-
-    # Bornes
-    if corrected_voltage >= soc_table[0][1]:
-        return 100.0
-    if corrected_voltage <= soc_table[-1][1]:
-        return 0.0
-
-    # Interpolation linéaire
-    for i in range(len(soc_table) - 1):
-        soc1, v1 = soc_table[i]
-        soc2, v2 = soc_table[i + 1]
-
-        if v1 >= corrected_voltage >= v2:
-            soc = soc1 + (soc2 - soc1) * (v1 - corrected_voltage) / (v1 - v2)
-            logging.info("[MAIN] Lead SOC calculated: %f for voltage: %f and temp: %f", soc, voltage, temperature_c)
-            return round(soc, 1)
-
-    return None
+    return estimate_soc(voltage, temperature_c, "flooded")
 
 
 def agm_soc(voltage, temperature_c):
@@ -119,42 +132,7 @@ def agm_soc(voltage, temperature_c):
     :param temperature_c: température en °C
     :return: SOC en %
     """
-
-    # Table SOC vs tension à 25°C (AGM)
-    soc_table = [
-        (100, 12.85),
-        (90, 12.75),
-        (80, 12.65),
-        (70, 12.55),
-        (60, 12.45),
-        (50, 12.35),
-        (40, 12.25),
-        (30, 12.15),
-        (20, 12.05),
-        (10, 11.95),
-        (0, 11.80),
-    ]
-
-    # Correction température (−15 mV / °C pour une batterie 12 V)
-    corrected_voltage = voltage + (25 - temperature_c) * 0.015
-
-    # Bornes
-    if corrected_voltage >= soc_table[0][1]:
-        return 100.0
-    if corrected_voltage <= soc_table[-1][1]:
-        return 0.0
-
-    # Interpolation linéaire
-    for i in range(len(soc_table) - 1):
-        soc1, v1 = soc_table[i]
-        soc2, v2 = soc_table[i + 1]
-
-        if v1 >= corrected_voltage >= v2:
-            soc = soc1 + (soc2 - soc1) * (v1 - corrected_voltage) / (v1 - v2)
-            logging.info("[MAIN] AGM SOC calculated: %f for voltage: %f and temp: %f", soc, voltage, temperature_c)
-            return round(soc, 1)
-
-    return None
+    return estimate_soc(voltage, temperature_c, "agm")
 
 
 def ntc_temperature(voltage):
@@ -164,7 +142,7 @@ def ntc_temperature(voltage):
     r_ntc = R_FIXED * (voltage / (VCC - voltage))
     temp_k = 1.0 / ((1.0 / T0) + (1.0 / BETA) * math.log(r_ntc / R0))
     res = round(temp_k - 273.15, 1)
-    logging.info("[MAIN] NTC temperature calculated: %s °C for voltage: %s V", res, voltage)
+    logging.debug("[MAIN] NTC temperature calculated: %s °C for voltage: %s V", res, voltage)
     return res
 
 
@@ -173,260 +151,322 @@ def reboot_system():
     subprocess.run(['sudo', 'reboot'], check=False)
 
 
-class SiteStatus:
-    def __init__(self, site_id: str):
-        self.site_id = site_id
-        self.reset()
-
-    def reset(self):
-        self.status = {
-            "aux_voltage": None,
-            "aux_level": 0.0,
-            "main_voltage": None,
-            "main_level": 0.0,
-            "panel_voltage": 0.0,
-            "panel_power": 0.0,
-            "charging_state": "Unknown",
-            "charging_current": 0.0,
-            "charging_capacity": 0.0,
-            "water_level": 0.0,
-            "temperature_1": 0.0,
-            "temperature_2": 0.0,
-            "lte_signal": False,
-            "lte_registered": False,
-            "energy_daily": 0.0,
-            "bt_temperature": None,
-            "bt_humidity": None,
-            "bt_last_update": None,
-            "bt_light_txt": ""
-        }
-
-    def update(self, **kwargs):
-        """
-        Update the status dictionary with new values for existing keys.
-
-        Parameters:
-            **kwargs: Arbitrary keyword arguments
-            where each key corresponds to a field in the status dictionary,
-            and each value is converted to a float
-            and assigned to the corresponding key.
+def default_site_config():
+    """Site unique historique, quand le fichier de config n'a aucune section [site:*]"""
+    return SiteConfig(
+        "site_001", victron_mac=VICTRON_MAC, victron_key=VICTRON_KEY,
+        bthome_sensor=SHELLY_MAC, ads_address=0x48,
+    )
 
-        Raises:
-            KeyError: If any provided key does not exist
-            in the status dictionary.
-        """
 
-        for key, value in kwargs.items():
-            if key in self.status:
-                logging.debug("[SiteStatus] Updating %s: %s", key, value)
-                try:
-                    if key in ["charging_state", "bt_light_txt"]:
-                        self.status[key] = str(value)
-                    else:
-                        self.status[key] = float(value)
-                except (ValueError, TypeError):
-                    logging.debug("[SiteStatus] Could not convert %s for key %s, setting as is.", value, key)
-                    self.status[key] = value
-            else:
-                raise KeyError(f"{key} n'est pas un champ valide")
-
-    def to_point(self):
-        """
-        Converts the current object's status into an InfluxDB Point.
-        Returns:
-            Point: An InfluxDB Point object
-            with the measurement name "site_metrics",
-                   tagged with the site's ID, containing
-                   all status fields as float values,
-                   and timestamped with the current UTC time.
-        """
-
-        point = Point("site_metrics").tag("site_id", self.site_id)
-        for field, value in self.status.items():
-            if value is None:
+def bthome_lines(manager, timestamp_ns, site_of, default_site_id, now=None, scheduler=None):
+    """
+    Une ligne bthome_metrics par capteur enregistré ayant déjà émis :
+    tags site_id/mac/name, valeurs numériques en float (type de champ stable
+    dans InfluxDB quel que soit l'objet BTHome reçu) et âge de la dernière trame.
+    site_of associe un capteur à son parc ; les autres sont taggés default_site_id.
+    Avec un ReportScheduler, un capteur stable n'est envoyé qu'au battement de cœur.
+    """
+    now = time.time() if now is None else now
+    lines = []
+    for mac in manager.registered_bthome():
+        state = manager.bthome_states.get(mac)
+        if not state:
+            continue
+        fields = {
+            key: float(value) for key, value in state.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        reason = None
+        if scheduler is not None:
+            reason = scheduler.due(mac, fields)
+            if reason is None:
                 continue
-            if isinstance(value, str):
-                point = point.field(field, value)
-            else:
-                if (float(value) == 0.0) and field in ["main_voltage", "aux_voltage", "bt_temperature", "bt_humidity"]:
-                    continue
-                point = point.field(field, float(value))
-        point = point.time(datetime.now(UTC))
-        return point
-
-    def __repr__(self):
-        return f"SiteStatus(site_id={self.site_id}, status={self.status})"
-
-
-def influx_write_pts(points: list, bucket: str) -> None:
-    try:
-        WRITE_API.write(org=ORG, bucket=bucket, record=points)
-        return True
-    except InfluxDBError as e:
-        if e.response.status == 401 or e.response.status == 403:
-            logging.info("[INFLUX] insufficient rights to %s", bucket)
-        else:
-            logging.info("[INFLUX] influx error %s", e)
-    except Exception as e:
-        if hasattr(e, "reason"):
-            logging.info("[INFLUX] for bucket :%s : %s", bucket, e.reason)
-        else:
-            logging.info("[INFLUX] for bucket: %s: %s", bucket, e)
-    return False
-
-
-def read_all_ads1115_channels():
+        values = fields
+        last_seen = manager.bthome_last_seen.get(mac)
+        if last_seen is not None:
+            fields = dict(fields, age_s=round(now - last_seen, 1))
+        tags = {"site_id": site_of.get(mac, default_site_id), "mac": mac, "name": state.get("name")}
+        line = encode_line(BTHOME_MEASUREMENT, tags, fields, timestamp_ns)
+        if line:
+            lines.append(line)
+            if reason is not None:
+                scheduler.sent(mac, values, reason)
+    return lines
+
+
+def read_all_ads1115_channels(site):
     """
-    Reads all 4 channels from the ADS1115 ADC
-    and returns their values as a list.
+    Reads all 4 channels from the site's persistent ADS1115 sampler
+    and updates the site status with the converted values.
     """
+    config = site.config
+    status = site.status
     try:
-        i2c = busio.I2C(board.SCL, board.SDA)
-        ads = ADS.ADS1115(i2c)
-        ads.gain = 1  # +/-4.096V
-        channels = [
-            AnalogIn(ads, 0),
-            AnalogIn(ads, 1),
-            AnalogIn(ads, 2),
-            AnalogIn(ads, 3)
-        ]
-        logging.info("[MAIN] channel voltages: %s", [ch.voltage for ch in channels])
+        voltages = site.sampler.read_all()
     except Exception as e:
-        logging.info("[MAIN] Error initializing ADS1115: %s", e)
+        logging.info("[MAIN] [%s] Error reading ADS1115: %s", site.site_id, e)
+        site.sampler.close()  # réouverture complète au prochain cycle
         return
-    aux_voltage = channels[0].voltage * 3.965  # facteur de division
-    main_voltage = channels[1].voltage * 3.98  # facteur de division
-    temp = SiteStatus_instance.status["temperature_1"] if SiteStatus_instance.status["temperature_1"] else 20
-    main_level = lead_soc(main_voltage, temp)
-    aux_level = agm_soc(aux_voltage, temp)
-    SiteStatus_instance.update(
+    logging.debug("[MAIN] [%s] channel voltages: %s", site.site_id, voltages)
+    aux_voltage = voltages[0] * config.aux_divider  # facteur de division
+    main_voltage = voltages[1] * config.main_divider  # facteur de division
+    temp = status.get("temperature_1") or 20
+    main_level = estimate_soc(main_voltage, temp, config.main_chemistry)
+    aux_level = estimate_soc(aux_voltage, temp, config.aux_chemistry)
+    status.update(
         main_voltage=main_voltage if 10 < main_voltage < 15.0 else 0.0,
         main_level=main_level or 0.0,
-        water_level=round(channels[3].voltage * 4.59, 0),
-        temperature_1=ntc_temperature(channels[2].voltage),
+        water_level=round(voltages[3] * config.water_factor, 0),
+        temperature_1=ntc_temperature(voltages[2]),
     )
-    if not SiteStatus_instance.status["aux_voltage"] and 10 < aux_voltage < 15.0:
-        logging.info("[MAIN] Updating aux_voltage to %f from ADS1115", aux_voltage)
-        SiteStatus_instance.update(
+    if not status.get("aux_voltage") and 10 < aux_voltage < 15.0:
+        logging.info("[MAIN] [%s] Updating aux_voltage to %f from ADS1115", site.site_id, aux_voltage)
+        status.update(
             aux_voltage=aux_voltage
         )
-    if not SiteStatus_instance.status["aux_level"] and aux_level:
-        logging.info("[MAIN] Updating aux_level to %f from ADS1115", aux_level)
-        SiteStatus_instance.update(
+    # Même garde que la SOC Victron : sous charge la tension affaissée ne donne pas une SOC
+    if not status.get("aux_level") and aux_level and site.aux_rest.resting:
+        logging.info("[MAIN] [%s] Updating aux_level to %f from ADS1115", site.site_id, aux_level)
+        status.update(
             aux_level=aux_level
         )
 
 
-async def read_loop(interval_minutes=2):
+def update_site_from_ble(site, manager):
+    """Reporte l'état Victron / BTHome du parc dans son SiteStatus"""
+    config = site.config
+    v_state = manager.victron_states.get(config.victron_mac, {}) if config.victron_mac else {}
+    # Production du parc : somme des chargeurs solaires (principal et victron_devices)
+    chargers = [
+        state for state in (manager.victron_states.get(mac) for mac in config.victron_macs)
+        if state and state.get("record_type", "solar_charger") == "solar_charger"
+    ]
+    sh_state = manager.bthome_states.get(config.bthome_sensor, {}) if config.bthome_sensor else {}
+
+    logging.debug("[MAIN] [%s] Bluetooth read Victron: %s | Shelly: %s", site.site_id, v_state, sh_state)
+
+    aux_volt = v_state.get("battery_voltage", 0.0)
+    aux_resting = site.aux_rest.update(v_state.get("battery_charging_current", 0.0))
+    if aux_volt and aux_resting:
+        logging.info("[MAIN] [%s] Calculating auxiliary SOC with voltage: %f", site.site_id, aux_volt)
+        # 💡 Sécurité : si la température reçue est None, on force 10 par défaut pour éviter le crash
+        temp_shelly = sh_state.get("temperature")
+        if temp_shelly is None:
+            temp_shelly = 10
+
+        site.aux_level_at_rest = estimate_soc(aux_volt, temp_shelly, config.aux_chemistry)
+    if aux_volt and site.aux_level_at_rest:
+        site.status.update(
+            aux_level=site.aux_level_at_rest
+        )
+
+    panel_power = sum(state.get("solar_power") or 0.0 for state in chargers)
+    if site.panel_power_series and chargers:
+        manager.history.record(site.panel_power_series, panel_power)
+
+    # Extraction et alignement visuel respecté
+    site.status.update(
+        aux_voltage=aux_volt,
+        panel_power=panel_power,
+        charging_current=v_state.get("battery_charging_current", 0.0),
+        charging_capacity=0.0,
+        charging_state=v_state.get("charge_state", "Unknown"),
+        energy_daily=sum(state.get("yield_today") or 0.0 for state in chargers),
+        bt_temperature=sh_state.get("temperature", None),
+        bt_humidity=sh_state.get("humidity", None),
+        bt_last_update=None,
+        bt_light_txt=str(sh_state.get("light_level", 0))
+        )
+
+
+async def startup_report(manager, timeout=STARTUP_REPORT_TIMEOUT):
+    """Affiche les durées de démarrage dès la première annonce décodée (ou après timeout)"""
+    deadline = time.monotonic() + timeout
+    while manager.first_decoded_at is None and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if manager.first_decoded_at is not None:
+        STARTUP.event("first_decoded_advertisement", manager.first_decoded_at)
+    else:
+        logging.warning("[MAIN] No advertisement decoded %d s after scanner start", timeout)
+    print(STARTUP.report(), flush=True)
+    logging.info("[MAIN] Startup timings: %s", STARTUP.as_dict())
+
+
+async def read_loop(sample_interval=None, report_startup=False, scheduler=None):
     """
-    Continuously reads all 4 ADS1115 channels
-    every 'interval_minutes' minutes and prints the results.
+    Every 'sample_interval' seconds, updates the status of every site
+    from the shared BLE manager and its ADS1115 board, then spools in a
+    single batch the points the report scheduler considers due (a tracked
+    field moved beyond its deadband, or heartbeat).
     """
-    global LAST_UPDATE
-    
-    # 1. 💡 INITIALISATION & LANCEMENT EN PARALLÈLE DU MANAGER BLE DANS LA BOUCLE D'ÉVÉNEMENTS
-    manager = GlobalStateManager(victron_key=VICTRON_KEY)
-    
-    def bleak_callback(device, advertisement_data):
-        mac_upper = device.address.upper()
-        if mac_upper == VICTRON_MAC.upper():
-            manager.update_victron(advertisement_data)
-        elif mac_upper in [mac.upper() for mac in LISTE_MAC_BTHOME]:
-            manager.update_bthome(mac_upper, device, advertisement_data)
-
-    scanner = BleakScanner(detection_callback=bleak_callback, scanning_mode="active")
-    await scanner.start()
-    logging.info("[MAIN] Scanner Bluetooth global initialisé en arrière-plan.")
-
-    lte_failed = 0
+    global SPOOL
+    sample_interval = REPORT_SAMPLE_INTERVAL if sample_interval is None else sample_interval
+    scheduler = scheduler or REPORT_SCHEDULER or ReportScheduler()
+    perf = PerfRecorder() if PERF_INTERVAL else None
+
+    # 1. 💡 LE SCAN BLE DÉMARRE EN PREMIER, les sous-systèmes lents s'initialisent ensuite
+    # Un seul scanner pour tous les parcs : chaque appareil est enregistré dans le même registre
+    with STARTUP.phase("ble_scanner"):
+        manager = GlobalStateManager(VICTRON_KEY)
+        manager.perf = perf
+        callback = manager.handle_advertisement
+        if CAPTURE_PATH:
+            recorder = AdvRecorder(CAPTURE_PATH, max_bytes=CAPTURE_MAX_BYTES)
+            callback = recorder.wrap(manager.handle_advertisement)
+            logging.info("[MAIN] Recording BLE advertisements to %s", CAPTURE_PATH)
+
+        if not SCAN_DUTY_CYCLE:
+            always_on = lambda: True  # noqa: E731
+        elif SCAN_BTHOME_CONTINUOUS:
+            always_on = lambda: bool(manager.bthome_parsers)  # noqa: E731
+        else:
+            always_on = None
+        # Un nouveau BleakScanner à chaque démarrage : après un redémarrage de BlueZ l'ancien n'est plus valide
+        scan_scheduler = ScanScheduler(
+            bleak_factory(callback, SCAN_FILTERS),
+            period=manager.intervalle_ecoute_seconds, window=manager.duree_fenetre_seconds,
+            always_on=always_on, advertisements=lambda: manager.advertisements, scanning_mode=SCAN_MODE,
+        )
+        # Premier démarrage inconditionnel : les capteurs ne sont pas encore enregistrés
+        await scan_scheduler.start_scanner()
+
+        if BT_SILENCE_TIMEOUT:
+            recovery = BluetoothRecovery(
+                scan_scheduler.restart, activity=lambda: manager.advertisements,
+                silence_timeout=BT_SILENCE_TIMEOUT, error_threshold=BT_ERROR_THRESHOLD,
+                listening=scan_scheduler.listening_time,
+            )
+            # Échecs de démarrage / arrêt du scanner : symptôme "erreurs" de la récupération
+            scan_scheduler.on_error = recovery.report_error
+            recovery.start()
+    logging.info("[MAIN] Scanner Bluetooth global initialisé en arrière-plan pour %d site(s).", len(SITES))
+    if report_startup:
+        asyncio.create_task(startup_report(manager), name="startup-report")
+
+    # Les annonces reçues avant l'enregistrement des appareils sont simplement ignorées
+    with STARTUP.phase("ble_decoders"):
+        bthome_site = {}
+        for site in SITES:
+            for mac in site.config.victron_macs:
+                manager.register_victron(mac, site.config.victron_key_of(mac))
+            if site.config.bthome_sensor:
+                manager.register_bthome(
+                    site.config.bthome_sensor,
+                    site.config.bthome_key or BTHOME_BINDKEYS.get(site.config.bthome_sensor),
+                )
+                bthome_site[site.config.bthome_sensor] = site.site_id
+        for mac in LISTE_MAC_BTHOME:
+            manager.register_bthome(mac, BTHOME_BINDKEYS.get(normalize_mac(mac)))
+        manager.load_decoders()
+        scan_scheduler.start()
+        history_fields = [(site, site.history_fields()) for site in SITES]
+
+    with STARTUP.phase("spool"):
+        if SPOOL is None:
+            SPOOL = PointSpool(SPOOL_PATH, max_rows=SPOOL_MAX_ROWS, max_bytes=SPOOL_MAX_BYTES)
+    with STARTUP.phase("connectivity"):
+        # Connectivité gérée en tâche de fond : read_loop ne fait que lire son état
+        connectivity = ConnectivityManager(perf=perf)
+        connectivity.start()
+    with STARTUP.phase("uploader"):
+        # Envoi InfluxDB en tâche de fond : la boucle ne fait qu'alimenter le spool
+        uploader = InfluxUploader(
+            SPOOL, SERVER, ORG, BUCKET, TOKEN, connectivity=connectivity,
+            max_points=SPOOL_BATCH_SIZE, max_bytes=UPLOAD_MAX_BYTES, gzip_level=UPLOAD_GZIP_LEVEL, perf=perf,
+        )
+        uploader.start()
+    if HTTP_PORT is not None:
+        with STARTUP.phase("http"):
+            status_server = StatusServer(SITES, manager, connectivity=connectivity, spool=SPOOL,
+                                         uploader=uploader, host=HTTP_HOST, port=HTTP_PORT)
+            try:
+                await status_server.start()
+            except OSError as e:
+                logging.error("[HTTP] Cannot listen on %s:%s: %s", HTTP_HOST, HTTP_PORT, e)
+    if not ADAFRUIT_AVAILABLE:
+        logging.warning("[MAIN] Adafruit library not available, using simulated data....")
+    first_cycle = True
+    perf_tags = {"site_id": SITES[0].site_id, "version": VERSION}
+    perf_sent_at = time.monotonic()
     while True:
+        cycle_start = time.perf_counter()
         # 2. 💡 RÉCUPÉRATION DIRECTE DE L'ÉTAT DU MANAGER EN ARRIÈRE-PLAN
-        v_state = manager.victron_state
-        sh_state = manager.bthome_states.get(SHELLY_MAC, {}) # Lecture du capteur principal
-
-        logging.info("[MAIN] Bluetooth read Victron: %s | Shelly: %s", v_state, sh_state)
-
-        aux_volt = v_state.get("battery_voltage", 0.0)
-        if aux_volt:
-            logging.info("[MAIN] Calculating auxiliary SOC with voltage: %f", aux_volt)
-            # 💡 Sécurité : si la température reçue est None, on force 10 par défaut pour éviter le crash
-            temp_shelly = sh_state.get("temperature")
-            if temp_shelly is None:
-                temp_shelly = 10
-                
-            aux_level = agm_soc(aux_volt, temp_shelly)
-            if aux_level:
-                SiteStatus_instance.update(
-                    aux_level=aux_level
-                )
-
-        # Extraction et alignement visuel respecté
-        SiteStatus_instance.update(
-            aux_voltage=aux_volt,
-            panel_voltage=v_state.get("panel_voltage", 0.0),
-            panel_power=v_state.get("solar_power", 0.0),
-            charging_current=v_state.get("battery_charging_current", 0.0),
-            charging_capacity=0.0,
-            charging_state=v_state.get("charge_state", "Unknown"),
-            energy_daily=v_state.get("yield_today", 0.0),
-            bt_temperature=sh_state.get("temperature", None),
-            bt_humidity=sh_state.get("humidity", None),
-            bt_last_update=None,
-            bt_light_txt=str(sh_state.get("light_level", 0))
-            )
+        # L'état reste lisible (point d'accès HTTP) jusqu'au prochain échantillonnage
+        for site in SITES:
+            site.status.reset()
+            update_site_from_ble(site, manager)
 
-        logging.info("[MAIN] try Reading ADS1115 channels...")
         if ADAFRUIT_AVAILABLE:
-            logging.info("[MAIN] Using real ADS1115 readings.")
-            read_all_ads1115_channels()
-        else:
-            logging.warning("[MAIN] Adafruit library not available, using simulated data....")
-        for key, val in SiteStatus_instance.status.items():
-            logging.debug("[MAIN] SiteStatus:%s = %s", key, val)
-        connected = False
-        lte_signal = False
-        is_registered = False
-        if not test_ping(1):
-            connected, lte_signal, is_registered, lte_as_failed = ready_or_connect(force=False)
-            if lte_as_failed:
-                lte_failed += 1
-                logging.warning("[LTE] LTE connection failed, attempt #%d", lte_failed)
-                if lte_failed > 30:
-                    logging.info("[LTE] Too many failed attempts, rebooting system...")
-                    subprocess.run(["sudo", "reboot"])
-        else:
-            connected = True
-            lte_signal = is_lte_used() if connected else False
-        logging.info("[MAIN] Internet connected: %s via %s", connected, "LTE" if lte_signal else "WLAN0")
-        SiteStatus_instance.update(lte_signal=lte_signal, lte_registered=is_registered)
-        POINTS.append(SiteStatus_instance.to_point())
-        SiteStatus_instance.reset()
-        if connected:
-            if influx_write_pts(POINTS, BUCKET):
-                num_points = len(POINTS)
-                POINTS.clear()
-                logging.info(
-                    "[MAIN] %s Points successfully written to InfluxDB using %s",
-                    num_points,
-                    "LTE" if lte_signal else "WLAN0"
-                )
-                LAST_UPDATE = datetime.now(UTC)
-            else:
-                logging.info("[MAIN] Failed to write points to InfluxDB.")
-        else:
-            logging.info("[MAIN] No internet connection. Points not sent.")
-        if LAST_UPDATE:
-            elapsed = (datetime.now(UTC) - LAST_UPDATE).total_seconds() / 60
+            for site in SITES:
+                if site.sampler is not None:
+                    begin = time.perf_counter()
+                    read_all_ads1115_channels(site)
+                    if perf is not None:
+                        perf.observe("ads.read", time.perf_counter() - begin)
+        connected, lte_signal, is_registered = connectivity.snapshot()
+        if connectivity.lte_failures > 30:
+            logging.info("[LTE] Too many failed attempts, rebooting system...")
+            reboot_system()
+
+        # Un seul lot pour tous les parcs : même horodatage, un seul append au spool
+        timestamp_ns = time.time_ns()
+        encode_start = time.perf_counter()
+        lines = bthome_lines(manager, timestamp_ns, bthome_site, SITES[0].site_id, scheduler=scheduler)
+        for site, fields in history_fields:
+            site.status.update(lte_signal=lte_signal, lte_registered=is_registered)
+            values = site.status.status
+            reason = scheduler.due(site.site_id, values)
+            if reason is not None:
+                # Pics et creux depuis le dernier envoi du parc : agrégats de toutes les trames reçues
+                interval = manager.history.take_interval(fields)
+                for metric, field in fields.items():
+                    stats = interval.get(metric)
+                    if stats:
+                        site.status.update_aggregates(field, stats)
+                for key, val in site.status.status.items():
+                    logging.debug("[MAIN] SiteStatus[%s]:%s = %s", site.site_id, key, val)
+                line = site.status.to_line_protocol(timestamp_ns)
+                if line:
+                    lines.append(line)
+                    scheduler.sent(site.site_id, values, reason)
+                    logging.info("[MAIN] [%s] Point spooled (%s)", site.site_id, reason)
+            site.last_sample = time.time()
+        if perf is not None:
+            perf.observe("encode", time.perf_counter() - encode_start)
+            perf.observe("cycle", time.perf_counter() - cycle_start)
+            if time.monotonic() - perf_sent_at >= PERF_INTERVAL:
+                lines.extend(perf.take_lines(timestamp_ns, perf_tags))
+                perf_sent_at = time.monotonic()
+        if lines:
+            begin = time.perf_counter()
+            SPOOL.append(lines)
+            if perf is not None:
+                perf.observe("spool.append", time.perf_counter() - begin)
+            uploader.notify()
+            logging.info(
+                "[MAIN] Internet connected: %s via %s | reports: %s | payload cache: %s | scan: %s",
+                connected, "LTE" if lte_signal else "WLAN0", scheduler.stats(), manager.payload_cache.stats(),
+                scan_scheduler.stats(),
+            )
+            if not connected:
+                logging.info("[MAIN] No internet connection. Points not sent, %d points spooled.", len(SPOOL))
+        if first_cycle:
+            STARTUP.event("first_cycle_spooled")
+            first_cycle = False
+        if uploader.last_success:
+            elapsed = (datetime.now(UTC) - uploader.last_success).total_seconds() / 60
             if elapsed > 360:
                 logging.info("[MAIN] Last successful update was %f minutes ago, rebooting system.", elapsed)
                 reboot_system()
-        await asyncio.sleep(interval_minutes * 60)  # <-- async sleep
-
-
-SiteStatus_instance = SiteStatus(site_id="site_001")
+        await asyncio.sleep(sample_interval)  # <-- async sleep
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Superviseur Kepler")
+    arg_parser.add_argument("--startup-report", action="store_true",
+                            help="Affiche la durée de chaque phase de démarrage jusqu'à la première annonce décodée")
+    args = arg_parser.parse_args()
     # Place config and log in the parent of the parent directory of the script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     parent_dir = os.path.dirname(script_dir)
@@ -435,23 +475,80 @@ if __name__ == "__main__":
     Config = configparser.ConfigParser()
     logname = os.path.join(grandparent_dir, "supervisor.log")
     # logging removed
+    config_start = time.monotonic()
     if os.path.exists(cfgname):
         Config.read(cfgname)
         TOKEN = Config.get("influx", "token")
         SERVER = Config.get("influx", "server")
         BUCKET = Config.get("influx", "bucket")
         ORG = Config.get("influx", "org")
+        SPOOL_PATH = Config.get("spool", "path", fallback=os.path.join(grandparent_dir, "supervisor_spool.db"))
+        SPOOL_MAX_ROWS = Config.getint("spool", "max_rows", fallback=DEFAULT_MAX_ROWS)
+        SPOOL_MAX_BYTES = Config.getint("spool", "max_bytes", fallback=DEFAULT_MAX_BYTES)
+        SPOOL_BATCH_SIZE = Config.getint("spool", "batch_size", fallback=DEFAULT_BATCH_SIZE)
+        UPLOAD_MAX_BYTES = Config.getint("upload", "max_batch_bytes", fallback=BATCH_MAX_BYTES)
+        UPLOAD_GZIP_LEVEL = Config.getint("upload", "gzip_level", fallback=GZIP_LEVEL)
+        BTHOME_SENSORS = Config.get("bthome", "sensors", fallback="")
+        if BTHOME_SENSORS.strip():
+            LISTE_MAC_BTHOME = [mac.strip() for mac in BTHOME_SENSORS.split(",") if mac.strip()]
+        # bindkeys = C0:2C:ED:A8:EE:6E=231d39c1d7cc1ab1aee224cd096db932, ...
+        for entry in Config.get("bthome", "bindkeys", fallback="").split(","):
+            mac, _, key = entry.partition("=")
+            if mac.strip() and key.strip():
+                try:
+                    valid = len(bytes.fromhex(key.strip())) == 16
+                except ValueError:
+                    valid = False
+                if not valid:
+                    print(f"[Config] Invalid BTHome bindkey for {mac.strip()}: 32 hex digits expected")
+                    sys.exit(1)
+                BTHOME_BINDKEYS[normalize_mac(mac)] = key.strip()
+        # Capteur principal du site par défaut : alimente bt_temperature / bt_humidity de site_metrics
+        SHELLY_MAC = Config.get("bthome", "primary", fallback=LISTE_MAC_BTHOME[0] if LISTE_MAC_BTHOME else SHELLY_MAC)
+        try:
+            SITE_CONFIGS = load_site_configs(Config) or [default_site_config()]
+        except (KeyError, ValueError) as e:
+            print(f"[Config] Invalid site configuration: {e}")
+            sys.exit(1)
+        REPORT_SAMPLE_INTERVAL = Config.getfloat("report", "sample_interval", fallback=DEFAULT_SAMPLE_INTERVAL)
+        try:
+            REPORT_SCHEDULER = ReportScheduler.from_config(Config)
+        except ValueError as e:
+            print(f"[Config] Invalid report configuration: {e}")
+            sys.exit(1)
+        if Config.getboolean("http", "enabled", fallback=True):
+            HTTP_HOST = Config.get("http", "host", fallback=DEFAULT_HOST)
+            HTTP_PORT = Config.getint("http", "port", fallback=DEFAULT_PORT)
+        else:
+            HTTP_PORT = None
+        if Config.getboolean("perf", "enabled", fallback=True):
+            PERF_INTERVAL = Config.getfloat("perf", "interval", fallback=PERF_DEFAULT_INTERVAL)
+        else:
+            PERF_INTERVAL = None
+        if Config.getboolean("bt_recovery", "enabled", fallback=True):
+            BT_SILENCE_TIMEOUT = Config.getfloat("bt_recovery", "silence_timeout", fallback=SILENCE_TIMEOUT)
+            BT_ERROR_THRESHOLD = Config.getint("bt_recovery", "error_threshold", fallback=ERROR_THRESHOLD)
+        else:
+            BT_SILENCE_TIMEOUT = None
+        SCAN_DUTY_CYCLE = Config.getboolean("scan", "duty_cycle", fallback=True)
+        SCAN_MODE = Config.get("scan", "mode", fallback=MODE_PASSIVE)
+        SCAN_BTHOME_CONTINUOUS = Config.get("scan", "bthome", fallback="window") == "continuous"
+        SCAN_FILTERS = tuple(
+            name.strip() for name in Config.get("scan", "filters", fallback=",".join(DEFAULT_FILTERS)).split(",")
+            if name.strip()
+        )
+        CAPTURE_PATH = Config.get("capture", "path", fallback=None)
+        CAPTURE_MAX_BYTES = Config.getint("capture", "max_bytes", fallback=None)
     else:
         print(f"[Config] Config file {cfgname} not found, exiting")
         sys.exit(1)
-    CLIENT = InfluxDBClient(
-        url=SERVER,
-        token=TOKEN,
-        org=ORG
-    )
-    WRITE_API = CLIENT.write_api(write_options=SYNCHRONOUS)
+    # Le spool est ouvert par read_loop, après le démarrage du scan BLE
+    SITES = [Site(site_config, ADS_CHANNELS) for site_config in SITE_CONFIGS]
+    STARTUP.record("config", config_start)
+    for site in SITES:
+        logging.info("[MAIN] Supervising %r", site.config)
     logging.info(
-        "[MAIN] Starting supervisor version 224 with InfluxDB org:%s, server:%s, bucket:%s",
-        ORG, SERVER, BUCKET
+        "[MAIN] Starting supervisor version %s with InfluxDB org:%s, server:%s, bucket:%s",
+        VERSION, ORG, SERVER, BUCKET
     )
-    asyncio.run(read_loop())
\ No newline at end of file
+    asyncio.run(read_loop(report_startup=args.startup_report))
\ No newline at end of file
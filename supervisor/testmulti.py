@@ -1,10 +1,11 @@
 import asyncio
 import logging
 import time
-from victron_ble.devices import SolarCharger
-from bthome_ble import BTHomeBluetoothDeviceData
-from home_assistant_bluetooth import BluetoothServiceInfoBleak
-from bleak import BleakScanner
+from payload_cache import PayloadCache
+from ring_buffer import MetricHistory
+from sites import normalize_mac
+from bthome_decoder import BTHOME_UUID, BTHomeDevice, entity_values
+from victron_registry import VICTRON_COMPANY_ID, VictronDevice, load_victron_ble
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,81 +14,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger("KeplerCentral")
 
+# Grandeurs Victron historisées à chaque trame (clé d'historique "<MAC>.<grandeur>",
+# "victron.<grandeur>" pour un appel sans adresse)
+# (chargeurs : battery_*, solar_power ; moniteurs SmartShunt / BMV : voltage, current, soc)
+VICTRON_HISTORY_KEYS = ("battery_voltage", "battery_charging_current", "solar_power", "voltage", "current", "soc")
+
+
 class GlobalStateManager:
-    def __init__(self, victron_key: str):
-        self.victron_parser = SolarCharger(victron_key)
-        self.bthome_parser = BTHomeBluetoothDeviceData()
+    def __init__(self, victron_key: str, victron_mac: str | None = None, bthome_macs=()):
+        # Clé des appareils Victron enregistrés sans clé propre
+        self.victron_key = victron_key
+        # Registres par adresse : clé et parsers Victron, bindkey et compteur de chiffrement BTHome
+        self.victron_devices = {}
+        self.bthome_parsers = {}
+        # Victron principal (celui de victron_state)
+        self.victron_mac = None
+
+        # Registre des appareils : adresse normalisée -> traitement de l'annonce
+        self._dispatch = {}
+        # MAC -> nom d'étape pour perf.PerfRecorder ("ble.victron", "ble.bthome")
+        self._stages = {}
+        self.perf = None
+        # Annonces reçues, tous appareils confondus (détection de silence du scanner)
+        self.advertisements = 0
         
         # Fenêtre de capture (ex: on n'accepte les données que les 15 premières secondes de chaque minute)
         self.intervalle_ecoute_seconds = 120
         self.duree_fenetre_seconds = 30
         
         # Stockage des états actuels
-        self.victron_state = {}
+        self.victron_states = {}
         self.bthome_states = {} 
 
+        # Payloads déjà décodées : (MAC, octets bruts) -> valeurs
+        self.payload_cache = PayloadCache()
+        # Historique de toutes les lectures décodées (agrégats par intervalle de rapport)
+        self.history = MetricHistory()
+        # Dernière trame décodée par appareil (time.time())
+        self.victron_last_seen = {}
+        self.bthome_last_seen = {}
+        # Première trame décodée (time.monotonic()), pour le rapport de démarrage
+        self.first_decoded_at = None
+
+        if victron_mac:
+            self.register_victron(victron_mac)
+        for mac in bthome_macs:
+            self.register_bthome(mac)
+
+    def load_decoders(self):
+        """Importe dès maintenant victron_ble (plusieurs secondes sur un Raspberry Pi) si un Victron est enregistré"""
+        if self.victron_devices:
+            load_victron_ble()
+
+    @property
+    def victron_state(self) -> dict:
+        """État du Victron principal (le premier enregistré)"""
+        return self.victron_states.get(self.victron_mac, {})
+
+    def register_victron(self, mac: str, key: str | None = None):
+        mac = normalize_mac(mac)
+        self._dispatch[mac] = self._handle_victron
+        self._stages[mac] = "ble.victron"
+        # Un second enregistrement sans clé ne retire pas celle déjà configurée
+        if mac not in self.victron_devices or key:
+            self.victron_devices[mac] = VictronDevice(mac, key or self.victron_key)
+        if self.victron_mac is None:
+            self.victron_mac = mac
+
+    def register_bthome(self, mac: str, bindkey: str | None = None) -> bool:
+        """Enregistre un capteur BTHome ; False (capteur ignoré) si la bindkey est invalide"""
+        mac = normalize_mac(mac)
+        # Un second enregistrement sans clé ne retire pas celle déjà configurée
+        if mac not in self.bthome_parsers or bindkey:
+            try:
+                self.bthome_parsers[mac] = BTHomeDevice(mac, bindkey)
+            except ValueError as e:     # BTHomeError (longueur) ou bytes.fromhex (non hexadécimal)
+                logger.error("[BTHOME] %s: invalid bindkey, sensor skipped: %s", mac, e)
+                return False
+        self._dispatch[mac] = self.update_bthome
+        self._stages[mac] = "ble.bthome"
+        return True
+
+    def registered_bthome(self) -> list[str]:
+        return [mac for mac, handler in self._dispatch.items() if handler == self.update_bthome]
+
+    def _handle_victron(self, mac_address, device_obj, advertise_data):
+        self.update_victron(advertise_data, mac_address)
+
+    def handle_advertisement(self, device, advertisement_data):
+        """Callback BleakScanner : un seul accès dict par annonce, quel que soit le nombre d'appareils"""
+        self.advertisements += 1
+        mac_upper = device.address.upper()
+        handler = self._dispatch.get(mac_upper)
+        if handler is not None:
+            perf = self.perf
+            if perf is None:
+                handler(mac_upper, device, advertisement_data)
+                return
+            begin = time.perf_counter()
+            handler(mac_upper, device, advertisement_data)
+            perf.observe(self._stages[mac_upper], time.perf_counter() - begin)
+
     def _est_dans_la_fenetre_d_ecoute(self) -> bool:
         """Détermine si on est dans la fenêtre temporelle où on accepte de stocker"""
         secondes_courantes = time.time() % self.intervalle_ecoute_seconds
         return secondes_courantes < self.duree_fenetre_seconds
 
-    def update_victron(self, advertise_data):
+    def update_victron(self, advertise_data, mac_address: str | None = None):
         """Décode et ne stocke le Victron que si on est dans la fenêtre ET que ça a changé"""
         if not self._est_dans_la_fenetre_d_ecoute():
             return  # On ignore le paquet pour économiser les calculs
 
         try:
-            raw_data = None
-            if advertise_data.manufacturer_data:
-                for manufacturer_id, data_bytes in advertise_data.manufacturer_data.items():
-                    raw_data = data_bytes
-                    break
-
-            if raw_data:
-                # Récupération des nouvelles valeurs
-                parsed = self.victron_parser.parse(raw_data)
-                
-                # Pas d'attribut de tension panneaux en BLE passif
-                if parsed.get_solar_power() and parsed.get_battery_charging_current() > 0:
-                    panel_voltage = parsed.get_solar_power() / parsed.get_battery_charging_current()
-                else:
-                    panel_voltage = 0
-
-                nouvelles_valeurs = {
-                    "battery_voltage": parsed.get_battery_voltage(),
-                    "battery_charging_current": parsed.get_battery_charging_current(),
-                    "solar_power": parsed.get_solar_power(),
-                    "yield_today": parsed.get_yield_today(),
-                    "charge_state": getattr(parsed.get_charge_state(), "name", str(parsed.get_charge_state())),
-                    "panel_voltage": panel_voltage,
-                }
-                
-                # 💡 FILTRE DE CHANGEMENT : On compare avec l'ancien état
-                if nouvelles_valeurs != self.victron_state:
-                    self.victron_state = nouvelles_valeurs
+            # Seule la donnée constructeur Victron est lue : rien à déchiffrer pour les autres
+            raw_data = advertise_data.manufacturer_data.get(VICTRON_COMPANY_ID)
+            if not raw_data:
+                return
+            mac = mac_address or self.victron_mac
+            cache_key = (mac or "victron", raw_data)
+            nouvelles_valeurs = self.payload_cache.get(cache_key)
+            if nouvelles_valeurs is None:
+                device = self.victron_devices.get(mac)
+                if device is None:
+                    device = self.victron_devices[mac] = VictronDevice(mac, self.victron_key)
+                if not device.accepts(raw_data):
+                    return
+                # Déchiffrement AES + parsing complet ; pas de tension panneaux dans l'annonce
+                nouvelles_valeurs = device.decode(raw_data)
+                if nouvelles_valeurs is None:
+                    return
+                self.payload_cache.put(cache_key, nouvelles_valeurs)
+                if self.first_decoded_at is None:
+                    self.first_decoded_at = time.monotonic()
+
+            now = time.time()
+            prefixe = mac or "victron"
+            self.victron_last_seen[mac] = now
+            for cle in VICTRON_HISTORY_KEYS:
+                valeur = nouvelles_valeurs.get(cle)
+                if valeur is not None:
+                    self.history.record(f"{prefixe}.{cle}", valeur, now)
+
+            # 💡 FILTRE DE CHANGEMENT : On compare avec l'ancien état
+            if nouvelles_valeurs != self.victron_states.get(mac):
+                self.victron_states[mac] = etat = nouvelles_valeurs
+                if etat.get("record_type", "solar_charger") == "solar_charger":
                     print(
-                        f"⚡ [CHANGEMENT VICTRON] "
-                        f"Batterie: {self.victron_state['battery_voltage']}V / {self.victron_state['battery_charging_current']}A | "
-                        f"Panneaux: {self.victron_state['solar_power']}W | "
-                        f"Rendement du jour: {self.victron_state['yield_today']}Wh | "
-                        f"Statut: {self.victron_state['charge_state']}"
+                        f"⚡ [CHANGEMENT VICTRON] [{prefixe}] "
+                        f"Batterie: {etat['battery_voltage']}V / {etat['battery_charging_current']}A | "
+                        f"Panneaux: {etat['solar_power']}W | "
+                        f"Rendement du jour: {etat['yield_today']}Wh | "
+                        f"Statut: {etat['charge_state']}"
                     )
+                else:
+                    valeurs = " | ".join(f"{k}: {v}" for k, v in etat.items() if k != "record_type")
+                    print(f"⚡ [CHANGEMENT VICTRON] [{prefixe}] {etat['record_type']} {valeurs}")
         except Exception as e:
             logger.error(f"Erreur stockage Victron : {e}")
 
     def update_bthome(self, mac_address: str, device_obj, advertise_data):
         """Décode et ne stocke le Shelly que si la valeur a changé (on n'applique pas la fenêtre de temps ici pour ne pas le rater)"""
         try:
-            service_info = BluetoothServiceInfoBleak.from_scan(
-                "local", device_obj, advertise_data, 0.0, False
-            )
-            annotation = self.bthome_parser.update(service_info) 
-            
-            if annotation and annotation.entity_values:
-                valeurs_paquet = {dev_key.key: sensor_val.native_value for dev_key, sensor_val in annotation.entity_values.items()}
-                
+            service_data = advertise_data.service_data.get(BTHOME_UUID)
+            if service_data is None:
+                return
+            # Trame chiffrée : jamais servie par le cache, le compteur anti-rejeu doit la voir
+            encrypted = bool(service_data[0] & 0x01) if service_data else False
+            cache_key = (mac_address, service_data)
+            decoded = None if encrypted else self.payload_cache.get(cache_key)
+            if decoded is None:
+                parser = self.bthome_parsers.get(mac_address)
+                if parser is None:
+                    parser = self.bthome_parsers[mac_address] = BTHomeDevice(mac_address)
+                objects = parser.parse(service_data)
+                valeurs = entity_values(objects) if objects else {}
+                if valeurs:
+                    titre = advertise_data.local_name or f"BTHome sensor {mac_address[-5:].replace(':', '')}"
+                    decoded = (titre, valeurs)
+                    if self.first_decoded_at is None:
+                        self.first_decoded_at = time.monotonic()
+                else:
+                    decoded = (None, {})
+                if not encrypted:
+                    self.payload_cache.put(cache_key, decoded)
+            titre, valeurs_paquet = decoded
+
+            if valeurs_paquet:
+                # RSSI propre à chaque annonce : ajouté sur une copie, jamais dans la valeur en cache
+                valeurs_paquet = {**valeurs_paquet, "signal_strength": advertise_data.rssi}
+                now = time.time()
+                self.bthome_last_seen[mac_address] = now
+                for cle, valeur in valeurs_paquet.items():
+                    self.history.record(f"{mac_address}.{cle}", valeur, now)
+
                 if mac_address not in self.bthome_states:
-                    self.bthome_states[mac_address] = {"name": annotation.title or "Capteur", "temperature": None, "humidity": None, "light_level": 0, "battery": None}
+                    self.bthome_states[mac_address] = {"name": titre or "Capteur", "temperature": None, "humidity": None, "light_level": 0, "battery": None}
                 
                 # On vérifie s'il y a du nouveau par rapport à ce qu'on a déjà en mémoire
                 un_changement = False
@@ -105,17 +226,14 @@ class GlobalStateManager:
         except Exception as e:
             logger.error(f"Erreur stockage BTHome ({mac_address}) : {e}")
 
-async def run_supervisor(victron_key, victron_mac, bthome_macs):
-    manager = GlobalStateManager(victron_key)
-    
-    def bleak_callback(device, advertisement_data):
-        mac_upper = device.address.upper()
-        if mac_upper == victron_mac.upper():
-            manager.update_victron(advertisement_data)
-        elif mac_upper in [mac.upper() for mac in bthome_macs]:
-            manager.update_bthome(mac_upper, device, advertisement_data)
+async def run_supervisor(victron_key, victron_mac, bthome_macs, recorder=None):
+    manager = GlobalStateManager(victron_key, victron_mac, bthome_macs)
+
+    # recorder : AdvRecorder optionnel, chaque annonce reçue est enregistrée pour rejeu
+    callback = recorder.wrap(manager.handle_advertisement) if recorder else manager.handle_advertisement
+    from bleak import BleakScanner
 
-    scanner = BleakScanner(detection_callback=bleak_callback, scanning_mode="active")
+    scanner = BleakScanner(detection_callback=callback, scanning_mode="active")
     await scanner.start()
     logger.info("Superviseur Kepler démarré.")
     
@@ -128,17 +246,12 @@ VICTRON_KEY = "8ebf134b9339e9524eb24979c5e87505"
 LISTE_MAC_BTHOME = ["C0:2C:ED:A8:EE:6E"]
 
 async def main():
-    manager = GlobalStateManager(victron_key=VICTRON_KEY)
+    manager = GlobalStateManager(VICTRON_KEY, VICTRON_MAC, LISTE_MAC_BTHOME)
     logger.info("Démarrage du superviseur Kepler (Optimisé : Fenêtré + Filtre de changement)...")
 
-    def bleak_callback(device, advertisement_data):
-        mac_upper = device.address.upper()
-        if mac_upper == VICTRON_MAC.upper():
-            manager.update_victron(advertisement_data)
-        elif mac_upper in [mac.upper() for mac in LISTE_MAC_BTHOME]:
-            manager.update_bthome(mac_upper, device, advertisement_data)
+    from bleak import BleakScanner
 
-    scanner = BleakScanner(detection_callback=bleak_callback, scanning_mode="active")
+    scanner = BleakScanner(detection_callback=manager.handle_advertisement, scanning_mode="active")
     await scanner.start()
     
     while True:
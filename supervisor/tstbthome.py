@@ -32,9 +32,18 @@ import time
 import logging
 from datetime import datetime, timezone
 
-from bleak import BleakScanner, BleakClient
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
+# Décodage piloté par table, réexporté pour les utilisateurs historiques de tstbthome
+from bthome_decoder import decode_frame, decode_frames  # noqa: F401
+
+# Le décodage (decode_frame, extract_bthome_payload) ne dépend pas de bleak
+try:
+    from bleak import BleakScanner, BleakClient
+    from bleak.backends.device import BLEDevice
+    from bleak.backends.scanner import AdvertisementData
+    BLEAK_AVAILABLE = True
+except ImportError:
+    BleakScanner = BleakClient = BLEDevice = AdvertisementData = None
+    BLEAK_AVAILABLE = False
 
 
 CHARACTERISTICS = {
@@ -63,71 +72,6 @@ BTHOME_SERVICE_UUID = "0000181c-0000-1000-8000-00805f9b34fb"
 BTHOME_ALT_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
 
 
-def decode_frame(data: bytes) -> dict:
-    """Décode une payload BTHome brute."""
-    if not data:
-        return {}
-
-    result = {}
-    pos = 0
-
-    while pos < len(data):
-        obj_id = data[pos]
-        pos += 1
-
-        try:
-            if obj_id == 0x01:
-                result["battery_pct"] = data[pos]
-                pos += 1
-            elif obj_id == 0x15:
-                result["battery_low"] = bool(data[pos])
-                pos += 1
-            elif obj_id == 0x1E:
-                raw = data[pos]
-                pos += 1
-                result["light"] = {0: "dark", 1: "twilight", 2: "bright"}.get(raw, f"?({raw})")
-                result["light_raw"] = raw
-            elif obj_id == 0x2E:
-                result["humidity_pct"] = data[pos]
-                pos += 1
-            elif obj_id == 0x45:
-                raw = struct.unpack_from("<h", data, pos)[0]
-                pos += 2
-                result["temperature_c"] = raw / 10.0
-            elif obj_id == 0xF0:
-                result["device_type_id"] = struct.unpack_from("<H", data, pos)[0]
-                pos += 2
-            elif obj_id == 0xF1:
-                result["firmware_u32"] = struct.unpack_from("<I", data, pos)[0]
-                pos += 4
-            elif obj_id == 0xF2:
-                b = data[pos:pos+3]
-                pos += 3
-                result["firmware_u24"] = b[0] | (b[1] << 8) | (b[2] << 16)
-            elif obj_id == 0x3A:
-                raw = data[pos]
-                pos += 1
-                result["button_event"] = {1: "short_press"}.get(raw, f"?({raw})")
-            else:
-                result[f"unknown_0x{obj_id:02X}"] = data[pos] if pos < len(data) else None
-                pos += 1
-        except (IndexError, struct.error):
-            logging.warning(f"Trame tronquée à l'offset {pos} (obj_id=0x{obj_id:02X})")
-            break
-
-    # Déduire le type
-    if "device_type_id" in result or "firmware_u32" in result:
-        result["frame_type"] = "device_id_packet"
-    elif "button_event" in result:
-        result["frame_type"] = "event"
-    elif any(k in result for k in ("temperature_c", "humidity_pct", "light")):
-        result["frame_type"] = "advertising_beacon"
-    else:
-        result["frame_type"] = "unknown"
-
-    return result
-
-
 def extract_bthome_payload(adv: AdvertisementData) -> bytes | None:
     """Extrait la payload BTHome depuis les données d'advertisement."""
     # 1. Chercher dans les service_data (UUID connu)
@@ -0,0 +1,205 @@
+"""
+Envoi InfluxDB asynchrone par lots gzip
+=======================================
+Tâche asyncio indépendante de la boucle d'acquisition : elle vide le spool
+par lots bornés (nombre de points et octets avant compression), compressés
+en gzip, vers l'API HTTP /api/v2/write.
+
+  - un lot n'est retiré du spool qu'après un 204 d'InfluxDB
+  - 5xx, 408, 429 et erreurs réseau : nouvel essai avec backoff
+    exponentiel à gigue
+  - 400/422 (données refusées) : le lot est abandonné pour ne pas bloquer
+    le spool ; 413 : la taille des lots est divisée par deux
+  - 401/403/404 (droits, bucket) : points conservés, nouvel essai
+    seulement après BACKOFF_MAX (corriger la configuration prend du temps)
+  - octets envoyés sur le lien journalisés à chaque lot
+"""
+
+import asyncio
+import gzip
+import logging
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, UTC
+
+from spool import DEFAULT_BATCH_SIZE
+
+BATCH_MAX_BYTES = 256 * 1024    # avant compression
+MIN_BATCH_BYTES = 4 * 1024
+GZIP_LEVEL = 6
+HTTP_TIMEOUT = 30
+BACKOFF_BASE = 5
+BACKOFF_MAX = 900
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        """Erreur réseau, 5xx, 408 et 429 : le même lot peut être renvoyé plus tard"""
+        return self.status is None or self.status >= 500 or self.status in (408, 429)
+
+    @property
+    def rejected(self) -> bool:
+        """Le serveur refuse le contenu lui-même : renvoyer le lot ne servira à rien"""
+        return self.status in (400, 422)
+
+
+class InfluxUploader:
+    def __init__(self, spool, server, org, bucket, token, connectivity=None,
+                 max_points=DEFAULT_BATCH_SIZE, max_bytes=BATCH_MAX_BYTES, gzip_level=GZIP_LEVEL, perf=None):
+        self.spool = spool
+        self.perf = perf            # perf.PerfRecorder optionnel : aller-retour HTTP (upload.post)
+        self.bucket = bucket
+        self.token = token
+        self.connectivity = connectivity
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.gzip_level = gzip_level
+        self.url = f"{server.rstrip('/')}/api/v2/write?" + urllib.parse.urlencode(
+            {"org": org, "bucket": bucket, "precision": "ns"}
+        )
+        # Estimation des en-têtes HTTP envoyés avec chaque lot
+        self._header_bytes = len(
+            f"POST {self.url} HTTP/1.1\r\n"
+            f"Authorization: Token {token}\r\nContent-Encoding: gzip\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\nContent-Length: 000000\r\n\r\n"
+        )
+
+        self.last_success = None
+        self.last_error = None      # UploadError du dernier flush() en échec
+        self.points_sent = 0
+        self.points_dropped = 0
+        self.batches_sent = 0
+        self.bytes_raw = 0
+        self.bytes_wire = 0
+        self._failures = 0
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="uploader")
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Nouveaux points dans le spool : tente un envoi sans attendre le backoff"""
+        if self._wakeup and not self._failures:
+            self._wakeup.set()
+
+    def _post(self, body: bytes) -> None:
+        """POST bloquant (exécuté dans un thread), lève UploadError en cas d'échec"""
+        request = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Authorization": f"Token {self.token}",
+            "Content-Encoding": "gzip",
+            "Content-Type": "text/plain; charset=utf-8",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            detail = e.read(512).decode(errors="ignore")
+            raise UploadError(f"HTTP {e.code}: {detail}", status=e.code) from None
+        except (urllib.error.URLError, OSError) as e:
+            raise UploadError(str(getattr(e, "reason", e))) from None
+
+    async def flush(self) -> bool:
+        """Envoie des lots jusqu'à vider le spool ; False au premier échec à réessayer"""
+        self.last_error = None
+        while True:
+            last_id, lines = self.spool.read_batch(self.max_points, self.max_bytes)
+            if not lines:
+                return True
+            raw = "\n".join(lines).encode()
+            body = gzip.compress(raw, self.gzip_level)
+            start = time.monotonic()
+            try:
+                await asyncio.to_thread(self._post, body)
+            except UploadError as e:
+                if self.perf is not None:
+                    self.perf.observe("upload.error", time.monotonic() - start)
+                if e.status == 413 and self.max_bytes > MIN_BATCH_BYTES:
+                    self.max_bytes = max(MIN_BATCH_BYTES, self.max_bytes // 2)
+                    logging.warning("[UPLOAD] Batch too large, max batch size now %d bytes", self.max_bytes)
+                    continue
+                if e.rejected or e.status == 413:
+                    self.spool.ack(last_id)
+                    self.points_dropped += len(lines)
+                    logging.error("[UPLOAD] Batch of %d points rejected, dropped: %s", len(lines), e)
+                    continue
+                if e.status in (401, 403):
+                    logging.info("[UPLOAD] insufficient rights to %s", self.bucket)
+                elif e.retryable:
+                    logging.info("[UPLOAD] for bucket %s: %s", self.bucket, e)
+                else:
+                    logging.error("[UPLOAD] for bucket %s, check configuration: %s", self.bucket, e)
+                if e.status is None and self.connectivity:
+                    self.connectivity.request_check()
+                self.last_error = e
+                return False
+
+            if self.perf is not None:
+                self.perf.observe("upload.post", time.monotonic() - start)
+            self.spool.ack(last_id)
+            wire = len(body) + self._header_bytes
+            self.points_sent += len(lines)
+            self.batches_sent += 1
+            self.bytes_raw += len(raw)
+            self.bytes_wire += wire
+            self.last_success = datetime.now(UTC)
+            logging.info(
+                "[UPLOAD] %d points sent in %.0f ms: %d bytes raw, %d bytes on the wire (%.0f%%), %d pending",
+                len(lines), (time.monotonic() - start) * 1000, len(raw), wire,
+                100.0 * wire / len(raw), len(self.spool),
+            )
+
+    def _next_delay(self) -> float:
+        if self.last_error is not None and not self.last_error.retryable:
+            # Droits ou bucket : rien ne changera avant une intervention, inutile d'insister
+            return BACKOFF_MAX
+        # Backoff exponentiel à gigue ("equal jitter") : jamais de rafale synchronisée entre sites
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self._failures)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _run(self):
+        delay = None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if self.connectivity and not self.connectivity.connected:
+                delay = BACKOFF_BASE
+                continue
+            try:
+                ok = await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("[UPLOAD] Unexpected error: %s", e)
+                ok = False
+
+            if ok:
+                self._failures = 0
+                delay = None
+            else:
+                delay = self._next_delay()
+                self._failures += 1
+                logging.info("[UPLOAD] Retry #%d in %.0f s", self._failures, delay)
@@ -0,0 +1,135 @@
+"""
+Registre des appareils Victron (Instant Readout)
+================================================
+Un même scanner reçoit les annonces de plusieurs appareils Victron d'un
+lieu : chargeurs SmartSolar, moniteurs SmartShunt / BMV, Orion, etc.
+Chaque appareil est enregistré par adresse MAC avec sa propre clé.
+
+En-tête d'une donnée constructeur 0x02E1 en clair :
+
+    0     1     2..3       4             5..6   7             8..
+    0x10  ?     modèle LE  type d'enreg. IV LE  octet de clé  données chiffrées
+
+VictronDevice rejette à coût quasi nul (avant tout déchiffrement) ce qui
+n'est pas une trame Instant Readout, un type d'enregistrement inconnu ou
+une trame dont l'octet de contrôle ne correspond pas à la clé. Le parser
+victron_ble est choisi d'après le modèle et le type (detect_device_type),
+construit une fois par appareil et par type puis réutilisé.
+
+Les valeurs sont toutes les grandeurs get_*() du type décodé (noms sans
+le préfixe get_, énumérations par leur nom) plus record_type : un
+chargeur donne battery_voltage, solar_power, yield_today..., un
+SmartShunt voltage, current, soc, consumed_ah...
+"""
+
+VICTRON_COMPANY_ID = 0x02E1
+INSTANT_READOUT = 0x10
+HEADER_LENGTH = 8
+RECORD_TYPE_OFFSET = 4
+KEY_CHECK_OFFSET = 7
+
+RECORD_TYPES = {
+    0x01: "solar_charger",
+    0x02: "battery_monitor",
+    0x03: "inverter",
+    0x04: "dcdc_converter",
+    0x05: "smart_lithium",
+    0x06: "inverter_rs",
+    0x08: "ac_charger",
+    0x09: "smart_battery_protect",
+    0x0A: "lynx_smart_bms",
+    0x0B: "multi_rs",
+    0x0C: "ve_bus",
+    0x0D: "dc_energy_meter",
+    0x0F: "orion_xs",
+}
+SOLAR_CHARGER = 0x01
+
+# victron_ble importé au premier décodage (plusieurs secondes sur un Raspberry Pi)
+_detect_device_type = None
+
+
+def load_victron_ble():
+    """Importe victron_ble ; retourne detect_device_type"""
+    global _detect_device_type
+    if _detect_device_type is None:
+        from victron_ble.devices import detect_device_type
+        _detect_device_type = detect_device_type
+    return _detect_device_type
+
+
+def record_type(data) -> int | None:
+    """Type d'enregistrement d'une trame Instant Readout, None si l'en-tête n'en est pas une"""
+    if len(data) <= HEADER_LENGTH or data[0] != INSTANT_READOUT:
+        return None
+    kind = data[RECORD_TYPE_OFFSET]
+    return kind if kind in RECORD_TYPES else None
+
+
+# type de données victron_ble -> noms des méthodes get_*
+_GETTERS = {}
+
+
+def values_of(parsed) -> dict:
+    """Grandeurs get_*() d'un objet décodé par victron_ble"""
+    getters = _GETTERS.get(type(parsed))
+    if getters is None:
+        getters = _GETTERS[type(parsed)] = tuple(
+            (name[4:], name) for name in dir(parsed) if name.startswith("get_") and name != "get_model_name"
+        )
+    values = {}
+    for key, name in getters:
+        value = getattr(parsed, name)()
+        values[key] = getattr(value, "name", value)
+    return values
+
+
+class VictronDevice:
+    """Un appareil Victron : clé, parsers par type d'enregistrement et compteurs de rejet"""
+
+    def __init__(self, mac: str | None, key: str):
+        self.mac = mac
+        self.key = key
+        self._key_check = bytes.fromhex(key)[0]
+        self._parsers = {}          # (modèle, type) -> instance victron_ble
+        self.record_type = None     # dernier type décodé
+        self.decoded = 0
+        self.rejected = 0           # en-tête invalide ou type inconnu
+        self.key_mismatch = 0       # octet de contrôle différent : autre clé
+
+    def accepts(self, data) -> bool:
+        """Contrôles sans déchiffrement : en-tête Instant Readout, type connu, octet de clé"""
+        if record_type(data) is None:
+            self.rejected += 1
+            return False
+        if data[KEY_CHECK_OFFSET] != self._key_check:
+            self.key_mismatch += 1
+            return False
+        return True
+
+    def parser_for(self, data):
+        """Parser victron_ble du modèle et du type de la trame, construit au premier usage"""
+        signature = bytes(data[2:RECORD_TYPE_OFFSET + 1])
+        parser = self._parsers.get(signature)
+        if parser is None:
+            device_class = load_victron_ble()(data)
+            if device_class is None:
+                return None
+            parser = self._parsers[signature] = device_class(self.key)
+        return parser
+
+    def decode(self, data) -> dict | None:
+        """Valeurs d'une trame déjà acceptée, None si aucun parser ne la prend en charge"""
+        parser = self.parser_for(data)
+        if parser is None:
+            self.rejected += 1
+            return None
+        values = values_of(parser.parse(data))
+        self.record_type = data[RECORD_TYPE_OFFSET]
+        values["record_type"] = RECORD_TYPES[self.record_type]
+        self.decoded += 1
+        return values
+
+    def stats(self) -> dict:
+        return {"record_type": RECORD_TYPES.get(self.record_type), "decoded": self.decoded,
+                "rejected": self.rejected, "key_mismatch": self.key_mismatch}
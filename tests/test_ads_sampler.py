@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from ads_sampler import ADS1115Sampler, ChannelConfig
+
+
+class FakeADS:
+    def __init__(self, samples):
+        self.samples = {ch: iter(values) for ch, values in samples.items()}
+        self.gain = 1
+        self.data_rate = 128
+        self.config_writes = 0
+
+    def __setattr__(self, name, value):
+        if name in ("gain", "data_rate") and hasattr(self, "config_writes"):
+            self.config_writes += 1
+        super().__setattr__(name, value)
+
+
+class FakeAnalogIn:
+    def __init__(self, ads, channel):
+        self.ads = ads
+        self.channel = channel
+
+    @property
+    def value(self):
+        return next(self.ads.samples[self.channel])
+
+    @property
+    def voltage(self):
+        return self.convert_to_voltage(self.value)
+
+    def convert_to_voltage(self, value):
+        return value / 1000.0
+
+
+class TestADS1115Sampler(unittest.TestCase):
+    def test_median_rejects_spike(self):
+        ads = FakeADS({0: [1000, 1002, 9999, 998, 1001]})
+        sampler = ADS1115Sampler({0: ChannelConfig(samples=5, reducer="median")},
+                                 device=ads, input_factory=FakeAnalogIn)
+        self.assertAlmostEqual(sampler.read_channel(0), 1.001)
+
+    def test_mean_and_channel_order(self):
+        ads = FakeADS({0: [100, 300], 1: [2000, 2000]})
+        sampler = ADS1115Sampler({
+            1: ChannelConfig(samples=2, reducer="mean"),
+            0: ChannelConfig(samples=2, reducer="mean"),
+        }, device=ads, input_factory=FakeAnalogIn)
+        self.assertEqual(sampler.read_all(), [0.2, 2.0])
+
+    def test_config_written_only_on_change(self):
+        ads = FakeADS({0: [1] * 3, 1: [1] * 3})
+        sampler = ADS1115Sampler({
+            0: ChannelConfig(gain=1, data_rate=250),
+            1: ChannelConfig(gain=1, data_rate=250),
+        }, device=ads, input_factory=FakeAnalogIn)
+        sampler.read_all()
+        sampler.read_all()
+        self.assertEqual(ads.config_writes, 1)
+
+    def test_invalid_data_rate(self):
+        with self.assertRaises(ValueError):
+            ChannelConfig(data_rate=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from adv_capture import AdvRecorder, CaptureError, clone_address, iter_capture, replay
+
+try:
+    from testmulti import GlobalStateManager
+    BLE_STACK_AVAILABLE = True
+except ImportError:
+    BLE_STACK_AVAILABLE = False
+
+BTHOME_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+SHELLY_MAC = "C0:2C:ED:A8:EE:6E"
+
+
+def adv(manufacturer_data=None, service_data=None, rssi=-70, local_name=None):
+    return SimpleNamespace(
+        local_name=local_name, manufacturer_data=manufacturer_data or {},
+        service_data=service_data or {}, rssi=rssi,
+    )
+
+
+def bthome(packet_id, temperature):
+    return bytes((0x40, 0x00, packet_id, 0x01, 90, 0x2E, 55)) + b"\x45" + struct.pack("<h", temperature)
+
+
+class TestAdvCapture(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "capture.kadv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, entries):
+        with AdvRecorder(self.path) as recorder:
+            for ts, mac, data in entries:
+                recorder.record(SimpleNamespace(address=mac), data, timestamp=ts)
+
+    def test_round_trip(self):
+        self.write([
+            (100.0, "fc:40:bc:fc:a8:d4", adv({0x02E1: b"\x10\x02\x60\xa0\x01"}, rssi=-81)),
+            (100.5, SHELLY_MAC, adv(service_data={BTHOME_UUID: bthome(1, 215)}, local_name="SBHT-003C")),
+        ])
+        records = list(iter_capture(self.path))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0].address, "FC:40:BC:FC:A8:D4")
+        self.assertEqual(records[0].rssi, -81)
+        self.assertEqual(records[0].manufacturer_data, {0x02E1: b"\x10\x02\x60\xa0\x01"})
+        self.assertIsNone(records[0].local_name)
+        self.assertEqual(records[1].timestamp, 100.5)
+        self.assertEqual(records[1].local_name, "SBHT-003C")
+        self.assertEqual(records[1].service_data, {BTHOME_UUID: bthome(1, 215)})
+
+    def test_append_only_and_truncated_tail(self):
+        self.write([(1.0, SHELLY_MAC, adv(service_data={BTHOME_UUID: bthome(1, 200)}))])
+        self.write([(2.0, SHELLY_MAC, adv(service_data={BTHOME_UUID: bthome(2, 201)}))])
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual([r.timestamp for r in iter_capture(self.path)], [1.0])
+
+    def test_rejects_foreign_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a capture")
+        with self.assertRaises(CaptureError):
+            list(iter_capture(self.path))
+
+    def test_max_bytes_stops_recording(self):
+        with AdvRecorder(self.path, max_bytes=64) as recorder:
+            for i in range(5):
+                recorder.record(SimpleNamespace(address=SHELLY_MAC), adv({1: b"x" * 10}), timestamp=i)
+        self.assertEqual(recorder.records, 1)
+        self.assertEqual(recorder.dropped, 4)
+
+    def test_wrap_records_then_forwards(self):
+        seen = []
+        with AdvRecorder(self.path) as recorder:
+            callback = recorder.wrap(lambda device, data: seen.append(device.address))
+            callback(SimpleNamespace(address=SHELLY_MAC), adv({1: b"\x01"}))
+        self.assertEqual(seen, [SHELLY_MAC])
+        self.assertEqual(len(list(iter_capture(self.path))), 1)
+
+    def test_clone_address(self):
+        self.assertEqual(clone_address("c0:2c:ed:a8:ee:6e", 0), SHELLY_MAC)
+        clones = {clone_address(SHELLY_MAC, i) for i in range(50)}
+        self.assertEqual(len(clones), 50)
+        self.assertTrue(all(c.endswith(":A8:EE:6E") for c in clones))
+
+    def test_replay_max_speed_with_clones(self):
+        self.write([(float(i), SHELLY_MAC, adv({1: bytes([i])})) for i in range(10)])
+        seen = []
+        stats = asyncio.run(replay(self.path, lambda d, a: seen.append((d.address, a.manufacturer_data[1])),
+                                   speed=None, clones=3, loops=2))
+        self.assertEqual(stats["delivered"], 60)
+        self.assertEqual(len({mac for mac, _ in seen}), 3)
+        self.assertEqual(seen[0][1], b"\x00")
+        self.assertLess(stats["elapsed"], 5)
+
+    def test_replay_respects_speed(self):
+        self.write([(0.0, SHELLY_MAC, adv({1: b"a"})), (10.0, SHELLY_MAC, adv({1: b"b"}))])
+        stats = asyncio.run(replay(self.path, lambda d, a: None, speed=100))
+        self.assertGreaterEqual(stats["elapsed"], 0.09)
+
+    @unittest.skipUnless(BLE_STACK_AVAILABLE, "testmulti indisponible")
+    def test_replay_into_state_manager(self):
+        self.write([(float(i), SHELLY_MAC, adv(service_data={BTHOME_UUID: bthome(i, 200 + i)})) for i in range(5)])
+        manager = GlobalStateManager("8ebf134b9339e9524eb24979c5e87505")
+        macs = {clone_address(SHELLY_MAC, i) for i in range(4)}
+
+        def callback(device, advertisement_data):
+            if device.address in macs:
+                manager.update_bthome(device.address, device, advertisement_data)
+
+        stats = asyncio.run(replay(self.path, callback, speed=None, clones=4))
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(set(manager.bthome_states), macs)
+        self.assertEqual(manager.bthome_states[SHELLY_MAC]["temperature"], 20.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from antarion_frame import FIELDS, FRAME_LENGTH, FrameAssembler, FrameError, decode_frame, format_frame
+
+# Trame relevée sur le régulateur
+FRAME = b"004127005000000000052160000000000000000"
+
+
+def legacy_decode(buffer: str) -> dict:
+    """Découpage de l'ancien Btantarion.parse_notification"""
+    return {
+        "charging_current": int(buffer[0:3]) / 10,
+        "battery_voltage": round(int(buffer[3:6]) / 10, 2),
+        "charging_power": int(buffer[6:9]),
+        "panel_voltage": round(int(buffer[20:23]) / 10, 1),
+        "charging_capacity": int(buffer[11:14]),
+        "energy_daily": int(buffer[17:20]),
+    }
+
+
+def notifications(frame, tail_first=False):
+    head, tail = bytearray(frame[:20]), bytearray(frame[20:] + b"\r")
+    return ([tail, head] if tail_first else [head, tail]) + [bytearray(b"\n")]
+
+
+def random_frame(rng):
+    return bytes(rng.choice(b"0123456789") for _ in range(FRAME_LENGTH))
+
+
+class TestDecodeFrame(unittest.TestCase):
+    def test_recorded_frame(self):
+        values = decode_frame(FRAME)
+        self.assertEqual(values, {
+            "charging_current": 0.4, "battery_voltage": 12.7, "charging_power": 5,
+            "charging_capacity": 0, "energy_daily": 5, "panel_voltage": 21.6,
+        })
+        self.assertEqual(set(values), {name for name, *_ in FIELDS})
+        self.assertEqual(format_frame(FRAME), "004|127|005|00|000|000|005|216|0000000000000000")
+
+    def test_matches_legacy_slicing(self):
+        rng = random.Random(1)
+        for _ in range(2000):
+            frame = random_frame(rng)
+            self.assertEqual(decode_frame(frame), legacy_decode(frame.decode()))
+
+    def test_invalid(self):
+        with self.assertRaises(FrameError):
+            decode_frame(FRAME[:-1])
+        with self.assertRaises(FrameError):
+            decode_frame(FRAME[:10] + b"x" + FRAME[11:])
+
+
+class TestFrameAssembler(unittest.TestCase):
+    def test_head_tail_lf(self):
+        assembler = FrameAssembler()
+        results = [assembler.feed(n) for n in notifications(FRAME)]
+        self.assertEqual(results[:2], [None, None])
+        self.assertEqual(results[2]["battery_voltage"], 12.7)
+        self.assertEqual(assembler.last_frame, FRAME)
+
+    def test_tail_before_head(self):
+        assembler = FrameAssembler()
+        results = [assembler.feed(n) for n in notifications(FRAME, tail_first=True)]
+        self.assertEqual(results[2], decode_frame(FRAME))
+
+    def test_tail_and_lf_together(self):
+        assembler = FrameAssembler()
+        assembler.feed(FRAME[:20])
+        self.assertEqual(assembler.feed(FRAME[20:] + b"\r\n"), decode_frame(FRAME))
+
+    def test_truncated_frame_rejected_then_recovers(self):
+        assembler = FrameAssembler()
+        for n in notifications(FRAME)[1:]:
+            self.assertIsNone(assembler.feed(n))
+        self.assertEqual(assembler.rejected, 1)
+        self.assertIsNotNone([assembler.feed(n) for n in notifications(FRAME)][2])
+
+    def test_lost_lf_drops_previous_pair(self):
+        assembler = FrameAssembler()
+        assembler.feed(b"99999")
+        assembler.feed(b"12345\r")
+        results = [assembler.feed(n) for n in notifications(FRAME)]
+        self.assertEqual(results[2], decode_frame(FRAME))
+        self.assertEqual(assembler.dropped, 1)
+
+    def test_oversized_fragment(self):
+        assembler = FrameAssembler()
+        assembler.feed(b"1" * 500)
+        assembler.feed(b"\r")
+        self.assertIsNone(assembler.feed(b"\n"))
+        self.assertEqual(assembler.rejected, 1)
+
+    def fuzz(self, seed, duplicates):
+        """
+        Flux aléatoire de trames valides avec fragments perdus, tronqués,
+        parasites et (option) dupliqués. Retourne les trames envoyées, les
+        fragments envoyés et les trames publiées.
+        """
+        rng = random.Random(seed)
+        assembler = FrameAssembler()
+        sent, fragments, published = set(), set(), []
+        for _ in range(5000):
+            frame = random_frame(rng)
+            sent.add(frame)
+            fragments.update((frame[:20], frame[20:]))
+            parts = notifications(frame, tail_first=rng.random() < 0.3)
+            action = rng.random()
+            if action < 0.1:
+                del parts[rng.randrange(3)]
+            elif action < 0.2:
+                i = rng.randrange(2)
+                parts[i] = parts[i][:rng.randrange(len(parts[i]))]
+            elif action < 0.25:
+                parts.insert(rng.randrange(4), bytearray(rng.randbytes(rng.randrange(1, 80))))
+            elif action < 0.3 and duplicates:
+                parts.insert(rng.randrange(4), parts[rng.randrange(3)])
+            for part in parts:
+                values = assembler.feed(part)
+                if values is not None:
+                    published.append(assembler.last_frame)
+                    self.assertEqual(values, decode_frame(assembler.last_frame))
+        self.assertEqual(assembler.stats()["frames"], len(published))
+        self.assertGreater(assembler.stats()["rejected"] + assembler.stats()["dropped"], 0)
+        self.assertGreater(len(published), 3500)
+        return sent, fragments, published
+
+    def test_fuzz_losses_never_publish_a_mixed_frame(self):
+        sent, _, published = self.fuzz(42, duplicates=False)
+        self.assertTrue(all(frame in sent for frame in published))
+
+    def test_fuzz_with_duplicates_only_pairs_real_fragments(self):
+        # Sans somme de contrôle, une fin dupliquée peut s'apparier à la tête suivante :
+        # la trame publiée reste faite de fragments réellement reçus, jamais d'octets parasites
+        sent, fragments, published = self.fuzz(7, duplicates=True)
+        for frame in published:
+            self.assertEqual(len(frame), FRAME_LENGTH)
+            self.assertTrue(frame in sent or (frame[:20] in fragments and frame[20:] in fragments))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from at_modem import ATSession, registration_status, csq_to_dbm
+
+
+class FakeSerial:
+    """Port série simulé : chaque commande reçue déclenche une réponse scriptée"""
+
+    def __init__(self, replies, unsolicited=b""):
+        self.replies = replies
+        self.buffer = bytearray(unsolicited)
+        self.is_open = True
+        self.written = []
+
+    @property
+    def in_waiting(self):
+        return len(self.buffer)
+
+    def write(self, data):
+        command = data.decode().strip()
+        self.written.append(command)
+        self.buffer += (command + "\r\n").encode()  # écho
+        self.buffer += self.replies.get(command, b"\r\nERROR\r\n")
+
+    def readline(self):
+        idx = self.buffer.find(b"\n")
+        if idx < 0:
+            data, self.buffer = bytes(self.buffer), bytearray()
+            return data
+        data = bytes(self.buffer[:idx + 1])
+        del self.buffer[:idx + 1]
+        return data
+
+    def close(self):
+        self.is_open = False
+
+
+def make_session(replies, unsolicited=b""):
+    session = ATSession("/dev/null", 115200)
+    session.ser = FakeSerial(replies, unsolicited)
+    return session
+
+
+class TestATSession(unittest.TestCase):
+    def test_reads_until_final_ok(self):
+        session = make_session({"AT+CSQ": b"\r\n+CSQ: 20,99\r\n\r\nOK\r\n"})
+        resp = session.command("AT+CSQ")
+        self.assertTrue(resp.ok)
+        self.assertEqual(resp.lines, ["+CSQ: 20,99"])
+        self.assertLess(resp.elapsed, 0.5)
+
+    def test_cme_error_is_final(self):
+        session = make_session({"AT+CGACT=1,1": b"\r\n+CME ERROR: 30\r\n"})
+        resp = session.command("AT+CGACT=1,1")
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.final, "+CME ERROR: 30")
+
+    def test_urc_separated_from_response(self):
+        session = make_session(
+            {"AT+CREG?": b"\r\n+CGEV: NW DETACH\r\n+CREG: 0,5\r\n\r\nOK\r\n"},
+            unsolicited=b"\r\nRDY\r\n",
+        )
+        resp = session.command("AT+CREG?")
+        self.assertEqual(resp.lines, ["+CREG: 0,5"])
+        self.assertEqual([line for _, line in session.urcs], ["RDY", "+CGEV: NW DETACH"])
+
+    def test_timeout_without_final_code(self):
+        session = make_session({"AT+CFUN?": b"\r\n+CFUN: 1\r\n"})
+        resp = session.command("AT+CFUN?", timeout=0.05)
+        self.assertIsNone(resp.final)
+        self.assertEqual(resp.lines, ["+CFUN: 1"])
+
+    def test_diagnostics_single_pass(self):
+        session = make_session({
+            "AT+CREG?": b"\r\n+CREG: 0,1\r\n\r\nOK\r\n",
+            "AT+CGREG?": b"\r\n+CGREG: 0,1\r\n\r\nOK\r\n",
+            "AT+CGATT?": b"\r\n+CGATT: 1\r\n\r\nOK\r\n",
+            "AT+CSQ": b"\r\n+CSQ: 31,99\r\n\r\nOK\r\n",
+            "AT+CGDCONT?": b'\r\n+CGDCONT: 1,"IP","sl2fr"\r\n\r\nOK\r\n',
+        })
+        diag = session.diagnostics()
+        self.assertTrue(all(resp.ok for resp in diag.values()))
+        self.assertEqual(session.ser.written, list(diag))
+
+
+class TestParsers(unittest.TestCase):
+    def test_registration_status(self):
+        self.assertEqual(registration_status("+CREG: 0,5\nOK"), 5)
+        self.assertEqual(registration_status('+CGREG: 2,1,"1A2B","01C3D4E5"'), 1)
+        self.assertIsNone(registration_status("ERROR"))
+
+    def test_csq_to_dbm(self):
+        self.assertEqual(csq_to_dbm("+CSQ: 20,99"), -73)
+        self.assertIsNone(csq_to_dbm("+CSQ: 99,99"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import bench_hot_paths as bench
+
+
+class TestBenchHotPaths(unittest.TestCase):
+    def test_runs_and_reports_every_selected_target(self):
+        results = bench.run_benchmarks(["site_status", "ntc"], min_time=0.001, repeats=1, alloc_samples=5)
+        self.assertIn("site_status.update", results)
+        self.assertIn("supervisor.ntc_temperature", results)
+        for name, r in results.items():
+            if "skipped" not in r:
+                self.assertGreater(r["ops_per_sec"], 0, name)
+                self.assertGreaterEqual(r["alloc_bytes_per_op"], 0, name)
+        self.assertIn("site_status.update", bench.format_report(results))
+
+    def test_victron_stream_decodes(self):
+        try:
+            bench._needs_crypto()
+            manager = bench._state_manager()
+        except bench.Skip as e:
+            self.skipTest(str(e))
+        frame = bench.victron_frame(bench.VICTRON_KEY, 7, 12.5, 3.2, 40, 120)
+        manager.update_victron(bench.advertisement({0x02E1: frame}))
+        self.assertEqual(manager.victron_state["battery_voltage"], 12.5)
+        self.assertEqual(manager.victron_state["battery_charging_current"], 3.2)
+        self.assertEqual(manager.victron_state["solar_power"], 40)
+
+    def test_compare_flags_slowdown_and_allocation_growth(self):
+        baseline = {"results": {
+            "a": {"ops_per_sec": 1000.0, "alloc_bytes_per_op": 100.0},
+            "b": {"ops_per_sec": 1000.0, "alloc_bytes_per_op": 100.0},
+            "c": {"skipped": "absent"},
+        }}
+        results = {
+            "a": {"ops_per_sec": 950.0, "alloc_bytes_per_op": 120.0},
+            "b": {"ops_per_sec": 500.0, "alloc_bytes_per_op": 1000.0},
+            "c": {"ops_per_sec": 1.0, "alloc_bytes_per_op": 0.0},
+            "d": {"ops_per_sec": 1.0, "alloc_bytes_per_op": 0.0},
+        }
+        regressions = bench.compare(baseline, results, threshold=0.15)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(r.startswith("b:") for r in regressions))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from bt_recovery import (BluetoothRecovery, LEVEL_BLUEZ, LEVEL_HCI_UART, LEVEL_NONE, LEVEL_POWER_CYCLE,
+                         LEVEL_SCANNER, run_command)
+
+
+class Harness:
+    def __init__(self, **kwargs):
+        self.commands = []
+        self.sleeps = []
+        self.scanner_restarts = 0
+        self.count = 0
+
+        async def run(cmd):
+            self.commands.append(" ".join(cmd))
+            return True
+
+        async def sleep(seconds):
+            self.sleeps.append(seconds)
+
+        async def restart_scanner():
+            self.scanner_restarts += 1
+
+        self.recovery = BluetoothRecovery(
+            restart_scanner, activity=lambda: self.count, silence_timeout=100, error_threshold=3,
+            error_window=60, settle_time=30, reset_after=500, run=run, sleep=sleep, **kwargs,
+        )
+        self.t0 = self.recovery.started_at
+
+    def check(self, at):
+        asyncio.run(self.recovery.check_once(now=self.t0 + at))
+
+
+class TestBluetoothRecovery(unittest.TestCase):
+    def test_advertisements_keep_it_quiet(self):
+        h = Harness()
+        for at in range(0, 400, 10):
+            h.count += 5
+            h.check(at)
+        self.assertEqual(h.recovery.level, LEVEL_NONE)
+        self.assertEqual(h.scanner_restarts, 0)
+
+    def test_silence_escalates_one_level_at_a_time(self):
+        h = Harness()
+        h.check(50)
+        self.assertEqual(h.recovery.level, LEVEL_NONE)
+        h.check(101)
+        self.assertEqual(h.recovery.level, LEVEL_SCANNER)
+        self.assertEqual((h.scanner_restarts, h.commands), (1, []))
+        h.check(150)    # le scanner a encore 100 s pour reprendre
+        self.assertEqual(h.recovery.level, LEVEL_SCANNER)
+        h.check(202)
+        self.assertEqual(h.recovery.level, LEVEL_POWER_CYCLE)
+        self.assertEqual(h.commands, ["bluetoothctl power off", "bluetoothctl power on"])
+        h.check(303)
+        self.assertEqual(h.recovery.level, LEVEL_BLUEZ)
+        self.assertIn("sudo systemctl restart bluetooth", h.commands)
+        h.check(404)
+        h.check(505)
+        self.assertEqual(h.recovery.level, LEVEL_HCI_UART)
+        self.assertEqual(h.recovery.actions["reload_hci_uart"], 2)
+        self.assertIn("sudo modprobe hci_uart", h.commands)
+        self.assertEqual(h.scanner_restarts, 5)
+        self.assertGreater(sum(h.sleeps), 0)
+
+    def test_errors_trigger_and_settle_time(self):
+        h = Harness()
+        h.count = 1
+        for i in range(3):
+            h.recovery.report_error(OSError("le-connection-abort-by-local"), now=h.t0 + i)
+        h.check(5)
+        self.assertEqual(h.recovery.level, LEVEL_SCANNER)
+        self.assertEqual(h.recovery.last_symptom, "errors")
+        for i in range(3):
+            h.recovery.report_error(now=h.t0 + 10 + i)
+        h.check(20)     # délai de rétablissement non écoulé
+        self.assertEqual(h.recovery.level, LEVEL_SCANNER)
+        h.check(40)
+        self.assertEqual(h.recovery.level, LEVEL_POWER_CYCLE)
+
+    def test_old_errors_expire(self):
+        h = Harness()
+        h.recovery.report_error(now=h.t0)
+        h.recovery.report_error(now=h.t0 + 1)
+        h.recovery.report_error(now=h.t0 + 70)
+        self.assertIsNone(h.recovery.symptom(now=h.t0 + 71))
+
+    def test_level_resets_when_healthy(self):
+        h = Harness()
+        h.check(101)
+        self.assertEqual(h.recovery.level, LEVEL_SCANNER)
+        for at in range(110, 700, 10):
+            h.count += 1
+            h.check(at)
+        self.assertEqual(h.recovery.level, LEVEL_NONE)
+
+    def test_run_command_never_blocks(self):
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            ok = await run_command([sys.executable, "-c", "import time; time.sleep(0.2)"])
+            timed_out = await run_command([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.1)
+            missing = await run_command(["/nonexistent/command"])
+            task.cancel()
+            return ok, timed_out, missing, ticks
+
+        ok, timed_out, missing, ticks = asyncio.run(scenario())
+        self.assertEqual((ok, timed_out, missing), (True, False, False))
+        self.assertGreater(ticks, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+try:
+    from btantarion import Btantarion
+    from bt_recovery import BluetoothRecovery
+    BLEAK_AVAILABLE = True
+except ImportError:
+    BLEAK_AVAILABLE = False
+    Btantarion = object
+
+
+class FakeClient:
+    """BleakClient simulé : chaque connexion tient polls_per_session requêtes OK puis se coupe"""
+    instances = []
+    fail_connects = 0
+    polls_per_session = 2
+
+    def __init__(self, device, timeout=None, disconnected_callback=None):
+        self.device = device
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.writes = 0
+        self.notifying = []
+        self.services = FakeServices()
+        FakeClient.instances.append(self)
+
+    async def connect(self, **kwargs):
+        if FakeClient.fail_connects:
+            FakeClient.fail_connects -= 1
+            raise OSError("le-connection-abort-by-local")
+        self.is_connected = True
+
+    async def start_notify(self, handle, callback):
+        self.notifying.append(handle)
+
+    async def write_gatt_char(self, char, data, response=False):
+        self.writes += 1
+        if self.writes > self.polls_per_session:
+            self.is_connected = False
+            self.disconnected_callback(self)
+            raise OSError("Not connected")
+        if self.writes == self.polls_per_session:
+            asyncio.get_running_loop().call_soon(self._drop)
+
+    def _drop(self):
+        self.is_connected = False
+        self.disconnected_callback(self)
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+class FakeServices:
+    def __iter__(self):
+        return iter([SimpleNamespace(uuid="18f0", characteristics=[
+            SimpleNamespace(uuid="2af1", handle=0x10, properties=["write"])])])
+
+    def get_characteristic(self, uuid):
+        return f"char:{uuid}"
+
+
+class QuietAntarion(Btantarion):
+    async def find_device(self):
+        self.lookups = getattr(self, "lookups", 0) + 1
+        return SimpleNamespace(address=self.address)
+
+
+@unittest.skipUnless(BLEAK_AVAILABLE, "bleak non installé")
+class TestPersistentSession(unittest.TestCase):
+    def setUp(self):
+        FakeClient.instances = []
+        FakeClient.fail_connects = 0
+        self.commands = []
+
+        async def run(cmd):
+            self.commands.append(cmd)
+            return True
+
+        async def sleep(seconds):
+            pass
+
+        self.bts = QuietAntarion(recovery=BluetoothRecovery(run=run, sleep=sleep, check_interval=0.01, settle_time=0))
+        self.bts.client_class = FakeClient
+        self.bts.reconnect_min = 0.01
+        self.bts.reconnect_max = 0.04
+
+    def run_for(self, seconds, poll_interval=0.05):
+        async def scenario():
+            task = asyncio.create_task(self.bts.run(loop=poll_interval))
+            await asyncio.sleep(seconds)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        asyncio.run(scenario())
+
+    def test_one_connection_polls_on_timer(self):
+        FakeClient.polls_per_session = 1000
+        self.run_for(0.3)
+        self.assertEqual(self.bts.connections, 1)
+        self.assertEqual(FakeClient.instances[0].notifying, [0x000e])
+        self.assertGreaterEqual(self.bts.polls, 4)
+        self.assertEqual(self.bts.lookups, 1)
+        self.assertEqual(self.bts._write_char, "char:00002af1-0000-1000-8000-00805f9b34fb")
+
+    def test_reconnects_after_drop_without_new_lookup(self):
+        FakeClient.polls_per_session = 2
+        self.run_for(0.35, poll_interval=0.01)
+        self.assertGreaterEqual(self.bts.connections, 2)
+        self.assertEqual(self.bts.lookups, 1)
+
+    def test_backoff_after_failures(self):
+        FakeClient.fail_connects = 4
+        FakeClient.polls_per_session = 1000
+        self.run_for(0.3)
+        # 0.01 + 0.02 + 0.04 + 0.04 de backoff puis une session
+        self.assertEqual(len(FakeClient.instances), 5)
+        self.assertEqual(self.bts.connections, 1)
+        self.assertEqual(self.bts.lookups, 5)
+        self.assertEqual(len(self.bts.recovery._errors), 4)
+        self.assertEqual(self.commands, [])
+
+    def test_repeated_failures_escalate_recovery(self):
+        FakeClient.fail_connects = 1000
+        self.bts.reconnect_max = 0.01
+        self.run_for(0.3)
+        self.assertGreaterEqual(self.bts.recovery.level, 2)
+        self.assertIn(["bluetoothctl", "power", "off"], self.commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
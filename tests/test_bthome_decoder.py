@@ -0,0 +1,215 @@
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from bthome_decoder import (
+    OBJECTS, BTHomeDevice, BTHomeError, decode_frame, decode_frames, decode_objects, entity_values,
+)
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESCCM
+    CRYPTO_AVAILABLE = True
+except ImportError:
+    CRYPTO_AVAILABLE = False
+
+try:
+    from bleak.backends.device import BLEDevice
+    from bleak.backends.scanner import AdvertisementData
+    from bthome_ble import BTHomeBluetoothDeviceData
+    from home_assistant_bluetooth import BluetoothServiceInfoBleak
+    BTHOME_BLE_AVAILABLE = True
+except ImportError:
+    BTHOME_BLE_AVAILABLE = False
+
+BTHOME_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+MAC = "54:48:E6:8F:80:A5"
+BINDKEY = "231d39c1d7cc1ab1aee224cd096db932"
+
+
+def encrypt(objects: bytes, counter: int, mac=MAC, bindkey=BINDKEY) -> bytes:
+    """Donnée de service 0xFCD2 chiffrée comme par un capteur BTHome v2"""
+    info = 0x41
+    counter_bytes = counter.to_bytes(4, "little")
+    nonce = bytes.fromhex(mac.replace(":", "")) + b"\xd2\xfc" + bytes((info,)) + counter_bytes
+    sealed = AESCCM(bytes.fromhex(bindkey), tag_length=4).encrypt(nonce, objects, None)
+    return bytes((info,)) + sealed[:-4] + counter_bytes + sealed[-4:]
+
+
+def shelly_ht(packet_id=7, battery=91, light=2, humidity=48, temperature=-1.5):
+    return bytes((0x00, packet_id, 0x01, battery, 0x1E, light, 0x2E, humidity)) \
+        + b"\x45" + struct.pack("<h", round(temperature * 10))
+
+
+class DecodeFrameTests(unittest.TestCase):
+    def test_legacy_keys(self):
+        decoded = decode_frame(shelly_ht())
+        self.assertEqual(decoded, {
+            "packet_id": 7, "battery_pct": 91, "light_raw": 2, "light": "bright",
+            "humidity_pct": 48, "temperature_c": -1.5, "frame_type": "advertising_beacon",
+        })
+
+    def test_device_id_and_event_frames(self):
+        decoded = decode_frame(b"\xf0\x02\x00\xf1\x04\x03\x02\x01\xf2\x03\x02\x01")
+        self.assertEqual(decoded["device_type_id"], 2)
+        self.assertEqual(decoded["firmware_u32"], 0x01020304)
+        self.assertEqual(decoded["firmware_u24"], 0x010203)
+        self.assertEqual(decoded["frame_type"], "device_id_packet")
+        decoded = decode_frame(b"\x3a\x01\x3a\x04")
+        self.assertEqual((decoded["button_event"], decoded["button_event_2"]), ("short_press", "long_press"))
+        self.assertEqual(decoded["frame_type"], "event")
+
+    def test_scaling_and_sizes(self):
+        payload = (b"\x02" + struct.pack("<h", -1234) + b"\x03" + struct.pack("<H", 5055)
+                   + b"\x04" + (101325).to_bytes(3, "little") + b"\x0c" + struct.pack("<H", 3012)
+                   + b"\x5c" + struct.pack("<i", -250) + b"\x58\xf6")
+        decoded = decode_objects(payload)
+        self.assertEqual(decoded["temperature_c"], -12.34)
+        self.assertEqual(decoded["humidity_pct"], 50.55)
+        self.assertEqual(decoded["pressure_hpa"], 1013.25)
+        self.assertEqual(decoded["voltage_v"], 3.012)
+        self.assertEqual(decoded["power_w"], -2.5)
+        self.assertEqual(decoded["temperature_c_2"], -3.5)
+
+    def test_variable_length_and_dimmer(self):
+        decoded = decode_objects(b"\x53\x02hi\x54\x03\x01\x02\x03\x3c\x01\x05\x11\x01")
+        self.assertEqual(decoded["text"], "hi")
+        self.assertEqual(decoded["raw"], b"\x01\x02\x03")
+        self.assertEqual(decoded["dimmer_event"], ("rotate_left", 5))
+        self.assertIs(decoded["opening"], True)
+
+    def test_multi_instance(self):
+        payload = b"".join(b"\x45" + struct.pack("<h", t) for t in (100, 200, 300))
+        decoded = decode_objects(payload)
+        self.assertEqual([decoded[k] for k in ("temperature_c", "temperature_c_2", "temperature_c_3")],
+                         [10.0, 20.0, 30.0])
+
+    def test_unknown_object_stops(self):
+        decoded = decode_objects(b"\x01\x50\x99\x2e\x30")
+        self.assertEqual(decoded, {"battery_pct": 80, "unknown_object": 0x99})
+
+    def test_truncated(self):
+        with self.assertLogs(level="WARNING"):
+            decoded = decode_objects(b"\x01\x50\x45\x01")
+        self.assertEqual(decoded, {"battery_pct": 80})
+
+    def test_empty(self):
+        self.assertEqual(decode_frame(b""), {})
+
+    def test_every_object_decodes(self):
+        for obj_id, (key, fmt, _divisor, _convert) in OBJECTS.items():
+            size = {"u8": 1, "s8": 1, "u16": 2, "s16": 2, "u24": 3, "u32": 4, "s32": 4}.get(fmt, 0)
+            payload = bytes((obj_id,)) + (b"\x00" if fmt == "var" else bytes(range(1, size + 1))) + b"\x01\x64"
+            decoded = decode_objects(payload)
+            self.assertIn(key, decoded, hex(obj_id))
+            battery = "battery_pct_2" if key == "battery_pct" else "battery_pct"
+            self.assertEqual(decoded[battery], 100, hex(obj_id))
+
+    def test_batch(self):
+        payloads = [shelly_ht(packet_id=i, temperature=i) for i in range(5)] + [b""]
+        decoded = decode_frames(payloads)
+        self.assertEqual([d.get("temperature_c") for d in decoded], [0.0, 1.0, 2.0, 3.0, 4.0, None])
+
+
+class EntityValuesTests(unittest.TestCase):
+    def test_bthome_ble_names(self):
+        objects = decode_objects(shelly_ht() + b"\x45\x10\x00\x11\x01")
+        self.assertEqual(entity_values(objects), {
+            "packet_id": 7, "battery": 91, "humidity": 48, "temperature": -1.5, "temperature_2": 1.6,
+        })
+
+
+class PlainDeviceTests(unittest.TestCase):
+    def test_plain_frame(self):
+        device = BTHomeDevice(MAC)
+        self.assertEqual(device.parse(b"\x40" + shelly_ht())["temperature_c"], -1.5)
+        self.assertEqual(device.packets, 1)
+
+    def test_other_version_rejected(self):
+        device = BTHomeDevice(MAC)
+        self.assertIsNone(device.parse(b"\x20" + shelly_ht()))
+        self.assertIsNone(device.parse(b""))
+        self.assertEqual(device.rejected, 1)
+
+    def test_encrypted_without_key(self):
+        device = BTHomeDevice(MAC)
+        self.assertIsNone(device.parse(b"\x41" + bytes(16)))
+        self.assertEqual(device.failures, 1)
+
+    def test_bad_bindkey(self):
+        with self.assertRaises(BTHomeError):
+            BTHomeDevice(MAC, "0011")
+
+
+@unittest.skipUnless(CRYPTO_AVAILABLE, "cryptography non installé")
+class EncryptedDeviceTests(unittest.TestCase):
+    def setUp(self):
+        self.device = BTHomeDevice(MAC, BINDKEY)
+
+    def test_decrypts(self):
+        decoded = self.device.parse(encrypt(shelly_ht(temperature=21.5), 1000))
+        self.assertEqual(decoded["temperature_c"], 21.5)
+        self.assertEqual(self.device.counter, 1000)
+
+    @unittest.skipUnless(BTHOME_BLE_AVAILABLE, "bthome_ble non installé")
+    def test_same_frames_as_bthome_ble(self):
+        # Même nonce et même tag que la bibliothèque de référence
+        frame = encrypt(shelly_ht(temperature=21.5), 1000)
+        parser = BTHomeBluetoothDeviceData(bindkey=bytes.fromhex(BINDKEY))
+        adv = AdvertisementData(None, {}, {BTHOME_UUID: frame}, [BTHOME_UUID], None, -70, ())
+        update = parser.update(BluetoothServiceInfoBleak.from_scan("local", BLEDevice(MAC, None, None), adv, 0.0, False))
+        reference = {key.key: value.native_value for key, value in update.entity_values.items()}
+        self.assertEqual(reference["temperature"], 21.5)
+        ours = entity_values(self.device.parse(frame))
+        self.assertEqual({k: v for k, v in reference.items() if k != "signal_strength"}, ours)
+
+    def test_replay_and_duplicate(self):
+        first = encrypt(shelly_ht(), 1000)
+        self.assertIsNotNone(self.device.parse(first))
+        self.assertIsNone(self.device.parse(first))
+        self.assertEqual(self.device.duplicates, 1)
+        self.assertIsNotNone(self.device.parse(encrypt(shelly_ht(), 1001)))
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 900)))
+        self.assertEqual(self.device.replays, 1)
+        self.assertEqual(self.device.counter, 1001)
+
+    def test_low_counter_replay_rejected(self):
+        self.device.parse(encrypt(shelly_ht(), 5000))
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 5)))
+        self.assertEqual(self.device.counter, 5000)
+        self.assertEqual(self.device.replays, 1)
+        # Une trame normale abandonne le redémarrage présumé
+        self.assertIsNotNone(self.device.parse(encrypt(shelly_ht(), 5001)))
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 6)))
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 7)))
+        self.assertEqual(self.device.counter, 5001)
+
+    def test_counter_restart_confirmed(self):
+        self.device.parse(encrypt(shelly_ht(), 5000))
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 1)))
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 1)))      # répétition de la même annonce
+        self.assertIsNone(self.device.parse(encrypt(shelly_ht(), 2)))
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNotNone(self.device.parse(encrypt(shelly_ht(), 3)))
+        self.assertEqual(self.device.counter, 3)
+        self.assertEqual(self.device.duplicates, 1)
+
+    def test_tampered_or_wrong_key(self):
+        frame = bytearray(encrypt(shelly_ht(), 1000))
+        frame[3] ^= 0x01
+        self.assertIsNone(self.device.parse(bytes(frame)))
+        other = encrypt(shelly_ht(), 1001, bindkey="00" * 16)
+        self.assertIsNone(self.device.parse(other))
+        self.assertEqual(self.device.failures, 2)
+        self.assertIsNone(self.device.counter)   # une trame invalide ne fait pas avancer le compteur
+
+    def test_plain_frame_refused_with_key(self):
+        self.assertIsNone(self.device.parse(b"\x40" + shelly_ht()))
+        self.assertEqual(self.device.rejected, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
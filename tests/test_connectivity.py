@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from connectivity import ConnectivityManager, STATE_ONLINE, STATE_OFFLINE
+
+
+def make_ping(result):
+    async def ping(num):
+        return result
+    return ping
+
+
+async def lte_probe():
+    return True
+
+
+def modem_probe():
+    return {"registered": True, "attached": True, "signal_dbm": -71}
+
+
+class TestConnectivityManager(unittest.TestCase):
+    def test_online_when_ping_ok(self):
+        manager = ConnectivityManager(ping=make_ping(True), lte_probe=lte_probe, modem_probe=modem_probe)
+        asyncio.run(manager.check_once())
+        self.assertEqual(manager.state, STATE_ONLINE)
+        self.assertEqual(manager.snapshot(), (True, True, True))
+        self.assertEqual(manager.signal_dbm, -71)
+
+    def test_failed_bring_up_counts_failures(self):
+        manager = ConnectivityManager(
+            ping=make_ping(False), lte_probe=lte_probe,
+            bring_up=lambda force: (False, False, False, True),
+        )
+        asyncio.run(manager.check_once())
+        asyncio.run(manager.check_once())
+        self.assertEqual(manager.state, STATE_OFFLINE)
+        self.assertEqual(manager.lte_failures, 2)
+
+    def test_successful_bring_up_resets_failures(self):
+        manager = ConnectivityManager(
+            ping=make_ping(False), lte_probe=lte_probe,
+            bring_up=lambda force: (True, True, True, False),
+        )
+        manager.lte_failures = 5
+        asyncio.run(manager.check_once())
+        self.assertEqual(manager.state, STATE_ONLINE)
+        self.assertEqual(manager.lte_failures, 0)
+        self.assertEqual(manager.snapshot(), (True, True, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
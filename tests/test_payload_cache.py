@@ -0,0 +1,109 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from payload_cache import PayloadCache
+
+try:
+    from testmulti import GlobalStateManager
+    from victron_registry import VictronDevice
+    import victron_ble  # noqa: F401
+    BLE_STACK_AVAILABLE = True
+except ImportError:
+    BLE_STACK_AVAILABLE = False
+
+
+class TestPayloadCache(unittest.TestCase):
+    def test_hit_miss_counters(self):
+        cache = PayloadCache()
+        self.assertIsNone(cache.get(("mac", b"\x01")))
+        cache.put(("mac", b"\x01"), {"v": 1})
+        self.assertEqual(cache.get(("mac", b"\x01")), {"v": 1})
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1, "hit_rate": 0.5})
+
+    def test_evicts_least_recently_used(self):
+        cache = PayloadCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+
+
+class SolarData:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def get_battery_voltage(self):
+        return 12.0 + self.raw[-1] / 100
+
+    def get_battery_charging_current(self):
+        return 1.0
+
+    def get_solar_power(self):
+        return 20
+
+    def get_yield_today(self):
+        return 100
+
+    def get_charge_state(self):
+        return "BULK"
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def parse(self, raw):
+        self.calls += 1
+        return SolarData(raw)
+
+
+def solar_frame(n):
+    # En-tête Instant Readout SmartSolar (type 0x01), octet de contrôle de la clé 00..00
+    return bytes((0x10, 0x02, 0x60, 0xA0, 0x01, 0x00, 0x00, 0x00, n))
+
+
+@unittest.skipUnless(BLE_STACK_AVAILABLE, "victron_ble not installed")
+class TestVictronDedup(unittest.TestCase):
+    def test_identical_payload_decoded_once(self):
+        manager = GlobalStateManager("00" * 16)
+        manager.duree_fenetre_seconds = manager.intervalle_ecoute_seconds  # toujours dans la fenêtre
+        parser = CountingParser()
+        device = manager.victron_devices[None] = VictronDevice(None, manager.victron_key)
+        device.parser_for = lambda data: parser
+        adv_a = SimpleNamespace(manufacturer_data={0x02E1: solar_frame(1)})
+        adv_b = SimpleNamespace(manufacturer_data={0x02E1: solar_frame(2)})
+        for _ in range(50):
+            manager.update_victron(adv_a)
+        manager.update_victron(adv_b)
+        manager.update_victron(adv_a)
+        self.assertEqual(parser.calls, 2)
+        self.assertEqual(manager.victron_state["battery_voltage"], 12.01)
+        self.assertEqual(manager.victron_state["record_type"], "solar_charger")
+        self.assertEqual(manager.payload_cache.hits, 50)
+
+    def test_rejected_before_decryption(self):
+        manager = GlobalStateManager("00" * 16)
+        manager.duree_fenetre_seconds = manager.intervalle_ecoute_seconds
+        parser = CountingParser()
+        device = manager.victron_devices[None] = VictronDevice(None, manager.victron_key)
+        device.parser_for = lambda data: parser
+        for data in ({0x004C: solar_frame(1)},                         # autre constructeur
+                     {0x02E1: b"\x11" + solar_frame(1)[1:]},           # pas Instant Readout
+                     {0x02E1: solar_frame(1)[:4] + b"\x0e" + solar_frame(1)[5:]},   # type inconnu
+                     {0x02E1: solar_frame(1)[:7] + b"\x5a\x01"},        # autre clé
+                     {0x02E1: solar_frame(1)[:6]}):                    # tronquée
+            manager.update_victron(SimpleNamespace(manufacturer_data=data))
+        self.assertEqual(parser.calls, 0)
+        self.assertEqual(manager.victron_states, {})
+        self.assertEqual((device.rejected, device.key_mismatch), (3, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
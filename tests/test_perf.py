@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from connectivity import ConnectivityManager
+from perf import BUCKET_FIELDS, PerfRecorder, StageHistogram
+
+
+class TestStageHistogram(unittest.TestCase):
+    def test_fields(self):
+        histogram = StageHistogram()
+        for seconds in [0.0002] * 90 + [0.003] * 9 + [1.7]:
+            histogram.observe(seconds)
+        fields = histogram.fields()
+        self.assertEqual(fields["count"], 100)
+        self.assertEqual(fields["max_ms"], 1700.0)
+        self.assertEqual(fields["p50_ms"], 0.25)
+        self.assertEqual(fields["p90_ms"], 0.25)
+        self.assertEqual(fields["p99_ms"], 5.0)
+        self.assertEqual(fields["le_250us"], 90)
+        self.assertEqual(fields["le_2.5s"], 1)
+        self.assertNotIn("le_1ms", fields)
+
+    def test_open_bucket_reports_max(self):
+        histogram = StageHistogram()
+        histogram.observe(42.0)
+        self.assertEqual(histogram.fields()["p99_ms"], 42000.0)
+        self.assertEqual(histogram.fields()["le_inf"], 1)
+        self.assertEqual(BUCKET_FIELDS[0], "le_50us")
+
+
+class TestPerfRecorder(unittest.TestCase):
+    def test_lines(self):
+        perf = PerfRecorder()
+        perf.observe("encode", 0.0004)
+        perf.observe("ble.bthome", 0.00002)
+        lines = perf.take_lines(123, {"site_id": "lodge", "version": "224"})
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("supervisor_perf,site_id=lodge,stage=ble.bthome,version=224 "))
+        self.assertIn("count=1i", lines[0])
+        self.assertTrue(lines[0].endswith(" 123"))
+        self.assertEqual(perf.take_lines(124), [])
+
+    def test_connectivity_probes_are_timed(self):
+        async def ping(num):
+            return True
+
+        async def lte_probe():
+            return False
+
+        perf = PerfRecorder()
+        manager = ConnectivityManager(ping=ping, lte_probe=lte_probe, perf=perf)
+        asyncio.run(manager.check_once())
+        self.assertEqual(set(perf.snapshot()), {"net.ping", "net.lte_probe"})
+
+    def test_manager_callbacks_by_device_type(self):
+        try:
+            from testmulti import GlobalStateManager
+        except ImportError:
+            self.skipTest("testmulti non importable")
+        manager = GlobalStateManager("8ebf134b9339e9524eb24979c5e87505")
+        manager._dispatch["AA:BB:CC:00:00:01"] = lambda mac, device, adv: None
+        manager._stages["AA:BB:CC:00:00:01"] = "ble.victron"
+        manager.perf = PerfRecorder()
+        manager.handle_advertisement(SimpleNamespace(address="aa:bb:cc:00:00:01"), None)
+        manager.handle_advertisement(SimpleNamespace(address="aa:bb:cc:00:00:02"), None)
+        self.assertEqual(manager.perf.snapshot()["ble.victron"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import configparser
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from report_scheduler import ReportScheduler, exceeds
+
+
+class TestDeadband(unittest.TestCase):
+    def test_exceeds(self):
+        self.assertFalse(exceeds(12.50, 12.54, 0.05))
+        self.assertTrue(exceeds(12.50, 12.56, 0.05))
+        self.assertTrue(exceeds(None, 12.5, 0.05))
+        self.assertTrue(exceeds(12.5, math.nan, 0.05))
+        self.assertFalse(exceeds(None, math.nan, 0.05))
+        self.assertFalse(exceeds("Bulk", "Bulk", 0))
+        self.assertTrue(exceeds("Bulk", "Float", 0))
+
+
+class TestReportScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ReportScheduler({"main_voltage": 0.05, "panel_power": 10.0, "charging_state": 0},
+                                         min_interval=30, max_interval=600)
+
+    def send(self, values, now):
+        reason = self.scheduler.due("site_001", values, now=now)
+        if reason is not None:
+            self.scheduler.sent("site_001", values, reason, now=now)
+        return reason
+
+    def test_first_then_heartbeat_when_stable(self):
+        values = {"main_voltage": 12.6, "panel_power": 0.0, "lte_signal": -80}
+        self.assertEqual(self.send(values, 0), "first")
+        reasons = [self.send(dict(values, lte_signal=-80 - t % 7), t) for t in range(15, 1215, 15)]
+        self.assertEqual([r for r in reasons if r], ["heartbeat", "heartbeat"])
+        self.assertEqual(self.scheduler.counts["heartbeat"], 2)
+
+    def test_change_beyond_deadband(self):
+        self.send({"main_voltage": 12.6, "panel_power": 100.0}, 0)
+        self.assertIsNone(self.send({"main_voltage": 12.64, "panel_power": 109.0}, 30))
+        self.assertEqual(self.send({"main_voltage": 12.64, "panel_power": 111.0}, 45), "change:panel_power")
+        self.assertIsNone(self.send({"main_voltage": 12.64, "panel_power": 111.0}, 90))
+
+    def test_drift_measured_from_last_sent_value(self):
+        self.send({"main_voltage": 12.60}, 0)
+        for t, v in ((30, 12.63), (45, 12.64)):
+            self.assertIsNone(self.send({"main_voltage": v}, t))
+        self.assertEqual(self.send({"main_voltage": 12.66}, 60), "change:main_voltage")
+
+    def test_min_interval_delays_change(self):
+        self.send({"charging_state": "Bulk"}, 0)
+        self.assertIsNone(self.send({"charging_state": "Float"}, 15))
+        self.assertEqual(self.send({"charging_state": "Float"}, 30), "change:charging_state")
+
+    def test_streams_are_independent(self):
+        self.scheduler.sent("a", {"main_voltage": 12.0}, "first", now=0)
+        self.assertEqual(self.scheduler.due("b", {"main_voltage": 12.0}, now=1), "first")
+        self.assertIsNone(self.scheduler.due("a", {"main_voltage": 12.0}, now=31))
+
+    def test_invalid_intervals(self):
+        with self.assertRaises(ValueError):
+            ReportScheduler(min_interval=60, max_interval=30)
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_string("[report]\nmax_interval = 900\n[deadbands]\nmain_voltage = 0.1\nwater_level = 5\n")
+        scheduler = ReportScheduler.from_config(config)
+        self.assertEqual(scheduler.max_interval, 900)
+        self.assertEqual(scheduler.min_interval, 30)
+        self.assertEqual(scheduler.deadbands["main_voltage"], 0.1)
+        self.assertEqual(scheduler.deadbands["water_level"], 5.0)
+        self.assertEqual(scheduler.deadbands["panel_power"], 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from ring_buffer import MetricHistory, RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_keeps_last_capacity_values(self):
+        buffer = RingBuffer(capacity=3)
+        for i in range(5):
+            buffer.append(float(i), timestamp=i)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.values(), [2.0, 3.0, 4.0])
+        self.assertEqual(buffer.items()[0], (2.0, 2.0))
+
+    def test_interval_stats_cover_overwritten_samples(self):
+        buffer = RingBuffer(capacity=2)
+        for value in (5.0, -1.0, 3.0, 2.0):
+            buffer.append(value)
+        self.assertEqual(buffer.interval_stats(), {"min": -1.0, "max": 5.0, "mean": 2.25, "last": 2.0, "count": 4})
+        buffer.reset_interval()
+        self.assertIsNone(buffer.interval_stats())
+        self.assertEqual(buffer.values(), [3.0, 2.0])
+
+
+class TestMetricHistory(unittest.TestCase):
+    def test_take_interval_resets(self):
+        history = MetricHistory(capacity=8)
+        history.record("victron.solar_power", 100)
+        history.record("victron.solar_power", 300)
+        history.record("victron.charge_state", "BULK")
+        history.record("sensor.temperature", None)
+        stats = history.take_interval()
+        self.assertEqual(list(stats), ["victron.solar_power"])
+        self.assertEqual(stats["victron.solar_power"]["mean"], 200.0)
+        self.assertEqual(history.take_interval(), {})
+
+    def test_take_interval_subset(self):
+        history = MetricHistory(capacity=8)
+        history.record("a.solar_power", 100)
+        history.record("b.solar_power", 200)
+        stats = history.take_interval(["a.solar_power", "missing"])
+        self.assertEqual(list(stats), ["a.solar_power"])
+        self.assertEqual(list(history.take_interval()), ["b.solar_power"])
+
+
+if __name__ == "__main__":
+    unittest.main()
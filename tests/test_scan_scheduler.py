@@ -0,0 +1,257 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from bt_recovery import BluetoothRecovery
+from scan_scheduler import MODE_ACTIVE, MODE_PASSIVE, ScanScheduler, or_patterns, scanner_kwargs
+
+try:
+    import bleak  # noqa: F401
+    HAS_BLEAK = True
+except ImportError:
+    HAS_BLEAK = False
+
+
+class FakeScanner:
+    def __init__(self, mode, fail_passive=False):
+        self.mode = mode
+        self.fail_passive = fail_passive
+        self.running = False
+
+    async def start(self):
+        if self.fail_passive and self.mode == MODE_PASSIVE:
+            raise RuntimeError("passive scanning needs or_patterns")
+        self.running = True
+
+    async def stop(self):
+        self.running = False
+
+
+class FakeFactory:
+    def __init__(self, fail_passive=False):
+        self.fail_passive = fail_passive
+        self.created = []
+
+    def __call__(self, mode):
+        scanner = FakeScanner(mode, self.fail_passive)
+        self.created.append(scanner)
+        return scanner
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class WindowTests(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ScanScheduler(FakeFactory(), period=120, window=30, lead=2)
+
+    def test_window_with_lead(self):
+        self.assertTrue(self.scheduler.in_window(0))
+        self.assertTrue(self.scheduler.in_window(29.9))
+        self.assertFalse(self.scheduler.in_window(30))
+        self.assertFalse(self.scheduler.in_window(117.9))
+        self.assertTrue(self.scheduler.in_window(118))
+        self.assertTrue(self.scheduler.in_window(240 + 10))
+
+    def test_until_change(self):
+        self.assertEqual(self.scheduler.until_change(25), 5)
+        self.assertEqual(self.scheduler.until_change(110), 8)
+        self.assertEqual(self.scheduler.until_change(40), 10)   # plafonné à MAX_SLEEP
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            ScanScheduler(FakeFactory(), period=30, window=60)
+
+
+class ApplyTests(unittest.TestCase):
+    def test_starts_and_stops_with_window(self):
+        factory = FakeFactory()
+        scheduler = ScanScheduler(factory, period=120, window=30)
+
+        async def scenario():
+            await scheduler.apply(5)
+            self.assertTrue(scheduler.scanning)
+            await scheduler.apply(20)
+            self.assertEqual(len(factory.created), 1)
+            await scheduler.apply(60)
+            self.assertTrue(scheduler.paused)
+            self.assertFalse(factory.created[0].running)
+            await scheduler.apply(125)
+        run(scenario())
+        self.assertEqual(len(factory.created), 2)      # nouveau scanner à chaque fenêtre
+        self.assertEqual(scheduler.starts, 2)
+
+    def test_always_on_keeps_scanning(self):
+        sensors = []
+        scheduler = ScanScheduler(FakeFactory(), always_on=lambda: bool(sensors))
+
+        async def scenario():
+            sensors.append("A4:C1:38:00:00:01")
+            await scheduler.apply(60)
+            self.assertTrue(scheduler.scanning)
+            sensors.clear()
+            await scheduler.apply(61)
+            self.assertFalse(scheduler.scanning)
+        run(scenario())
+
+    def test_passive_falls_back_to_active(self):
+        factory = FakeFactory(fail_passive=True)
+        scheduler = ScanScheduler(factory)
+        run(scheduler.apply(0))
+        self.assertTrue(scheduler.scanning)
+        self.assertEqual(scheduler.scanning_mode, MODE_ACTIVE)
+        self.assertEqual([s.mode for s in factory.created], [MODE_PASSIVE, MODE_ACTIVE])
+
+    def test_active_failure_raises(self):
+        class Broken(FakeScanner):
+            async def start(self):
+                raise RuntimeError("adapter down")
+        scheduler = ScanScheduler(Broken, scanning_mode=MODE_ACTIVE)
+        with self.assertRaises(RuntimeError):
+            run(scheduler.apply(0))
+        self.assertFalse(scheduler.scanning)
+
+    def test_restart_respects_window(self):
+        now = [60]
+        factory = FakeFactory()
+        scheduler = ScanScheduler(factory, clock=lambda: now[0])
+        run(scheduler.restart())
+        self.assertFalse(scheduler.scanning)
+        now[0] = 10
+        run(scheduler.restart())
+        self.assertTrue(scheduler.scanning)
+
+    def test_restart_and_apply_serialized(self):
+        class SlowScanner(FakeScanner):
+            async def start(self):
+                await asyncio.sleep(0)
+                self.running = True
+
+            async def stop(self):
+                await asyncio.sleep(0)
+                self.running = False
+        created = []
+
+        def factory(mode):
+            created.append(SlowScanner(mode))
+            return created[-1]
+        scheduler = ScanScheduler(factory, clock=lambda: 5)
+
+        async def scenario():
+            await scheduler.start_scanner()
+            await asyncio.gather(scheduler.restart(), scheduler.apply(5), scheduler.restart(), scheduler.apply(5))
+        run(scenario())
+        # Aucun scanner orphelin : seul celui référencé tourne encore
+        self.assertEqual([s for s in created if s.running], [scheduler.scanner])
+        self.assertTrue(scheduler.scanning)
+
+    def test_stats(self):
+        ads = [0]
+        scheduler = ScanScheduler(FakeFactory(), advertisements=lambda: ads[0])
+
+        async def scenario():
+            await scheduler.apply(0)
+            ads[0] = 50
+            await scheduler.apply(60)
+        run(scenario())
+        stats = scheduler.stats()
+        self.assertEqual(stats["mode"], MODE_PASSIVE)
+        self.assertEqual(stats["starts"], 1)
+        self.assertEqual(stats["advertisements"], 50)
+        self.assertLessEqual(stats["duty_cycle"], 1.0)
+        self.assertGreaterEqual(stats["advertisements_saved"], 0)
+
+
+@unittest.skipUnless(HAS_BLEAK, "bleak non installé")
+class PatternTests(unittest.TestCase):
+    def test_patterns(self):
+        patterns = or_patterns(("victron", "bthome"))
+        self.assertEqual([(p.start_position, int(p.ad_data_type), p.content_of_pattern) for p in patterns],
+                         [(0, 0xFF, b"\xe1\x02"), (0, 0x16, b"\xd2\xfc")])
+
+    def test_kwargs_only_in_passive_mode(self):
+        self.assertEqual(scanner_kwargs(MODE_ACTIVE), {})
+        self.assertEqual(scanner_kwargs(MODE_PASSIVE, ()), {})
+        patterns = scanner_kwargs(MODE_PASSIVE, ("bthome",))["bluez"]["or_patterns"]
+        self.assertEqual(len(patterns), 1)
+        self.assertEqual(patterns[0].content_of_pattern, bytes.fromhex("d2fc"))
+
+
+class RecoveryPausedTests(unittest.TestCase):
+    def silence_at(self, factory, until=3600):
+        """Instant (horloge simulée) de la première détection de silence, scanner et récupération ensemble"""
+        now = [0.0]
+        scheduler = ScanScheduler(factory, period=120, window=30, clock=lambda: now[0], monotonic=lambda: now[0])
+        recovery = BluetoothRecovery(activity=lambda: 0, listening=scheduler.listening_time)
+
+        async def scenario():
+            while now[0] < until:
+                try:
+                    await scheduler.apply()
+                except RuntimeError:
+                    pass
+                if recovery.symptom(now[0]) == "silence":
+                    return now[0]
+                now[0] += 10
+        return run(scenario())
+
+    def test_silence_detected_under_duty_cycle(self):
+        # 30 s d'écoute toutes les 120 s (pas de 10 s) : plus de 180 s d'écoute sans annonce à la 7e fenêtre
+        self.assertEqual(self.silence_at(FakeFactory()), 730)
+
+    def test_failed_start_is_not_a_pause(self):
+        class Broken(FakeScanner):
+            async def start(self):
+                raise RuntimeError("adapter down")
+        # Démarrage impossible pendant les fenêtres : compté comme écoute silencieuse, pas comme pause
+        self.assertEqual(self.silence_at(Broken), 730)
+        scheduler = ScanScheduler(Broken)
+        with self.assertRaises(RuntimeError):
+            run(scheduler.apply(0))
+        self.assertFalse(scheduler.paused)
+
+
+    def test_start_failures_escalate_recovery(self):
+        class Dead(FakeScanner):
+            async def start(self):
+                raise OSError("hci0: No such device")
+        commands = []
+
+        async def record(cmd):
+            commands.append(cmd)
+            return True
+
+        async def no_sleep(seconds):
+            pass
+        scheduler = ScanScheduler(Dead, scanning_mode=MODE_ACTIVE)
+        recovery = BluetoothRecovery(scheduler.restart, run=record, sleep=no_sleep)
+        scheduler.on_error = recovery.report_error
+
+        async def scenario():
+            for _ in range(recovery.error_threshold):
+                with self.assertRaises(OSError):
+                    await scheduler.apply(0)
+            self.assertEqual(recovery.symptom(), "errors")
+            with self.assertLogs(level="WARNING"):
+                await recovery.check_once()
+        run(scenario())
+        self.assertEqual(recovery.level, 1)
+        self.assertEqual(recovery.actions["restart_scanner"], 1)
+
+    def test_other_errors_not_reported(self):
+        class Broken(FakeScanner):
+            async def start(self):
+                raise RuntimeError("bug")
+        errors = []
+        scheduler = ScanScheduler(Broken, scanning_mode=MODE_ACTIVE, on_error=errors.append)
+        with self.assertRaises(RuntimeError):
+            run(scheduler.apply(0))
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from site_status import SiteStatus
+
+try:
+    from influxdb_client import Point
+    INFLUX_AVAILABLE = True
+except ImportError:
+    INFLUX_AVAILABLE = False
+
+
+def official_line(status: SiteStatus, timestamp_ns: int) -> str:
+    """Même règles que l'ancien to_point(), via le client officiel"""
+    point = Point("site_metrics").tag("site_id", status.site_id)
+    for field, value in status.status.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            point = point.field(field, value)
+        elif not (value == 0.0 and field in ("main_voltage", "aux_voltage", "bt_temperature", "bt_humidity")):
+            point = point.field(field, float(value))
+    return point.time(timestamp_ns).to_line_protocol()
+
+
+class TestSiteStatus(unittest.TestCase):
+    def test_update_and_reset(self):
+        status = SiteStatus("site_001")
+        status.update(main_voltage="12.5", charging_state=3, bt_temperature=None, lte_signal=True)
+        self.assertEqual(status.get("main_voltage"), 12.5)
+        self.assertEqual(status.get("charging_state"), "3")
+        self.assertIsNone(status.get("bt_temperature"))
+        self.assertEqual(status.get("lte_signal"), 1.0)
+        status.reset()
+        self.assertIsNone(status.get("main_voltage"))
+        self.assertEqual(status.get("charging_state"), "Unknown")
+
+    def test_unmeasured_panel_voltage_omitted(self):
+        status = SiteStatus("s")
+        status.update(panel_power=120.0)
+        line = status.to_line_protocol(1)
+        self.assertIn("panel_power=120", line)
+        self.assertNotIn("panel_voltage", line)
+
+    def test_unknown_field(self):
+        with self.assertRaises(KeyError):
+            SiteStatus("s").update(foo=1)
+
+    def test_encode_into_appends(self):
+        status = SiteStatus("s")
+        buf = bytearray(b"previous\n")
+        self.assertTrue(status.encode_into(buf, 42))
+        self.assertTrue(buf.startswith(b"previous\nsite_metrics,site_id=s "))
+        self.assertTrue(buf.endswith(b" 42\n"))
+
+
+@unittest.skipUnless(INFLUX_AVAILABLE, "influxdb_client not installed")
+class TestMatchesOfficialClient(unittest.TestCase):
+    SITE_IDS = ["site_001", "site 2", "a,b=c", "back\\slash\\", "tab\tnew\nline"]
+    TEXTS = ["", "Bulk", 'quote"d', "back\\slash", "a,b=c d", "éclairé"]
+
+    def test_random_statuses(self):
+        rng = random.Random(1234)
+        for site_id in self.SITE_IDS:
+            status = SiteStatus(site_id)
+            for _ in range(200):
+                status.reset()
+                status.update(
+                    main_voltage=rng.choice([0.0, None, rng.uniform(10, 15)]),
+                    aux_voltage=rng.choice([0.0, 12.0, rng.uniform(10, 15)]),
+                    panel_power=rng.choice([0, 1e-7, 123456789.123, -3.5, float("nan")]),
+                    bt_temperature=rng.choice([None, 0.0, -12.3]),
+                    charging_state=rng.choice(self.TEXTS),
+                    bt_light_txt=rng.choice(self.TEXTS),
+                    lte_signal=rng.choice([True, False]),
+                )
+                ts = rng.randrange(1 << 62)
+                self.assertEqual(status.to_line_protocol(ts), official_line(status, ts))
+
+    def test_extra_tags(self):
+        status = SiteStatus("site_001", tags={"bank": "bank 2", "zone": None})
+        status.update(main_voltage=12.7, charging_state="Float")
+        self.assertEqual(status.tags, {"bank": "bank 2"})
+        self.assertTrue(status.to_line_protocol(5).startswith("site_metrics,bank=bank\\ 2,site_id=site_001 "))
+        self.assertEqual(status.to_line_protocol(5), status.to_point().time(5).to_line_protocol())
+
+
+if __name__ == "__main__":
+    unittest.main()
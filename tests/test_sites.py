@@ -0,0 +1,117 @@
+import configparser
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from ring_buffer import MetricHistory
+from sites import Site, SiteConfig, load_site_configs, normalize_mac, parse_devices
+
+CONFIG = """
+[influx]
+server = http://localhost:8086
+
+[site:lodge]
+bank = house
+victron_mac = fc-40-bc-fc-a8-d4
+victron_key = 8ebf134b9339e9524eb24979c5e87505
+bthome_sensor = c0:2c:ed:a8:ee:6e
+ads_address = 0x48
+aux_chemistry = lifepo4
+main_divider = 4.0
+
+[site:pump]
+bank = well
+victron_mac = FC:40:BC:00:00:01
+ads_address = 0x49
+"""
+
+
+def parse(text):
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    return config
+
+
+class TestSiteConfigs(unittest.TestCase):
+    def test_sections_in_file_order(self):
+        sites = load_site_configs(parse(CONFIG))
+        self.assertEqual([s.site_id for s in sites], ["lodge", "pump"])
+        lodge, pump = sites
+        self.assertEqual(lodge.bank, "house")
+        self.assertEqual(lodge.victron_mac, "FC:40:BC:FC:A8:D4")
+        self.assertEqual(lodge.bthome_sensor, "C0:2C:ED:A8:EE:6E")
+        self.assertEqual(lodge.ads_address, 0x48)
+        self.assertEqual(lodge.aux_chemistry, "lifepo4")
+        self.assertEqual(lodge.main_chemistry, "flooded")
+        self.assertEqual(lodge.main_divider, 4.0)
+        self.assertEqual(pump.aux_divider, 3.965)
+        self.assertIsNone(pump.bthome_sensor)
+
+    def test_no_site_section(self):
+        self.assertEqual(load_site_configs(parse("[influx]\nserver = x\n")), [])
+
+    def test_shared_hardware_rejected(self):
+        text = CONFIG.replace("ads_address = 0x49", "ads_address = 72")
+        with self.assertRaises(ValueError):
+            load_site_configs(parse(text))
+        text = CONFIG.replace("FC:40:BC:00:00:01", "FC:40:BC:FC:A8:D4")
+        with self.assertRaises(ValueError):
+            load_site_configs(parse(text))
+
+    def test_extra_victron_devices(self):
+        text = CONFIG.replace("bthome_sensor = c0", "victron_devices = d8-3b-11-90-6e-02=11111111111111111111111111111111, f1:2a:7c:33:10:4b\nbthome_sensor = c0")
+        lodge, pump = load_site_configs(parse(text))
+        self.assertEqual(lodge.victron_macs, ["FC:40:BC:FC:A8:D4", "D8:3B:11:90:6E:02", "F1:2A:7C:33:10:4B"])
+        self.assertEqual(lodge.victron_key_of("D8:3B:11:90:6E:02"), "11" * 16)
+        self.assertEqual(lodge.victron_key_of("F1:2A:7C:33:10:4B"), "8ebf134b9339e9524eb24979c5e87505")
+        self.assertEqual(pump.victron_macs, ["FC:40:BC:00:00:01"])
+        with self.assertRaises(ValueError):
+            load_site_configs(parse(text.replace("f1:2a:7c:33:10:4b", "fc:40:bc:00:00:01")))
+
+    def test_unknown_chemistry(self):
+        with self.assertRaises(KeyError):
+            load_site_configs(parse(CONFIG.replace("lifepo4", "nicad")))
+
+    def test_normalize_mac(self):
+        self.assertEqual(normalize_mac(" aa-bb-cc-00-00-01 "), "AA:BB:CC:00:00:01")
+
+
+class TestSite(unittest.TestCase):
+    def test_status_tagged_by_site_and_bank(self):
+        site = Site(SiteConfig("lodge", bank="house"))
+        site.status.update(main_voltage=12.5)
+        self.assertTrue(site.status.to_line_protocol(1).startswith("site_metrics,bank=house,site_id=lodge "))
+        self.assertIsNone(site.sampler)
+
+    def test_ads_board_per_site(self):
+        site = Site(SiteConfig("pump", ads_address=0x49))
+        self.assertEqual(site.sampler.address, 0x49)
+
+    def test_history_fields_follow_devices(self):
+        site = Site(SiteConfig("lodge", victron_mac="fc:40:bc:fc:a8:d4", bthome_sensor="c0:2c:ed:a8:ee:6e"))
+        fields = site.history_fields()
+        self.assertEqual(fields["FC:40:BC:FC:A8:D4.solar_power"], "panel_power")
+        self.assertEqual(fields["C0:2C:ED:A8:EE:6E.temperature"], "bt_temperature")
+        self.assertEqual(Site(SiteConfig("bare")).history_fields(), {})
+        self.assertIsNone(site.panel_power_series)
+
+    def test_panel_power_aggregates_all_chargers(self):
+        config = SiteConfig("lodge", victron_mac="fc:40:bc:fc:a8:d4", victron_devices=parse_devices("d8:3b:11:90:6e:02"))
+        site = Site(config)
+        fields = site.history_fields()
+        self.assertEqual(fields["lodge.panel_power"], "panel_power")
+        self.assertNotIn("FC:40:BC:FC:A8:D4.solar_power", fields)
+        # Comme read_loop : la somme des deux chargeurs est historisée à chaque échantillonnage
+        history = MetricHistory()
+        for primary, extra in ((100.0, 250.0), (180.0, 90.0), (120.0, 300.0)):
+            history.record(f"{config.victron_mac}.solar_power", primary)
+            history.record(site.panel_power_series, primary + extra)
+        stats = history.take_interval(fields)["lodge.panel_power"]
+        self.assertEqual(stats["max"], 420.0)
+        self.assertEqual(stats["min"], 270.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
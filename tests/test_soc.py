@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from soc import (
+    NUMPY_AVAILABLE, ChemistryProfile, RestDetector, estimate_soc,
+    estimate_soc_batch, get_profile, rest_mask,
+)
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+
+def reference_soc(table, coeff, voltage, temperature_c):
+    """Balayage linéaire d'origine (tables décroissantes)"""
+    corrected = voltage + (25 - temperature_c) * coeff
+    if corrected >= table[0][1]:
+        return 100.0
+    if corrected <= table[-1][1]:
+        return 0.0
+    for (soc1, v1), (soc2, v2) in zip(table, table[1:]):
+        if v1 >= corrected >= v2:
+            return round(soc1 + (soc2 - soc1) * (v1 - corrected) / (v1 - v2), 1)
+
+
+LEAD_TABLE = [(100, 12.70), (90, 12.60), (80, 12.50), (70, 12.40), (60, 12.30), (50, 12.20),
+              (40, 12.10), (30, 12.00), (20, 11.90), (10, 11.80), (0, 11.70)]
+
+
+class TestScalarSOC(unittest.TestCase):
+    def test_matches_reference_scan(self):
+        for mv in range(11500, 13000, 7):
+            for temp in (-10, 0, 10, 25, 40):
+                expected = reference_soc(LEAD_TABLE, 0.018, mv / 1000, temp)
+                self.assertAlmostEqual(estimate_soc(mv / 1000, temp, "flooded"), expected, delta=0.1)
+
+    def test_bounds(self):
+        self.assertEqual(estimate_soc(14.0, 25, "agm"), 100.0)
+        self.assertEqual(estimate_soc(10.0, 25, "agm"), 0.0)
+
+    def test_profiles_registered(self):
+        for name in ("flooded", "agm", "gel", "lifepo4"):
+            self.assertEqual(get_profile(name).name, name)
+        with self.assertRaises(KeyError):
+            get_profile("nimh")
+
+    def test_rejects_non_monotonic_table(self):
+        with self.assertRaises(ValueError):
+            ChemistryProfile("bad", [(100, 12.0), (50, 12.0), (0, 11.0)], 0.0)
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+class TestBatchSOC(unittest.TestCase):
+    def test_batch_matches_scalar(self):
+        voltages = np.linspace(11.5, 13.8, 500)
+        temps = np.linspace(-5, 35, 500)
+        for chemistry in ("flooded", "agm", "gel", "lifepo4"):
+            batch = estimate_soc_batch(voltages, temps, chemistry)
+            scalar = [estimate_soc(v, t, chemistry) for v, t in zip(voltages, temps)]
+            np.testing.assert_allclose(batch, scalar, atol=0.1)
+
+    def test_rest_mask(self):
+        t = np.arange(10) * 600.0
+        currents = [0, 0, 0, 2.0, 0, 0, 0, 0, 0.1, 5.0]
+        mask = rest_mask(currents, t, threshold=0.3, min_duration=1200)
+        self.assertEqual(mask.tolist(), [False, False, True, False, False, False, True, True, True, False])
+
+    def test_non_resting_samples_are_nan(self):
+        socs = estimate_soc_batch([12.7, 12.7], 25, "flooded", resting=[True, False])
+        self.assertEqual(socs[0], 100.0)
+        self.assertTrue(np.isnan(socs[1]))
+
+
+class TestRestDetector(unittest.TestCase):
+    def test_requires_quiet_duration(self):
+        detector = RestDetector(threshold=0.3, min_duration=60)
+        self.assertFalse(detector.update(0.1, now=0))
+        self.assertFalse(detector.update(0.0, now=30))
+        self.assertTrue(detector.update(0.0, now=61))
+        self.assertFalse(detector.update(3.0, now=62))
+        self.assertFalse(detector.update(0.0, now=100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from spool import PointSpool
+
+
+class TestPointSpool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "spool.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batches_oldest_first_and_ack(self):
+        spool = PointSpool(self.path)
+        spool.append([f"m v={i} {i}" for i in range(10)])
+        last_id, lines = spool.read_batch(4)
+        self.assertEqual(lines, [f"m v={i} {i}" for i in range(4)])
+        spool.ack(last_id)
+        self.assertEqual(len(spool), 6)
+        _, lines = spool.read_batch(100)
+        self.assertEqual(lines[0], "m v=4 4")
+        spool.close()
+
+    def test_batch_byte_cap_keeps_at_least_one(self):
+        spool = PointSpool(self.path)
+        spool.append(["a" * 100, "b" * 100, "c" * 100])
+        _, lines = spool.read_batch(10, max_bytes=250)
+        self.assertEqual(len(lines), 2)
+        _, lines = spool.read_batch(10, max_bytes=10)
+        self.assertEqual(lines, ["a" * 100])
+        spool.close()
+
+    def test_row_cap_evicts_oldest(self):
+        spool = PointSpool(self.path, max_rows=5)
+        spool.append([str(i) for i in range(8)])
+        self.assertEqual(len(spool), 5)
+        self.assertEqual(spool.evicted, 3)
+        _, lines = spool.read_batch(10)
+        self.assertEqual(lines, ["3", "4", "5", "6", "7"])
+        spool.close()
+
+    def test_byte_cap_evicts_oldest(self):
+        spool = PointSpool(self.path, max_bytes=30)
+        spool.append(["x" * 10 for _ in range(5)])
+        self.assertLessEqual(spool.size_bytes, 30)
+        self.assertEqual(len(spool), 3)
+        spool.close()
+
+    def test_survives_reopen(self):
+        spool = PointSpool(self.path)
+        spool.append(["m v=1 1", "m v=2 2"])
+        spool.close()
+        spool = PointSpool(self.path)
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.size_bytes, 14)
+        self.assertEqual(spool.read_batch(10)[1], ["m v=1 1", "m v=2 2"])
+        spool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
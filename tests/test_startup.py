@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+SUPERVISOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor")
+sys.path.insert(0, SUPERVISOR_DIR)
+
+from startup import StartupTimer, process_start
+
+
+class TestStartupTimer(unittest.TestCase):
+    def test_phases_and_events(self):
+        timer = StartupTimer(start=time.monotonic())
+        with timer.phase("config"):
+            time.sleep(0.01)
+        timer.event("first_decoded_advertisement")
+        timer.event("first_decoded_advertisement", at=time.monotonic() + 100)
+        data = timer.as_dict()
+        self.assertEqual(data["phases"][0]["name"], "config")
+        self.assertGreaterEqual(data["phases"][0]["duration_s"], 0.01)
+        self.assertLess(data["events"]["first_decoded_advertisement"], 1)
+        report = timer.report()
+        self.assertIn("config", report)
+        self.assertIn("@ first_decoded_advertisement", report)
+
+    def test_process_start_is_in_the_past(self):
+        self.assertLessEqual(process_start(), time.monotonic())
+
+
+class TestLazyImports(unittest.TestCase):
+    HEAVY = ("bleak", "bthome_ble", "home_assistant_bluetooth", "victron_ble", "numpy", "influxdb_client", "board")
+
+    def test_core_modules_import_without_heavy_dependencies(self):
+        code = (
+            "import sys; import testmulti, soc, ads_sampler, sites, site_status, uploader, spool; "
+            f"print(','.join(m for m in {self.HEAVY!r} if m in sys.modules))"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=SUPERVISOR_DIR,
+                             capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
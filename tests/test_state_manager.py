@@ -0,0 +1,129 @@
+import os
+import struct
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+try:
+    from testmulti import GlobalStateManager
+    from victron_registry import VictronDevice
+    from bleak.backends.device import BLEDevice
+    from bleak.backends.scanner import AdvertisementData
+    BLE_STACK_AVAILABLE = True
+except ImportError:
+    BLE_STACK_AVAILABLE = False
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESCCM
+    CRYPTO_AVAILABLE = True
+except ImportError:
+    CRYPTO_AVAILABLE = False
+
+BTHOME_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+VICTRON_MAC = "FC:40:BC:FC:A8:D4"
+
+
+def bthome_adv(packet_id, temperature):
+    payload = bytes((0x40, 0x00, packet_id, 0x01, 90, 0x2E, 55)) + b"\x45" + struct.pack("<h", temperature)
+    return AdvertisementData(None, {}, {BTHOME_UUID: payload}, [BTHOME_UUID], None, -70, ())
+
+
+@unittest.skipUnless(BLE_STACK_AVAILABLE, "bleak non installé")
+class TestDeviceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.macs = [f"AA:BB:CC:00:00:{i:02X}" for i in range(100)]
+        self.manager = GlobalStateManager("00" * 16, VICTRON_MAC.lower(), [m.lower() for m in self.macs])
+
+    def test_dispatch_by_address(self):
+        calls = []
+        self.manager.update_victron = lambda adv, mac=None: calls.append(mac)
+        self.manager.handle_advertisement(SimpleNamespace(address=VICTRON_MAC.lower()), bthome_adv(1, 200))
+        self.manager.handle_advertisement(SimpleNamespace(address="11:22:33:44:55:66"), bthome_adv(1, 200))
+        self.assertEqual(calls, [VICTRON_MAC])
+        self.assertEqual(self.manager.bthome_states, {})
+
+    def test_every_sensor_has_its_own_parser_and_state(self):
+        for i, mac in enumerate(self.macs):
+            self.manager.handle_advertisement(BLEDevice(mac, None, None), bthome_adv(7, 150 + i))
+        self.assertEqual(len(self.manager.bthome_parsers), 100)
+        self.assertEqual(len({id(p) for p in self.manager.bthome_parsers.values()}), 100)
+        self.assertEqual(set(self.manager.bthome_states), set(self.macs))
+        self.assertEqual(self.manager.bthome_states[self.macs[42]]["temperature"], 19.2)
+        self.assertEqual(sorted(self.manager.registered_bthome()), sorted(self.macs))
+        self.assertEqual(set(self.manager.bthome_last_seen), set(self.macs))
+
+    def test_rssi_not_frozen_by_payload_cache(self):
+        mac = self.macs[0]
+        for rssi in (-70, -55):
+            adv = AdvertisementData(None, {}, {BTHOME_UUID: bthome_adv(3, 200).service_data[BTHOME_UUID]},
+                                    [BTHOME_UUID], None, rssi, ())
+            self.manager.handle_advertisement(BLEDevice(mac, None, None), adv)
+        self.assertEqual(self.manager.payload_cache.hits, 1)
+        self.assertEqual(self.manager.history[f"{mac}.signal_strength"].values(), [-70, -55])
+
+    def test_victron_state_per_device(self):
+        self.manager.duree_fenetre_seconds = self.manager.intervalle_ecoute_seconds  # toujours dans la fenêtre
+        other = "FC:40:BC:00:00:01"
+        self.manager.register_victron(other.lower(), "11" * 16)
+        self.manager.register_victron(other)      # sans clé : la clé propre est conservée
+        self.assertEqual(self.manager.victron_devices[other].key, "11" * 16)
+        self.assertEqual(self.manager.victron_devices[VICTRON_MAC].key, "00" * 16)  # clé par défaut
+
+        def decode(device, raw):
+            return {
+                "battery_voltage": raw[-1] / 10, "battery_charging_current": 0.0, "solar_power": 0,
+                "yield_today": 0, "charge_state": "OFF", "record_type": "solar_charger",
+                "key": device.key,
+            }
+        with mock.patch.object(VictronDevice, "decode", decode):
+            for mac, value, key_check in ((VICTRON_MAC, 125, 0x00), (other, 131, 0x11)):
+                frame = bytes([0x10, 0x02, 0x60, 0xA0, 0x01, 0x00, 0x00, key_check, value])
+                adv = AdvertisementData(None, {0x02E1: frame}, {}, [], None, -70, ())
+                self.manager.handle_advertisement(SimpleNamespace(address=mac), adv)
+        self.assertEqual(self.manager.victron_states[other]["battery_voltage"], 13.1)
+        self.assertEqual(self.manager.victron_states[other]["key"], "11" * 16)
+        self.assertEqual(self.manager.victron_state["battery_voltage"], 12.5)
+        self.assertIn(f"{other}.battery_voltage", self.manager.history)
+
+
+    def test_invalid_bindkey_skips_sensor(self):
+        mac = "54:48:E6:8F:80:A5"
+        with self.assertLogs(level="ERROR"):
+            self.assertFalse(self.manager.register_bthome(mac, "zz" * 16))
+        with self.assertLogs(level="ERROR"):
+            self.assertFalse(self.manager.register_bthome(mac, "abcd"))
+        self.assertNotIn(mac, self.manager.bthome_parsers)
+        self.assertNotIn(mac, self.manager.registered_bthome())
+
+    @unittest.skipUnless(CRYPTO_AVAILABLE, "cryptography non installé")
+    def test_encrypted_sensor(self):
+        mac = "54:48:E6:8F:80:A5"
+        key = "231d39c1d7cc1ab1aee224cd096db932"
+        self.manager.register_bthome(mac.lower(), key)
+        self.manager.register_bthome(mac)      # sans clé : la bindkey est conservée
+        self.assertTrue(self.manager.bthome_parsers[mac].encrypted)
+        device = BLEDevice(mac, None, None)
+
+        def encrypted_adv(counter, temperature):
+            nonce = bytes.fromhex(mac.replace(":", "")) + b"\xd2\xfc\x41" + counter.to_bytes(4, "little")
+            objects = b"\x01\x5a\x45" + struct.pack("<h", temperature)
+            sealed = AESCCM(bytes.fromhex(key), tag_length=4).encrypt(nonce, objects, None)
+            payload = b"\x41" + sealed[:-4] + counter.to_bytes(4, "little") + sealed[-4:]
+            return AdvertisementData(None, {}, {BTHOME_UUID: payload}, [BTHOME_UUID], None, -70, ())
+
+        first = encrypted_adv(500, 215)
+        self.manager.handle_advertisement(device, first)
+        self.assertEqual(self.manager.bthome_states[mac]["temperature"], 21.5)
+        self.manager.handle_advertisement(device, encrypted_adv(501, 220))
+        self.manager.handle_advertisement(device, first)       # rejeu : ignoré, même via le cache
+        self.assertEqual(self.manager.bthome_states[mac]["temperature"], 22.0)
+        self.assertEqual(self.manager.bthome_parsers[mac].replays, 1)
+        self.manager.handle_advertisement(device, bthome_adv(9, 100))   # en clair : refusée
+        self.assertEqual(self.manager.bthome_states[mac]["temperature"], 22.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
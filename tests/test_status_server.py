@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from sites import Site, SiteConfig
+from status_server import StatusServer
+
+VICTRON_MAC = "FC:40:BC:FC:A8:D4"
+SHELLY_MAC = "C0:2C:ED:A8:EE:6E"
+
+
+def make_server(**kwargs):
+    site = Site(SiteConfig("lodge", bank="house"))
+    site.status.update(main_voltage=12.61, charging_state='Bulk "1"', panel_power=215.0)
+    site.last_sample = 990.0
+    manager = SimpleNamespace(
+        victron_states={VICTRON_MAC: {"battery_voltage": 13.2, "solar_power": 215, "charge_state": "BULK"}},
+        victron_last_seen={VICTRON_MAC: 995.0},
+        bthome_states={SHELLY_MAC: {"name": "SBHT-003C", "temperature": 21.5, "humidity": None}},
+        bthome_last_seen={SHELLY_MAC: 970.0},
+    )
+    spool = type("Spool", (), {"size_bytes": 1200, "evicted": 0, "__len__": lambda self: 12})()
+    return StatusServer([site], manager, spool=spool, host="127.0.0.1", port=0, **kwargs)
+
+
+async def fetch(port, request):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return head.decode(), body
+
+
+class TestStatusContent(unittest.TestCase):
+    def test_status_json(self):
+        data = make_server().status(now=1000.0)
+        site = data["sites"]["lodge"]
+        self.assertEqual(site["status"]["main_voltage"], 12.61)
+        self.assertIsNone(site["status"]["aux_voltage"])
+        self.assertEqual(site["sample_age_s"], 10.0)
+        self.assertEqual(data["devices"]["victron"][VICTRON_MAC]["age_s"], 5.0)
+        self.assertEqual(data["devices"]["bthome"][SHELLY_MAC]["age_s"], 30.0)
+        self.assertEqual(data["spool"]["points"], 12)
+        self.assertNotIn("connectivity", data)
+        json.dumps(data)
+
+    def test_prometheus_text(self):
+        text = make_server().metrics(now=1000.0)
+        lines = text.splitlines()
+        self.assertIn('kepler_site_main_voltage{site_id="lodge",bank="house"} 12.61', lines)
+        self.assertIn('kepler_victron_solar_power{mac="FC:40:BC:FC:A8:D4"} 215.0', lines)
+        self.assertIn('kepler_device_last_seen_age_seconds{kind="bthome",mac="C0:2C:ED:A8:EE:6E",name="SBHT-003C"} 30.0',
+                      lines)
+        self.assertIn("kepler_spool_points 12.0", lines)
+        self.assertTrue(any(l.startswith("kepler_site_info{") and 'charging_state="Bulk \\"1\\""' in l for l in lines))
+        self.assertFalse(any("aux_voltage" in l or "humidity" in l for l in lines))
+
+
+class TestStatusHTTP(unittest.TestCase):
+    def run_requests(self, *requests):
+        async def scenario():
+            server = make_server()
+            await server.start()
+            try:
+                return [await fetch(server.port, r) for r in requests]
+            finally:
+                await server.stop()
+        return asyncio.run(scenario())
+
+    def test_routes(self):
+        status, metrics, missing, post = self.run_requests(
+            b"GET /status HTTP/1.1\r\nHost: x\r\n\r\n",
+            b"GET /metrics HTTP/1.0\r\n\r\n",
+            b"GET /nope HTTP/1.1\r\n\r\n",
+            b"POST /status HTTP/1.1\r\n\r\n",
+        )
+        self.assertTrue(status[0].startswith("HTTP/1.1 200"))
+        self.assertIn("application/json", status[0])
+        self.assertEqual(json.loads(status[1])["sites"]["lodge"]["status"]["panel_power"], 215.0)
+        self.assertIn(b"kepler_site_panel_power", metrics[1])
+        self.assertTrue(missing[0].startswith("HTTP/1.1 404"))
+        self.assertTrue(post[0].startswith("HTTP/1.1 405"))
+
+    def test_head_and_garbage(self):
+        head, garbage = self.run_requests(b"HEAD /metrics HTTP/1.1\r\n\r\n", b"hello\r\n\r\n")
+        self.assertTrue(head[0].startswith("HTTP/1.1 200"))
+        self.assertEqual(head[1], b"")
+        self.assertTrue(garbage[0].startswith("HTTP/1.1 400"))
+
+    def test_connection_counted_until_closed(self):
+        server = make_server()
+
+        class SlowWriter:
+            def __init__(self):
+                self.released = asyncio.Event()
+                self.closed = False
+
+            def write(self, data):
+                self.data = data
+
+            async def drain(self):
+                await self.released.wait()
+
+            def close(self):
+                self.closed = True
+
+        async def scenario():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"GET /status HTTP/1.1\r\n\r\n")
+            reader.feed_eof()
+            writer = SlowWriter()
+            task = asyncio.create_task(server._handle(reader, writer))
+            for _ in range(20):
+                await asyncio.sleep(0)
+            # Réponse écrite mais pas encore envoyée : la connexion occupe toujours une place
+            self.assertEqual(server._active, 1)
+            self.assertFalse(writer.closed)
+            writer.released.set()
+            await task
+            self.assertTrue(writer.closed)
+            self.assertEqual(server._active, 0)
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from spool import PointSpool
+from uploader import BACKOFF_MAX, InfluxUploader, UploadError
+
+
+class ScriptedUploader(InfluxUploader):
+    """Remplace le POST HTTP par une suite de réponses prédéfinies"""
+
+    def __init__(self, spool, errors, **kwargs):
+        super().__init__(spool, "http://influx:8086", "org", "bucket", "token", **kwargs)
+        self.errors = list(errors)
+        self.bodies = []
+
+    def _post(self, body):
+        self.bodies.append(gzip.decompress(body).decode().split("\n"))
+        error = self.errors.pop(0) if self.errors else None
+        if error:
+            raise error
+
+
+class TestInfluxUploader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool = PointSpool(os.path.join(self.tmp.name, "spool.db"))
+        self.spool.append([f"m v={i} {i}" for i in range(25)])
+
+    def tearDown(self):
+        self.spool.close()
+        self.tmp.cleanup()
+
+    def test_fixed_size_batches(self):
+        uploader = ScriptedUploader(self.spool, [], max_points=10)
+        self.assertTrue(asyncio.run(uploader.flush()))
+        self.assertEqual([len(b) for b in uploader.bodies], [10, 10, 5])
+        self.assertEqual(uploader.bodies[0][0], "m v=0 0")
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(uploader.points_sent, 25)
+        self.assertGreater(uploader.bytes_wire, 0)
+
+    def test_server_error_keeps_points(self):
+        uploader = ScriptedUploader(self.spool, [None, UploadError("HTTP 503", status=503)], max_points=10)
+        self.assertFalse(asyncio.run(uploader.flush()))
+        self.assertEqual(len(self.spool), 15)
+        self.assertEqual(self.spool.read_batch(1)[1], ["m v=10 10"])
+
+    def test_rejected_batch_dropped(self):
+        uploader = ScriptedUploader(self.spool, [UploadError("HTTP 400", status=400)], max_points=10)
+        self.assertTrue(asyncio.run(uploader.flush()))
+        self.assertEqual(uploader.points_dropped, 10)
+        self.assertEqual(uploader.points_sent, 15)
+
+    def test_too_large_halves_batch_bytes(self):
+        uploader = ScriptedUploader(self.spool, [UploadError("HTTP 413", status=413)], max_bytes=64 * 1024)
+        self.assertTrue(asyncio.run(uploader.flush()))
+        self.assertEqual(uploader.max_bytes, 32 * 1024)
+        self.assertEqual(uploader.points_sent, 25)
+
+    def test_configuration_error_long_backoff(self):
+        uploader = ScriptedUploader(self.spool, [UploadError("HTTP 404", status=404)], max_points=10)
+        self.assertFalse(asyncio.run(uploader.flush()))
+        self.assertEqual(len(self.spool), 25)
+        self.assertEqual(uploader._next_delay(), BACKOFF_MAX)
+        uploader.errors = [UploadError("HTTP 503", status=503)]
+        self.assertFalse(asyncio.run(uploader.flush()))
+        self.assertLess(uploader._next_delay(), BACKOFF_MAX)
+
+    def test_error_classification(self):
+        self.assertTrue(UploadError("timeout").retryable)
+        self.assertTrue(UploadError("", status=429).retryable)
+        self.assertTrue(UploadError("", status=502).retryable)
+        self.assertFalse(UploadError("", status=401).retryable)
+        self.assertTrue(UploadError("", status=422).rejected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "supervisor"))
+
+from victron_registry import RECORD_TYPES, VictronDevice, record_type
+
+try:
+    import victron_ble  # noqa: F401
+    from Crypto.Cipher import AES
+    from Crypto.Util import Counter
+    VICTRON_BLE_AVAILABLE = True
+except ImportError:
+    VICTRON_BLE_AVAILABLE = False
+
+SOLAR_KEY = "8ebf134b9339e9524eb24979c5e87505"
+SHUNT_KEY = "11" * 16
+
+
+def encrypt(key_hex: str, model: int, mode: int, iv: int, plain: bytes) -> bytes:
+    """Donnée constructeur 0x02E1 chiffrée comme par le firmware Victron"""
+    key = bytes.fromhex(key_hex)
+    cipher = AES.new(key, AES.MODE_CTR, counter=Counter.new(128, initial_value=iv, little_endian=True))
+    return b"\x10\x02" + struct.pack("<HBH", model, mode, iv) + key[:1] + cipher.encrypt(plain)
+
+
+def solar_frame(iv=1, voltage=13.45, current=4.2, power=57, yield_wh=230):
+    plain = struct.pack("<BBhhHH", 3, 0, round(voltage * 100), round(current * 10), yield_wh // 10, power)
+    return encrypt(SOLAR_KEY, 0xA060, 0x01, iv, plain + b"\xff\xff\xff\xff")
+
+
+def shunt_frame(iv=1, voltage=12.84, current=-2.5, consumed_ah=12.3, soc=87.5):
+    # Champs de bits LSB d'abord : restant, tension, alarme, aux, mode aux, courant, Ah consommés, SOC
+    bits = (0xFFFF | round(voltage * 100) << 16 | 3 << 64 | (round(current * 1000) & 0x3FFFFF) << 66
+            | round(consumed_ah * 10) << 88 | round(soc * 10) << 108)
+    return encrypt(SHUNT_KEY, 0xA389, 0x02, iv, bits.to_bytes(15, "little"))
+
+
+class HeaderTests(unittest.TestCase):
+    def test_record_type(self):
+        header = bytes((0x10, 0x02, 0x60, 0xA0, 0x01, 0x00, 0x00, 0x8E, 0x00))
+        self.assertEqual(record_type(header), 0x01)
+        self.assertEqual(RECORD_TYPES[record_type(header[:4] + b"\x02" + header[5:])], "battery_monitor")
+        self.assertIsNone(record_type(b"\x11" + header[1:]))
+        self.assertIsNone(record_type(header[:4] + b"\x0e" + header[5:]))
+        self.assertIsNone(record_type(header[:8]))
+
+    def test_accepts_checks_key_byte(self):
+        device = VictronDevice("FC:40:BC:FC:A8:D4", SOLAR_KEY)
+        header = bytes((0x10, 0x02, 0x60, 0xA0, 0x01, 0x00, 0x00))
+        self.assertTrue(device.accepts(header + b"\x8e\x00"))
+        self.assertFalse(device.accepts(header + b"\x11\x00"))
+        self.assertFalse(device.accepts(b"\x00" * 12))
+        self.assertEqual((device.key_mismatch, device.rejected), (1, 1))
+
+
+@unittest.skipUnless(VICTRON_BLE_AVAILABLE, "victron_ble / pycryptodome non installés")
+class DecodeTests(unittest.TestCase):
+    def test_solar_charger(self):
+        device = VictronDevice("FC:40:BC:FC:A8:D4", SOLAR_KEY)
+        frame = solar_frame()
+        self.assertTrue(device.accepts(frame))
+        values = device.decode(frame)
+        self.assertEqual(values["record_type"], "solar_charger")
+        self.assertEqual(values["battery_voltage"], 13.45)
+        self.assertEqual(values["battery_charging_current"], 4.2)
+        self.assertEqual(values["solar_power"], 57)
+        self.assertEqual(values["yield_today"], 230)
+        self.assertEqual(values["charge_state"], "BULK")
+        self.assertNotIn("panel_voltage", values)
+
+    def test_battery_monitor(self):
+        device = VictronDevice("D8:3B:11:90:6E:02", SHUNT_KEY)
+        values = device.decode(shunt_frame())
+        self.assertEqual(values["record_type"], "battery_monitor")
+        self.assertEqual((values["voltage"], values["current"], values["soc"]), (12.84, -2.5, 87.5))
+        self.assertEqual(values["consumed_ah"], -12.3)
+        self.assertEqual(device.stats()["record_type"], "battery_monitor")
+
+    def test_parser_built_once(self):
+        device = VictronDevice("FC:40:BC:FC:A8:D4", SOLAR_KEY)
+        first = device.parser_for(solar_frame(iv=1))
+        self.assertIs(device.parser_for(solar_frame(iv=2)), first)
+        for iv in range(5):
+            device.decode(solar_frame(iv=iv, power=iv))
+        self.assertEqual(len(device._parsers), 1)
+        self.assertEqual(device.decoded, 5)
+
+    def test_site_with_chargers_and_shunt(self):
+        from testmulti import GlobalStateManager
+
+        manager = GlobalStateManager(SOLAR_KEY)
+        manager.duree_fenetre_seconds = manager.intervalle_ecoute_seconds  # toujours dans la fenêtre
+        chargers = ("FC:40:BC:FC:A8:D4", "F1:2A:7C:33:10:4B")
+        shunt = "D8:3B:11:90:6E:02"
+        for mac in chargers:
+            manager.register_victron(mac)
+        manager.register_victron(shunt, SHUNT_KEY)
+
+        class Adv:
+            def __init__(self, data):
+                self.manufacturer_data = {0x004C: b"\x02\x15", 0x02E1: data}
+
+        manager.update_victron(Adv(solar_frame(iv=1, power=57)), chargers[0])
+        manager.update_victron(Adv(solar_frame(iv=2, power=80)), chargers[1])
+        manager.update_victron(Adv(shunt_frame()), shunt)
+        manager.update_victron(Adv(shunt_frame(iv=2)), chargers[0])   # autre clé : rejetée sans déchiffrement
+        self.assertEqual([manager.victron_states[mac]["solar_power"] for mac in chargers], [57, 80])
+        self.assertEqual(manager.victron_states[shunt]["soc"], 87.5)
+        self.assertEqual(manager.victron_devices[chargers[0]].key_mismatch, 1)
+        self.assertIn(f"{shunt}.soc", manager.history)
+
+
+if __name__ == "__main__":
+    unittest.main()